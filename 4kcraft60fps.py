@@ -2,6 +2,7 @@ from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
 from random import randint, choice
 from math import floor, sin, cos
+from voxelray import voxel_raycast
 
 app = Ursina()
 window.title = "Minecraft Beta 1.0"
@@ -16,6 +17,9 @@ block_colors = {
     'sand': color.rgb(237, 201, 175),
 }
 
+PICK_DISTANCE = 8
+voxels = {}  # (x, y, z) -> Voxel, for the pick ray
+
 # Define voxel class
 class Voxel(Button):
     def __init__(self, position=(0,0,0), block_type='grass'):
@@ -29,13 +33,22 @@ class Voxel(Button):
             highlight_color=color.lime
         )
         self.block_type = block_type
+        voxels[tuple(round(c) for c in self.position)] = self
 
-    def input(self, key):
-        if self.hovered:
-            if key == 'right mouse down':
-                new_voxel = Voxel(position=self.position + mouse.normal, block_type=player.selected_block)
-            if key == 'left mouse down':
-                destroy(self)
+# Block picking: walk the block grid from the eye instead of asking every block
+# whether it is hovered. Blocks span [-0.5, 0.5] around x/z and, with
+# origin_y=0.5, [-1, 0] below y, hence the shift onto the ray's grid cells.
+def input(key):
+    if key not in ('left mouse down', 'right mouse down'):
+        return
+    hit = voxel_raycast(camera.world_position + Vec3(0.5, 1, 0.5), camera.forward, PICK_DISTANCE, voxels.__contains__)
+    if not hit:
+        return
+    cell, normal = hit
+    if key == 'right mouse down' and any(normal):
+        Voxel(position=Vec3(*cell) + Vec3(*normal), block_type=player.selected_block)
+    if key == 'left mouse down':
+        destroy(voxels.pop(cell))
 
 # Simple terrain generator
 def generate_terrain(size=20, height=5):
@@ -1,6 +1,7 @@
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
-from numpy import random, sin, cos
+from numpy import random, arange
+from voxelnoise import fractal_noise2
 
 app = Ursina()
 
@@ -45,11 +46,12 @@ class Player(FirstPersonController):
         if self.position.y < -20:  # If the player falls into the void
             self.position = (10, 10, 10)  # Respawn player at the center of the map
 
+# Terrain heights for the whole 20x20 map from seeded fractal noise, indexed [z][x]
+heights = (fractal_noise2(arange(20)[None, :] * 0.15, arange(20)[:, None] * 0.15,
+                          random.randint(0, 1000), octaves=3) * 8).round().astype(int)
 for z in range(20):
     for x in range(20):
-        y = sin(x)*cos(z)*5  # Simple terrain generation using sine and cosine
-        y = round(y)
-        for y in range(y+1):
+        for y in range(heights[z, x]+1):
             voxel = Voxel(position=(x,y,z))
 
 player = Player()
@@ -49,18 +49,25 @@ def generate_tree(x, y, z):
                 place_block(x + dx, y + dy, z + dz, "leaves")
     place_block(x, y + 4, z, "leaves")
 
-from math import sin, cos
+import numpy as np
 from random import randint, random
+from voxelnoise import fractal_noise2
+
+WORLD_SEED = randint(0, 1000)
 
 def generate_height(x, z):
-    return int(sin(x * 0.2) * 2 + cos(z * 0.2) * 2 + 8 + randint(-1, 1))
+    # Takes single columns or whole coordinate grids; seeded noise in place of
+    # randint gives a column the same height every time it is asked for
+    jitter = np.rint(fractal_noise2(np.multiply(x, 0.3), np.multiply(z, 0.3), WORLD_SEED, octaves=2) * 1.5)
+    return (np.sin(np.multiply(x, 0.2)) * 2 + np.cos(np.multiply(z, 0.2)) * 2 + 8 + jitter).astype(int)
 
 world_width, world_depth, sea_level = 32, 32, 6
 
 def generate_world():
+    heights = generate_height(np.arange(world_width)[:, None], np.arange(world_depth)[None, :])
     for x in range(world_width):
         for z in range(world_depth):
-            h = generate_height(x, z)
+            h = int(heights[x, z])
             top = "grass" if h > sea_level else "sand"
             for y in range(h):
                 block = top if y == h - 1 else "dirt" if y > h - 4 else "stone"
@@ -71,7 +78,7 @@ def generate_world():
                 generate_tree(x, h - 1, z)  # Adjusted to start tree at ground level
 
 player = FirstPersonController(gravity=0.3, jump_height=1.1, speed=4)
-player.position = Vec3(world_width // 2, generate_height(world_width // 2, world_depth // 2) + 2, world_depth // 2)
+player.position = Vec3(world_width // 2, int(generate_height(world_width // 2, world_depth // 2)) + 2, world_depth // 2)
 
 def update():
     if held_keys['left mouse'] and mouse.hovered_entity:
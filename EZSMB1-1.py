@@ -12,9 +12,14 @@
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
 import pygame
+import os
 import sys
 import random
 import math
+import argparse
+from collections import OrderedDict
+from fixedstep import FixedStep, lerp
+from inputreplay import Recording, PhaseTimer, state_hash
 
 # --- Constants ---
 SCREEN_WIDTH = 600 # The visible window size
@@ -62,6 +67,7 @@ PLAYER_ACC = 0.35
 PLAYER_FRICTION = -0.12
 PLAYER_MAX_SPEED_X = 4.5
 GOOMBA_SPEED = -0.6
+GOOMBA_REMOVE_DELAY = 500 # ms a squished Goomba stays on screen
 STOMP_BOUNCE = -4
 MUSHROOM_SPEED = 1.0
 COIN_SCORE = 200
@@ -70,6 +76,40 @@ GOOMBA_SCORE = 100
 GAME_START_TIME = 400
 BRICK_BREAK_SCORE = 50
 LEVEL_END_X = TILE * 210 # Approximate end coordinate for camera clamping
+ART_CACHE_SIZE = 128 # Pre-drawn object surfaces kept; least recently drawn are dropped first
+CHUNK_CACHE_SIZE = 6 # Baked level chunks kept (up to three are on screen); older ones are re-baked on demand
+ART_MARGIN = 4 # Room around an object's rect for parts that overhang it (pipe rim, Mario's arms)
+ART_COLORKEY = (255, 0, 255) # Not in the palette, so it can mark transparent pixels
+# Buttons, one bit each in the per-step input mask (recorded and replayed by inputreplay.py)
+BUTTON_LEFT = 1
+BUTTON_RIGHT = 2
+BUTTON_JUMP = 4
+BUTTON_RUN = 8
+
+# --- Simulation Clock ---
+# Game logic runs in fixed steps (see fixedstep.py); its timers read simulated time, so the
+# same inputs always play out the same way however fast frames are drawn
+
+def game_ticks():
+    """Milliseconds of simulated time, used wherever pygame.time.get_ticks() would be."""
+    return timestep.ticks
+
+def read_buttons():
+    """Samples the keyboard into an input mask of BUTTON_* bits."""
+    keys = pygame.key.get_pressed()
+    buttons = 0
+    if keys[pygame.K_LEFT]: buttons |= BUTTON_LEFT
+    if keys[pygame.K_RIGHT]: buttons |= BUTTON_RIGHT
+    if keys[pygame.K_SPACE] or keys[pygame.K_UP]: buttons |= BUTTON_JUMP
+    if keys[pygame.K_z] or keys[pygame.K_s]: buttons |= BUTTON_RUN
+    return buttons
+
+def interpolated_topleft(sprite, alpha):
+    """Where to draw a sprite, `alpha` of the way from its rect before the last step to its rect now."""
+    prev = getattr(sprite, "prev_topleft", None)
+    if prev is None:
+        return sprite.rect.topleft
+    return lerp(prev[0], sprite.rect.x, alpha), lerp(prev[1], sprite.rect.y, alpha)
 
 # --- Background Element Drawing Functions ---
 # These draw static, non-interactive elements directly onto the screen surface
@@ -77,8 +117,8 @@ LEVEL_END_X = TILE * 210 # Approximate end coordinate for camera clamping
 def draw_cloud(surface, x, y, size, offset_x):
     """Draws a simple cloud approximation."""
     draw_x = round(x - offset_x)
-    # Basic culling
-    if draw_x + size * TILE * 2 < 0 or draw_x > SCREEN_WIDTH:
+    # Basic culling (the widest cloud reaches TILE*4.5 past x)
+    if draw_x + TILE * 5 < 0 or draw_x > SCREEN_WIDTH:
         return
 
     base_y = y
@@ -114,8 +154,8 @@ def draw_flagpole(surface, x, y, offset_x):
     pole_height = TILE * 9
     base_y = y + TILE * 2 # Starts from ground line
 
-    # Basic culling
-    if draw_x + TILE < 0 or draw_x > SCREEN_WIDTH:
+    # Basic culling (flag reaches TILE+4 right of the pole, the ball 3px left of it)
+    if draw_x + TILE + 4 < 0 or draw_x - 3 > SCREEN_WIDTH:
         return
 
     # Pole
@@ -155,6 +195,107 @@ def draw_castle(surface, x, y, offset_x):
     pygame.draw.rect(surface, COLOR_CASTLE_BRICK, (draw_x + width/2 - tower_w/2, base_y - height - tower_h, tower_w, tower_h))
     pygame.draw.rect(surface, COLOR_CASTLE_TOP, (draw_x + width/2 - tower_w/2, base_y - height - tower_h - 2, tower_w, 2)) # Top line
 
+def draw_background(surface, background_data, offset_x):
+    """Draws every background element from create_level (relative to the camera)."""
+    ground_y_coord = SCREEN_HEIGHT - TILE * 2 # Reference for placing hills etc.
+    for elem in background_data:
+        elem_type = elem[0]
+        x = elem[1]
+        y = elem[2] # This is ground Y for hills/castle/flagpole
+        if elem_type == 'cloud':
+            size = elem[3]
+            draw_cloud(surface, x, y, size, offset_x) # Y is absolute cloud level
+        elif elem_type == 'hill':
+            size = elem[3]
+            draw_hill(surface, x, ground_y_coord, size, offset_x) # Y needs to be ground level
+        elif elem_type == 'flagpole':
+            draw_flagpole(surface, x, ground_y_coord, offset_x)
+        elif elem_type == 'castle':
+            draw_castle(surface, x, ground_y_coord, offset_x)
+
+# --- Art Cache ---
+# Objects are drawn once per distinct look onto their own surface, then blitted each frame
+
+art_cache = OrderedDict()
+
+def cached_art(key, width, height, paint):
+    """Returns the surface for `key`, calling paint(art_surface, x, y) to draw it on a miss."""
+    art = art_cache.get(key)
+    if art is not None:
+        art_cache.move_to_end(key)
+        return art
+    art = pygame.Surface((width + ART_MARGIN * 2, height + ART_MARGIN * 2))
+    art.fill(ART_COLORKEY)
+    paint(art, ART_MARGIN, ART_MARGIN)
+    art.set_colorkey(ART_COLORKEY)
+    if pygame.display.get_surface() is not None:
+        art = art.convert()
+    art_cache[key] = art
+    if len(art_cache) > ART_CACHE_SIZE:
+        art_cache.popitem(last=False)
+    return art
+
+# --- Static Level Layer ---
+# Sky, scenery and resting blocks are baked into chunks of the level, so a frame blits
+# the two or three chunks under the camera instead of redrawing the whole scene
+
+def is_static_platform(plat):
+    """Platforms whose look only changes when they're hit: not flashing '?' blocks or mid-bump."""
+    return plat.type != "question" and plat.hit_state != 1
+
+class StaticLayer:
+    # Each chunk is baked SCREEN_WIDTH wide (what the draw functions cull against) but only its
+    # right CHUNK_STEP pixels are shown; the hidden left PAD keeps scenery that starts just before
+    # the chunk at x >= 0, where pygame truncates fractional coordinates the same way on screen.
+    PAD = TILE * 5
+    CHUNK_STEP = SCREEN_WIDTH - PAD
+
+    def __init__(self, level_width, background_data, platforms):
+        self.background_data = background_data
+        self.platforms = platforms # Broken blocks leave the group, and so the next bake
+        self.chunk_count = level_width // self.CHUNK_STEP + 1
+        self.chunks = OrderedDict() # Chunk index -> baked surface, least recently drawn first
+        self.animated = [plat for plat in platforms if not is_static_platform(plat)]
+
+    def invalidate(self, rect):
+        """Re-bakes the chunks under `rect` (world coordinates) the next time they are drawn."""
+        first = max((rect.left - ART_MARGIN) // self.CHUNK_STEP, 0)
+        last = min((rect.right + ART_MARGIN) // self.CHUNK_STEP, self.chunk_count - 1)
+        for index in range(first, last + 1):
+            self.chunks.pop(index, None)
+        self.animated = [plat for plat in self.platforms if not is_static_platform(plat)]
+
+    def bake(self, index):
+        origin_x = index * self.CHUNK_STEP - self.PAD
+        chunk = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        chunk.fill(COLOR_SKY_BLUE)
+        draw_background(chunk, self.background_data, origin_x)
+        for plat in self.platforms:
+            if is_static_platform(plat):
+                plat.draw_programmatic(chunk, origin_x)
+        if pygame.display.get_surface() is not None:
+            chunk = chunk.convert()
+        return chunk
+
+    def draw(self, surface, offset_x):
+        """Blits the chunks in view, baking any that are out of date."""
+        index = max(int(offset_x) // self.CHUNK_STEP, 0)
+        while index < self.chunk_count:
+            # Rounded like each element's own draw_x, so baked art lands on the same pixels
+            screen_x = round(index * self.CHUNK_STEP - offset_x)
+            if screen_x >= SCREEN_WIDTH:
+                break
+            if screen_x + self.CHUNK_STEP > 0:
+                chunk = self.chunks.get(index)
+                if chunk is None:
+                    chunk = self.chunks[index] = self.bake(index)
+                    if len(self.chunks) > CHUNK_CACHE_SIZE:
+                        self.chunks.popitem(last=False)
+                else:
+                    self.chunks.move_to_end(index)
+                surface.blit(chunk, (screen_x, 0), (self.PAD, 0, self.CHUNK_STEP, SCREEN_HEIGHT))
+            index += 1
+
 
 # --- Game Object Classes (Copied from previous version, minor adjustments possible) ---
 
@@ -186,6 +327,7 @@ class Player(pygame.sprite.Sprite):
         self.max_walk_speed = 3.0
         self.max_run_speed = 5.5
         self.jump_cut_magnitude = 0.4  # How much to cut jump when button released
+        self.buttons = 0 # BUTTON_* bits held this step, set by the main loop
 
     def set_size(self):
         if self.state == "big":
@@ -208,7 +350,7 @@ class Player(pygame.sprite.Sprite):
 
     def jump(self):
         if self.is_dead: return
-        now = pygame.time.get_ticks()
+        now = game_ticks()
         # Allow jumping shortly after falling off a ledge (coyote time - basic)
         if (self.on_ground or now - self.last_on_ground_time < 100) and now - self.last_jump_time > 100: # Small debounce
             jump_power = JUMP_STRENGTH
@@ -242,7 +384,7 @@ class Player(pygame.sprite.Sprite):
             self.set_size()
             self.rect.bottom = current_bottom # Keep feet on ground
             self.pos.y = self.rect.bottom
-            self.invincible_timer = pygame.time.get_ticks() # Start invincibility
+            self.invincible_timer = game_ticks() # Start invincibility
             # TODO: Add shrinking animation/sound effect
 
     def die(self):
@@ -254,7 +396,7 @@ class Player(pygame.sprite.Sprite):
             self.vel.x = 0
             self.vel.y = -8 # Initial bounce up for death anim
             self.acc.x = 0
-            self.death_timer = pygame.time.get_ticks()
+            self.death_timer = game_ticks()
             # No more input, gravity takes over after initial bounce
 
     def hit(self):
@@ -270,13 +412,13 @@ class Player(pygame.sprite.Sprite):
             return True # Indicate death should happen
 
     def update(self, platforms, delta_time):
-        now = pygame.time.get_ticks()
+        now = game_ticks()
 
         # --- Death Animation ---
         if self.is_dead:
             # Simple death: bounce up, fall down through everything
-            self.vel.y += GRAVITY * 1.5 # Fall faster
-            self.pos.y += self.vel.y
+            self.vel.y += GRAVITY * 1.5 * (delta_time * 60) # Fall faster
+            self.pos.y += self.vel.y * (delta_time * 60)
             self.rect.bottom = round(self.pos.y)
             # Check if fallen off screen
             if self.pos.y > SCREEN_HEIGHT + TILE*2 and now - self.death_timer > 1000:
@@ -289,18 +431,16 @@ class Player(pygame.sprite.Sprite):
             self.invincible_timer = 0
 
         # --- Input and Acceleration ---
-        keys = pygame.key.get_pressed()
-        
         # Reset acceleration each frame
         self.acc = pygame.Vector2(0, GRAVITY)
         
         # Running flag - Mario 35 style
-        self.is_running = keys[pygame.K_z] or keys[pygame.K_s]
+        self.is_running = bool(self.buttons & BUTTON_RUN)
         speed_multiplier = self.run_speed if self.is_running else 1.0
         
         # Direction input
-        moving_left = keys[pygame.K_LEFT]
-        moving_right = keys[pygame.K_RIGHT]
+        moving_left = bool(self.buttons & BUTTON_LEFT)
+        moving_right = bool(self.buttons & BUTTON_RIGHT)
         
         # Mario 35 style acceleration based on direction
         if moving_left:
@@ -347,52 +487,54 @@ class Player(pygame.sprite.Sprite):
         # Move X first, check collision, correct
         self.pos.x += self.vel.x * (delta_time * 60) # Scale velocity by delta time
         self.rect.centerx = round(self.pos.x)
-        collided_platforms_x = pygame.sprite.spritecollide(self, platforms, False)
-        for plat in collided_platforms_x:
-            # Ensure sprite doesn't collide with itself (shouldn't happen but safe)
-            if plat == self: continue
-            # Only collide with solid types horizontally (add more types if needed)
-            if plat.type in ["ground", "brick", "question", "pipe", "stair_block", "empty_block"]:
-                if self.vel.x > 0: # Moving right
-                    self.rect.right = plat.rect.left
-                elif self.vel.x < 0: # Moving left
-                    self.rect.left = plat.rect.right
-                self.pos.x = self.rect.centerx
-                self.vel.x = 0
+        with timings.phase("collision"):
+            collided_platforms_x = pygame.sprite.spritecollide(self, platforms, False)
+            for plat in collided_platforms_x:
+                # Ensure sprite doesn't collide with itself (shouldn't happen but safe)
+                if plat == self: continue
+                # Only collide with solid types horizontally (add more types if needed)
+                if plat.type in ["ground", "brick", "question", "pipe", "stair_block", "empty_block"]:
+                    if self.vel.x > 0: # Moving right
+                        self.rect.right = plat.rect.left
+                    elif self.vel.x < 0: # Moving left
+                        self.rect.left = plat.rect.right
+                    self.pos.x = self.rect.centerx
+                    self.vel.x = 0
 
         # Move Y second, check collision, correct
         self.pos.y += self.vel.y * (delta_time * 60) # Scale velocity by delta time
         self.rect.bottom = round(self.pos.y)
         self.on_ground = False # Assume not on ground until vertical collision check
-        collided_platforms_y = pygame.sprite.spritecollide(self, platforms, False)
-        for plat in collided_platforms_y:
-            if plat == self: continue
-            # Only collide with solid types vertically
-            if plat.type in ["ground", "brick", "question", "pipe", "stair_block", "empty_block"]:
-                # Player's feet were roughly above the platform's top before this frame's vertical movement
-                player_feet_prev_y = self.pos.y - self.vel.y * (delta_time * 60)
-                # Player's head was roughly below the platform's bottom before this frame's vertical movement
-                player_head_prev_y = player_feet_prev_y - self.size[1]
-
-                if self.vel.y > 0: # Moving Down / Landing
-                    # Land only if feet were above or very close to the top
-                    if player_feet_prev_y <= plat.rect.top + 1:
-                        self.rect.bottom = plat.rect.top + 1
-                        self.pos.y = self.rect.bottom
-                        self.vel.y = 0
-                        self.on_ground = True
-                        # Don't break here, landing might resolve multiple overlaps if needed
-                elif self.vel.y < 0: # Moving Up / Hitting Underside
-                     # Hit underside only if head was below or very close to the bottom
-                     if player_head_prev_y >= plat.rect.bottom - 1:
-                        self.rect.top = plat.rect.bottom
-                        self.pos.y = self.rect.bottom
-                        self.vel.y = 0
-                        # Trigger block hit action if the platform is hittable
-                        if hasattr(plat, 'hit'):
-                             plat.hit(self) # Pass player
-                        # Break after hitting something from below
-                        break
+        with timings.phase("collision"):
+            collided_platforms_y = pygame.sprite.spritecollide(self, platforms, False)
+            for plat in collided_platforms_y:
+                if plat == self: continue
+                # Only collide with solid types vertically
+                if plat.type in ["ground", "brick", "question", "pipe", "stair_block", "empty_block"]:
+                    # Player's feet were roughly above the platform's top before this frame's vertical movement
+                    player_feet_prev_y = self.pos.y - self.vel.y * (delta_time * 60)
+                    # Player's head was roughly below the platform's bottom before this frame's vertical movement
+                    player_head_prev_y = player_feet_prev_y - self.size[1]
+
+                    if self.vel.y > 0: # Moving Down / Landing
+                        # Land only if feet were above or very close to the top
+                        if player_feet_prev_y <= plat.rect.top + 1:
+                            self.rect.bottom = plat.rect.top + 1
+                            self.pos.y = self.rect.bottom
+                            self.vel.y = 0
+                            self.on_ground = True
+                            # Don't break here, landing might resolve multiple overlaps if needed
+                    elif self.vel.y < 0: # Moving Up / Hitting Underside
+                         # Hit underside only if head was below or very close to the bottom
+                         if player_head_prev_y >= plat.rect.bottom - 1:
+                            self.rect.top = plat.rect.bottom
+                            self.pos.y = self.rect.bottom
+                            self.vel.y = 0
+                            # Trigger block hit action if the platform is hittable
+                            if hasattr(plat, 'hit'):
+                                 plat.hit(self) # Pass player
+                            # Break after hitting something from below
+                            break
 
 
         # --- Screen Boundary (Left) ---
@@ -401,21 +543,27 @@ class Player(pygame.sprite.Sprite):
             self.pos.x = self.rect.centerx
             self.vel.x = max(0, self.vel.x) # Prevent moving further left
 
-    def draw_programmatic(self, surface, offset_x):
+    def draw_programmatic(self, surface, offset_x, alpha=1.0):
         # ... (Drawing code remains the same as v1.1, just uses TILE constant) ...
         # Blinking effect when invincible
         if self.invincible_timer > 0:
-            if (pygame.time.get_ticks() // 100) % 2 == 0:
+            if (game_ticks() // 100) % 2 == 0:
                 return # Skip drawing every other frame to make it blink
 
         # Special draw for death animation (simple flashing/fading maybe)
         if self.is_dead:
              # Example: Flicker during death anim
-             if (pygame.time.get_ticks() // 80) % 2 == 0:
+             if (game_ticks() // 80) % 2 == 0:
                  return
 
-        draw_x = round(self.rect.x - offset_x)
-        draw_y = round(self.rect.y)
+        x, y = interpolated_topleft(self, alpha)
+        draw_x = round(x - offset_x)
+        draw_y = round(y)
+        width, height = self.size
+        art = cached_art(("player", self.size, self.facing_right), width, height, self.paint_art)
+        surface.blit(art, (draw_x - ART_MARGIN, draw_y - ART_MARGIN))
+
+    def paint_art(self, surface, draw_x, draw_y):
         width, height = self.size
 
         body_color = COLOR_MARIO_RED
@@ -531,15 +679,17 @@ class Platform(pygame.sprite.Sprite):
             coins += award_coins
         if is_bumping and not break_block:
             self.hit_state = 1
-            self.hit_timer = pygame.time.get_ticks()
+            self.hit_timer = game_ticks()
             self.rect.y -= 4 # Visual bump up
         if break_block:
              # TODO: Spawn particle effect
              self.kill() # Remove block immediately
+        if is_bumping or break_block:
+            static_layer.invalidate(self.rect) # Its chunk needs redrawing without it
 
     def update(self, *args):
         if self.hit_state == 1: # During bump animation
-            now = pygame.time.get_ticks()
+            now = game_ticks()
             bump_duration = 100
             if now - self.hit_timer > bump_duration:
                 self.rect.y = self.original_y # Move back down
@@ -549,6 +699,7 @@ class Platform(pygame.sprite.Sprite):
                 else:
                     self.hit_state = 0 # Brick bump finishes
                 self.hit_timer = 0
+                static_layer.invalidate(self.rect) # Resting again, so it goes back into the baked chunk
 
     def draw_programmatic(self, surface, offset_x):
         draw_x = round(self.rect.x - offset_x)
@@ -559,11 +710,20 @@ class Platform(pygame.sprite.Sprite):
         if draw_x + width < 0 or draw_x > SCREEN_WIDTH or draw_y + height < 0 or draw_y > SCREEN_HEIGHT:
             return
 
-        draw_rect = pygame.Rect(draw_x, draw_y, width, height)
-
         current_draw_type = self.type
         if self.hit_state == 2 and self.original_type == "question":
              current_draw_type = "empty_block" # Draw visually empty
+        # Flashing '?'
+        show_mark = current_draw_type == "question" and (game_ticks() // 200) % 3 != 0
+
+        art = cached_art(("platform", current_draw_type, width, height, show_mark), width, height,
+                         lambda art, x, y: self.paint_art(art, x, y, current_draw_type, show_mark))
+        surface.blit(art, (draw_x - ART_MARGIN, draw_y - ART_MARGIN))
+
+    def paint_art(self, surface, draw_x, draw_y, current_draw_type, show_mark):
+        width = self.rect.width
+        height = self.rect.height
+        draw_rect = pygame.Rect(draw_x, draw_y, width, height)
 
         # Colors
         block_color = COLOR_EMPTY_BLOCK
@@ -598,8 +758,7 @@ class Platform(pygame.sprite.Sprite):
             block_color = COLOR_QUESTION_BLOCK
             pygame.draw.rect(surface, block_color, draw_rect)
             pygame.draw.rect(surface, outline_color, draw_rect, 1)
-            # Flashing '?'
-            if (pygame.time.get_ticks() // 200) % 3 != 0:
+            if show_mark:
                 q_center_x = draw_rect.centerx; q_center_y = draw_rect.centery
                 pygame.draw.line(surface, COLOR_QUESTION_MARK, (q_center_x - 3, q_center_y - 4), (q_center_x + 3, q_center_y - 4), 2)
                 pygame.draw.line(surface, COLOR_QUESTION_MARK, (q_center_x + 3, q_center_y - 4), (q_center_x + 3, q_center_y - 1), 2)
@@ -641,8 +800,6 @@ class Goomba(pygame.sprite.Sprite):
         self.kill_timer = 0
 
     def update(self, platforms, delta_time):
-        global GOOMBA_REMOVE_DELAY
-        
         if self.state == "walk":
             # Vertical Movement & Gravity
             self.vel.y += GRAVITY * (delta_time * 60)
@@ -651,52 +808,55 @@ class Goomba(pygame.sprite.Sprite):
 
             # Vertical Collision (Landing)
             self.on_ground = False
-            hits_y = pygame.sprite.spritecollide(self, platforms, False)
-            for plat in hits_y:
-                 if plat.type in ["ground", "brick", "question", "pipe", "stair_block", "empty_block"]:
-                     if self.vel.y > 0 and self.pos.y - self.vel.y * (delta_time*60) <= plat.rect.top + 1:
-                         self.rect.bottom = plat.rect.top + 1
-                         self.pos.y = self.rect.bottom
-                         self.vel.y = 0
-                         self.on_ground = True
-                         break
+            with timings.phase("collision"):
+                hits_y = pygame.sprite.spritecollide(self, platforms, False)
+                for plat in hits_y:
+                     if plat.type in ["ground", "brick", "question", "pipe", "stair_block", "empty_block"]:
+                         if self.vel.y > 0 and self.pos.y - self.vel.y * (delta_time*60) <= plat.rect.top + 1:
+                             self.rect.bottom = plat.rect.top + 1
+                             self.pos.y = self.rect.bottom
+                             self.vel.y = 0
+                             self.on_ground = True
+                             break
 
             # Horizontal Movement
             self.pos.x += self.vel.x * (delta_time * 60)
             self.rect.centerx = round(self.pos.x)
 
             # Horizontal Collision (Walls & Turnaround)
-            hits_x = pygame.sprite.spritecollide(self, platforms, False)
-            wall_hit = False
-            for plat in hits_x:
-                 if plat.type in ["ground", "brick", "question", "pipe", "stair_block", "empty_block"]:
-                      if (self.vel.x > 0 and self.rect.right > plat.rect.left and self.rect.left < plat.rect.left) or \
-                         (self.vel.x < 0 and self.rect.left < plat.rect.right and self.rect.right > plat.rect.right):
-                           self.vel.x *= -1
-                           if self.vel.x < 0: self.rect.right = plat.rect.left
-                           else: self.rect.left = plat.rect.right
-                           self.pos.x = self.rect.centerx
-                           wall_hit = True
-                           break
+            with timings.phase("collision"):
+                hits_x = pygame.sprite.spritecollide(self, platforms, False)
+                wall_hit = False
+                for plat in hits_x:
+                     if plat.type in ["ground", "brick", "question", "pipe", "stair_block", "empty_block"]:
+                          if (self.vel.x > 0 and self.rect.right > plat.rect.left and self.rect.left < plat.rect.left) or \
+                             (self.vel.x < 0 and self.rect.left < plat.rect.right and self.rect.right > plat.rect.right):
+                               self.vel.x *= -1
+                               if self.vel.x < 0: self.rect.right = plat.rect.left
+                               else: self.rect.left = plat.rect.right
+                               self.pos.x = self.rect.centerx
+                               wall_hit = True
+                               break
 
             # Edge Turnaround (Basic)
-            if self.on_ground and not wall_hit and abs(self.vel.x) > 0:
-                probe_offset_x = math.copysign(self.size[0] // 2 + 2, self.vel.x)
-                probe_y = self.rect.bottom + 5
-                probe_x = self.rect.centerx + probe_offset_x
-                ground_ahead = False
-                # Check against all platforms efficiently? Maybe spatial hash later.
-                probe_rect = pygame.Rect(probe_x-1, probe_y-1, 2, 2)
-                possible_ground = [p for p in platforms if p.rect.colliderect(probe_rect.inflate(TILE*2, 0))] # Optimisation TBD
-                for plat in possible_ground: # Use full platforms group for now
-                    if plat.rect.collidepoint(probe_x, probe_y) and plat.type in ["ground", "brick", "question", "pipe", "stair_block", "empty_block"]:
-                        ground_ahead = True
-                        break
-                if not ground_ahead:
-                     self.vel.x *= -1
+            with timings.phase("collision"):
+                if self.on_ground and not wall_hit and abs(self.vel.x) > 0:
+                    probe_offset_x = math.copysign(self.size[0] // 2 + 2, self.vel.x)
+                    probe_y = self.rect.bottom + 5
+                    probe_x = self.rect.centerx + probe_offset_x
+                    ground_ahead = False
+                    # Check against all platforms efficiently? Maybe spatial hash later.
+                    probe_rect = pygame.Rect(probe_x-1, probe_y-1, 2, 2)
+                    possible_ground = [p for p in platforms if p.rect.colliderect(probe_rect.inflate(TILE*2, 0))] # Optimisation TBD
+                    for plat in possible_ground: # Use full platforms group for now
+                        if plat.rect.collidepoint(probe_x, probe_y) and plat.type in ["ground", "brick", "question", "pipe", "stair_block", "empty_block"]:
+                            ground_ahead = True
+                            break
+                    if not ground_ahead:
+                         self.vel.x *= -1
 
         elif self.state == "squished":
-            if pygame.time.get_ticks() - self.kill_timer > GOOMBA_REMOVE_DELAY:
+            if game_ticks() - self.kill_timer > GOOMBA_REMOVE_DELAY:
                 self.kill()
 
     def stomp(self):
@@ -708,17 +868,22 @@ class Goomba(pygame.sprite.Sprite):
             original_bottom = self.rect.bottom
             self.rect.height = squish_height
             self.rect.bottom = original_bottom
-            self.kill_timer = pygame.time.get_ticks()
+            self.kill_timer = game_ticks()
             score += GOOMBA_SCORE
             # TODO: Play stomp sound
 
-    def draw_programmatic(self, surface, offset_x):
+    def draw_programmatic(self, surface, offset_x, alpha=1.0):
         # ... (Drawing code remains the same as v1.1, using TILE) ...
-        draw_x = round(self.rect.x - offset_x)
-        draw_y = round(self.rect.y)
+        x, y = interpolated_topleft(self, alpha)
+        draw_x = round(x - offset_x)
+        draw_y = round(y)
         # Culling
         if draw_x + TILE < 0 or draw_x > SCREEN_WIDTH: return
 
+        art = cached_art(("goomba", self.state, self.rect.height), TILE, self.rect.height, self.paint_art)
+        surface.blit(art, (draw_x - ART_MARGIN, draw_y - ART_MARGIN))
+
+    def paint_art(self, surface, draw_x, draw_y):
         if self.state == "walk":
             pygame.draw.ellipse(surface, COLOR_GOOMBA_BROWN, (draw_x, draw_y, TILE, TILE * 0.75))
             pygame.draw.rect(surface, COLOR_GOOMBA_BROWN, (draw_x, draw_y + TILE * 0.375, TILE, TILE * 0.375))
@@ -750,13 +915,13 @@ class Item(pygame.sprite.Sprite):
         self.rect.centerx = spawn_pos[0] # Set horizontal center
         self.pos = pygame.Vector2(self.rect.centerx, self.rect.bottom)
         self.vel = pygame.Vector2(0, -4) if self.type == "coin" else pygame.Vector2(0, -1.5)
-        self.spawn_time = pygame.time.get_ticks()
+        self.spawn_time = game_ticks()
         self.state = "spawning" # spawning, active, collected
         self.on_ground = False
         self.emerge_target_y = spawn_pos[1] - TILE # Target Y for mushroom emerge
 
     def update(self, platforms, delta_time):
-        now = pygame.time.get_ticks()
+        now = game_ticks()
 
         if self.state == "spawning":
             self.pos.y += self.vel.y * (delta_time * 60)
@@ -771,8 +936,8 @@ class Item(pygame.sprite.Sprite):
 
         elif self.state == "active":
             if self.type == "coin":
-                self.pos.y += self.vel.y * (delta_time * 60)
                 self.vel.y += GRAVITY * 0.3 * (delta_time * 60)
+                self.pos.y += self.vel.y * (delta_time * 60)
                 self.rect.bottom = round(self.pos.y)
                 if now - self.spawn_time > 600: self.kill()
             elif self.type == "mushroom":
@@ -782,35 +947,43 @@ class Item(pygame.sprite.Sprite):
                 self.rect.bottom = round(self.pos.y)
                 # Vertical Collision
                 self.on_ground = False
-                hits_y = pygame.sprite.spritecollide(self, platforms, False)
-                for plat in hits_y:
-                     if plat.type in ["ground", "brick", "question", "pipe", "stair_block", "empty_block"]:
-                         if self.vel.y > 0 and self.pos.y - self.vel.y*(delta_time*60) <= plat.rect.top + 1:
-                             self.rect.bottom = plat.rect.top + 1; self.pos.y = self.rect.bottom
-                             self.vel.y = 0; self.on_ground = True; break
+                with timings.phase("collision"):
+                    hits_y = pygame.sprite.spritecollide(self, platforms, False)
+                    for plat in hits_y:
+                         if plat.type in ["ground", "brick", "question", "pipe", "stair_block", "empty_block"]:
+                             if self.vel.y > 0 and self.pos.y - self.vel.y*(delta_time*60) <= plat.rect.top + 1:
+                                 self.rect.bottom = plat.rect.top + 1; self.pos.y = self.rect.bottom
+                                 self.vel.y = 0; self.on_ground = True; break
                 # Horizontal Movement
                 self.pos.x += self.vel.x * (delta_time * 60)
                 self.rect.centerx = round(self.pos.x)
                 # Horizontal Collision
-                hits_x = pygame.sprite.spritecollide(self, platforms, False)
-                for plat in hits_x:
-                     if plat.type in ["ground", "brick", "question", "pipe", "stair_block", "empty_block"]:
-                          self.vel.x *= -1
-                          if self.vel.x < 0: self.rect.right = plat.rect.left
-                          else: self.rect.left = plat.rect.right
-                          self.pos.x = self.rect.centerx; break
-
-    def draw_programmatic(self, surface, offset_x):
+                with timings.phase("collision"):
+                    hits_x = pygame.sprite.spritecollide(self, platforms, False)
+                    for plat in hits_x:
+                         if plat.type in ["ground", "brick", "question", "pipe", "stair_block", "empty_block"]:
+                              self.vel.x *= -1
+                              if self.vel.x < 0: self.rect.right = plat.rect.left
+                              else: self.rect.left = plat.rect.right
+                              self.pos.x = self.rect.centerx; break
+
+    def draw_programmatic(self, surface, offset_x, alpha=1.0):
         # ... (Drawing code remains the same as v1.1, using TILE) ...
-        draw_x = round(self.rect.x - offset_x)
-        draw_y = round(self.rect.y)
+        x, y = interpolated_topleft(self, alpha)
+        draw_x = round(x - offset_x)
+        draw_y = round(y)
         # Culling
         if draw_x + self.size[0] < 0 or draw_x > SCREEN_WIDTH: return
 
+        anim_phase = ((game_ticks() - self.spawn_time) // 80) % 4 if self.type == "coin" else 0
+        art = cached_art(("item", self.type, self.size, anim_phase), self.size[0], self.size[1],
+                         lambda art, x, y: self.paint_art(art, x, y, anim_phase))
+        surface.blit(art, (draw_x - ART_MARGIN, draw_y - ART_MARGIN))
+
+    def paint_art(self, surface, draw_x, draw_y, anim_phase):
         draw_rect = pygame.Rect(draw_x, draw_y, self.size[0], self.size[1])
 
         if self.type == "coin":
-             anim_phase = ((pygame.time.get_ticks() - self.spawn_time) // 80) % 4
              coin_color = COLOR_COIN; outline_color = COLOR_BLACK
              if anim_phase == 0: # Full ellipse
                  pygame.draw.ellipse(surface, coin_color, draw_rect)
@@ -991,6 +1164,15 @@ def create_level():
     return all_sprites_group, platforms_group, enemies_group, items_group, background_elements
 
 
+# --- Command Line ---
+parser = argparse.ArgumentParser(description="World 1-1 layout simulation")
+parser.add_argument("--record", metavar="PATH", help="save the input of this run to PATH on exit")
+parser.add_argument("--replay", metavar="PATH", help="replay a recording headlessly and report timings")
+parser.add_argument("--expect-hash", help="with --replay, exit with status 1 unless the final state hash matches")
+args = parser.parse_args()
+if args.replay:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # Nothing to look at; run without a window
+
 # --- Game Initialization ---
 pygame.init()
 # pygame.mixer.quit() # No sound needed / implemented
@@ -1005,13 +1187,29 @@ except Exception as e:
 
 # --- Game Variables ---
 running = True
+timestep = FixedStep() # Game logic runs at a fixed rate, independent of the frame rate
 camera_x = 0
+prev_camera_x = 0 # camera_x before the latest step, for interpolated drawing
 score = 0
 coins = 0
 lives = 3
 world_str = "1-1"
 time_left = GAME_START_TIME
-time_last_tick = pygame.time.get_ticks()
+time_last_tick = game_ticks()
+held_buttons = 0 # Input mask of the previous step, for spotting presses and releases
+timings = PhaseTimer(enabled=bool(args.replay)) # Time spent updating, colliding and drawing
+
+# --- Input Recording / Replay ---
+# Recorded runs replay exactly: the RNG is seeded from the file and every step reads its mask
+if args.replay:
+    replay = Recording.load(args.replay)
+    recording = None
+    random.seed(replay.seed)
+else:
+    replay = None
+    seed = random.randrange(2 ** 32)
+    random.seed(seed)
+    recording = Recording(seed, world_str) if args.record else None
 
 # --- Create Sprites and Level ---
 all_sprites, platforms, enemies, items, background_data = create_level()
@@ -1023,153 +1221,165 @@ player_start_y = SCREEN_HEIGHT - TILE*4 - TILE*2 - 1  # On top of a question blo
 player.rect.bottomleft = (player_start_x, player_start_y)
 player.pos = pygame.Vector2(player.rect.centerx, player.rect.bottom)
 all_sprites.add(player) # Add player to the main sprite group
+static_layer = StaticLayer(LEVEL_END_X, background_data, platforms)
 
 
 # --- Main Game Loop ---
 while running:
-    # Delta Time for physics scaling
-    delta_time = clock.tick(TARGET_FPS) / 1000.0
-    # Avoid huge jumps in delta_time if debugging/lagging
-    delta_time = min(delta_time, 0.05)
-
-    # --- Event Handling ---
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE or event.key == pygame.K_UP:
-                player.jump()
-            if event.key == pygame.K_ESCAPE:
-                 running = False
-            # Debug keys
-            if event.key == pygame.K_g: player.grow()
-            if event.key == pygame.K_s: player.shrink()
-        if event.type == pygame.KEYUP:
-            if event.key == pygame.K_SPACE or event.key == pygame.K_UP:
-                player.jump_cut()  # Cut jump height when button released
-
-    # --- Updates ---
-    # Update sprites with appropriate arguments for each type
-    if not player.is_dead:
-        player.update(platforms, delta_time)
+    if replay:
+        # One recorded step per frame, as fast as the machine allows; the recording decides when it ends
+        if timestep.steps >= len(replay.masks):
+            break
+        frame_time = timestep.dt
+        pygame.event.pump()
     else:
-        player.update(platforms, delta_time)  # Still call update for death animation
-        
-    # Update enemies and items with delta time
-    for enemy in enemies:
-        enemy.update(platforms, delta_time)
-    
-    for item in items:
-        item.update(platforms, delta_time)
-        
-    # Update platforms without extra arguments
-    platforms.update()
-
-    # --- Camera Scrolling Logic ---
-    # Target camera X to keep player roughly in the center-left
-    target_camera_x = player.pos.x - SCREEN_WIDTH / 3
-    # Clamp camera: cannot scroll left past 0, cannot scroll right past level end
-    camera_x = max(0, min(target_camera_x, LEVEL_END_X - SCREEN_WIDTH))
-
-
-    # --- Item Spawning from Hit Blocks ---
-    spawned_items_this_frame = []
-    for plat in platforms:
-        if hasattr(plat, 'item_spawn_info') and plat.item_spawn_info:
-            item_type, spawn_pos = plat.item_spawn_info
-            new_item = Item(item_type, spawn_pos)
-            spawned_items_this_frame.append(new_item)
-            plat.item_spawn_info = None
-    if spawned_items_this_frame:
-         items.add(spawned_items_this_frame)
-         all_sprites.add(spawned_items_this_frame)
-
-
-    # --- Interactions ---
-    # Item Collection
-    item_hits = pygame.sprite.spritecollide(player, items, True)
-    for item in item_hits:
-        if item.type == "mushroom":
-            if player.state == "small": player.grow()
-            score += MUSHROOM_SCORE
-            # TODO: Sound effect
-        elif item.type == "coin":
-             # Score already handled
-             # TODO: Sound effect
-             pass
-
-    # Enemy Collision
-    if not player.is_dead and player.invincible_timer == 0:
-        enemy_hits = pygame.sprite.spritecollide(player, enemies, False)
-        for enemy in enemy_hits:
-            # Check for stomp: Player falling, feet near/above enemy top
-            is_stomp = player.vel.y > 0 and player.rect.bottom <= enemy.rect.centery + 5 # Generous stomp check
-
-            if is_stomp and enemy.state == "walk":
-                enemy.stomp()
-                player.vel.y = STOMP_BOUNCE # Bounce
-            elif enemy.state == "walk": # Player running into enemy
-                if player.hit(): # Check if hit causes death
-                     player.die() # Start death sequence
-                     break # Stop checking enemies
-
-    # --- Game State Checks ---
-    # Player falling off screen
-    if not player.is_dead and player.rect.top > SCREEN_HEIGHT:
-         player.die()
-
-    # Timer Decrement
-    now = pygame.time.get_ticks()
-    if not player.is_dead: # Stop timer ticking if player is dead
-        time_tick_interval = 400 # ms per game 'second'
-        while now - time_last_tick >= time_tick_interval:
-            time_left -= 1
-            time_last_tick += time_tick_interval
-            if time_left < 0:
-                time_left = 0
-                player.die() # Time up
-                break
+        # Time since last frame in seconds; game logic consumes it in fixed steps
+        frame_time = clock.tick(TARGET_FPS) / 1000.0
+
+        # --- Event Handling ---
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                     running = False
+                # Debug keys (not recorded)
+                if event.key == pygame.K_g: player.grow()
+                if event.key == pygame.K_s: player.shrink()
+        buttons = read_buttons()
+
+    # --- Updates (fixed steps, however long the frame took) ---
+    for delta_time in timestep.advance(frame_time):
+        if replay:
+            buttons = replay.masks[timestep.steps - 1]
+        elif recording:
+            recording.append(buttons)
+
+        # Remember where things were, so drawing can interpolate towards where they end up
+        prev_camera_x = camera_x
+        for sprite in (player, *enemies, *items):
+            sprite.prev_topleft = sprite.rect.topleft
+
+        # Jump on the step the button goes down; releasing it early cuts the jump short
+        if buttons & ~held_buttons & BUTTON_JUMP:
+            player.jump()
+        elif held_buttons & ~buttons & BUTTON_JUMP:
+            player.jump_cut()
+        held_buttons = buttons
+        player.buttons = buttons
+
+        with timings.phase("update"):
+            # Update sprites with appropriate arguments for each type
+            if not player.is_dead:
+                player.update(platforms, delta_time)
+            else:
+                player.update(platforms, delta_time)  # Still call update for death animation
+
+            # Update enemies and items with delta time
+            for enemy in enemies:
+                enemy.update(platforms, delta_time)
+
+            for item in items:
+                item.update(platforms, delta_time)
+
+            # Update platforms without extra arguments
+            platforms.update()
+
+            # --- Camera Scrolling Logic ---
+            # Target camera X to keep player roughly in the center-left
+            target_camera_x = player.pos.x - SCREEN_WIDTH / 3
+            # Clamp camera: cannot scroll left past 0, cannot scroll right past level end
+            camera_x = max(0, min(target_camera_x, LEVEL_END_X - SCREEN_WIDTH))
+
+        with timings.phase("collision"):
+            # --- Item Spawning from Hit Blocks ---
+            spawned_items_this_frame = []
+            for plat in platforms:
+                if hasattr(plat, 'item_spawn_info') and plat.item_spawn_info:
+                    item_type, spawn_pos = plat.item_spawn_info
+                    new_item = Item(item_type, spawn_pos)
+                    spawned_items_this_frame.append(new_item)
+                    plat.item_spawn_info = None
+            if spawned_items_this_frame:
+                 items.add(spawned_items_this_frame)
+                 all_sprites.add(spawned_items_this_frame)
+
+
+            # --- Interactions ---
+            # Item Collection
+            item_hits = pygame.sprite.spritecollide(player, items, True)
+            for item in item_hits:
+                if item.type == "mushroom":
+                    if player.state == "small": player.grow()
+                    score += MUSHROOM_SCORE
+                    # TODO: Sound effect
+                elif item.type == "coin":
+                     # Score already handled
+                     # TODO: Sound effect
+                     pass
+
+            # Enemy Collision
+            if not player.is_dead and player.invincible_timer == 0:
+                enemy_hits = pygame.sprite.spritecollide(player, enemies, False)
+                for enemy in enemy_hits:
+                    # Check for stomp: Player falling, feet near/above enemy top
+                    is_stomp = player.vel.y > 0 and player.rect.bottom <= enemy.rect.centery + 5 # Generous stomp check
+
+                    if is_stomp and enemy.state == "walk":
+                        enemy.stomp()
+                        player.vel.y = STOMP_BOUNCE # Bounce
+                    elif enemy.state == "walk": # Player running into enemy
+                        if player.hit(): # Check if hit causes death
+                             player.die() # Start death sequence
+                             break # Stop checking enemies
+
+            # --- Game State Checks ---
+            # Player falling off screen
+            if not player.is_dead and player.rect.top > SCREEN_HEIGHT:
+                 player.die()
+
+            # Timer Decrement
+            now = game_ticks()
+            if not player.is_dead: # Stop timer ticking if player is dead
+                time_tick_interval = 400 # ms per game 'second'
+                while now - time_last_tick >= time_tick_interval:
+                    time_left -= 1
+                    time_last_tick += time_tick_interval
+                    if time_left < 0:
+                        time_left = 0
+                        player.die() # Time up
+                        break
 
 
     # --- Drawing ---
-    # Fill background
-    screen.fill(COLOR_SKY_BLUE)
-
-    # Draw static background elements (relative to camera)
-    ground_y_coord = SCREEN_HEIGHT - TILE * 2 # Reference for placing hills etc.
-    for elem in background_data:
-        elem_type = elem[0]
-        x = elem[1]
-        y = elem[2] # This is ground Y for hills/castle/flagpole
-        if elem_type == 'cloud':
-            size = elem[3]
-            draw_cloud(screen, x, y, size, camera_x) # Y is absolute cloud level
-        elif elem_type == 'hill':
-            size = elem[3]
-            draw_hill(screen, x, ground_y_coord, size, camera_x) # Y needs to be ground level
-        elif elem_type == 'flagpole':
-            draw_flagpole(screen, x, ground_y_coord, camera_x)
-        elif elem_type == 'castle':
-            draw_castle(screen, x, ground_y_coord, camera_x)
-
-
-    # Draw all sprites (platforms, enemies, items, player)
-    for entity in all_sprites:
-         if hasattr(entity, 'draw_programmatic'):
-             entity.draw_programmatic(screen, camera_x)
-
-
-    # Draw HUD
-    if font:
-        score_surf = font.render(f"MARIO {score:06d}", True, COLOR_WHITE)
-        coins_surf = font.render(f" C x{coins:02d}", True, COLOR_WHITE)
-        world_surf = font.render(f"WORLD {world_str}", True, COLOR_WHITE)
-        time_surf = font.render(f"TIME {max(0, time_left):03d}", True, COLOR_WHITE)
-        hud_y = 10
-        screen.blit(score_surf, (20, hud_y))
-        screen.blit(coins_surf, (SCREEN_WIDTH * 0.35, hud_y))
-        screen.blit(world_surf, (SCREEN_WIDTH * 0.60, hud_y))
-        screen.blit(time_surf, (SCREEN_WIDTH * 0.85, hud_y))
+    with timings.phase("draw"):
+        # Sky, background elements and resting blocks come pre-rendered from the static layer
+        # Everything is drawn `alpha` of the way between the last two steps
+        alpha = timestep.alpha
+        draw_camera_x = lerp(prev_camera_x, camera_x, alpha)
+        static_layer.draw(screen, draw_camera_x)
+
+        # Draw the moving and animated sprites (draw_programmatic skips anything off-screen)
+        for plat in static_layer.animated:
+            plat.draw_programmatic(screen, draw_camera_x)
+        for entity in enemies:
+            entity.draw_programmatic(screen, draw_camera_x, alpha)
+        player.draw_programmatic(screen, draw_camera_x, alpha)
+        for entity in items:
+            entity.draw_programmatic(screen, draw_camera_x, alpha)
+
+
+        # Draw HUD
+        if font:
+            score_surf = font.render(f"MARIO {score:06d}", True, COLOR_WHITE)
+            coins_surf = font.render(f" C x{coins:02d}", True, COLOR_WHITE)
+            world_surf = font.render(f"WORLD {world_str}", True, COLOR_WHITE)
+            time_surf = font.render(f"TIME {max(0, time_left):03d}", True, COLOR_WHITE)
+            hud_y = 10
+            screen.blit(score_surf, (20, hud_y))
+            screen.blit(coins_surf, (SCREEN_WIDTH * 0.35, hud_y))
+            screen.blit(world_surf, (SCREEN_WIDTH * 0.60, hud_y))
+            screen.blit(time_surf, (SCREEN_WIDTH * 0.85, hud_y))
 
 
     # --- Update Display ---
@@ -1177,4 +1387,20 @@ while running:
 
 # --- Quit Pygame ---
 pygame.quit()
-sys.exit()
+status = 0
+if recording:
+    recording.save(args.record)
+    print(f"Saved {len(recording.masks)} steps of input to {args.record}")
+if replay:
+    final_hash = state_hash(
+        tuple(player.rect), tuple(player.pos), tuple(player.vel), player.state, player.is_dead,
+        score, coins, lives, time_left,
+        tuple((tuple(enemy.rect), enemy.state) for enemy in enemies),
+        tuple((tuple(item.rect), item.type) for item in items),
+        tuple((tuple(plat.rect), plat.hit_state) for plat in platforms))
+    print(timings.report(len(replay.masks)))
+    print(f"state hash {final_hash}")
+    if args.expect_hash and final_hash != args.expect_hash:
+        print(f"expected {args.expect_hash}", file=sys.stderr)
+        status = 1
+sys.exit(status)
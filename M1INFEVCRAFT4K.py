@@ -1,5 +1,6 @@
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
+from voxelray import voxel_raycast
 
 app = Ursina()
 
@@ -18,6 +19,8 @@ sky_texture = load_texture('skybox.png')
 arm_texture = load_texture('arm_texture.png')
 
 block_pick = 1
+PICK_DISTANCE = 8
+voxels = {}  # (x, y, z) -> Voxel, for the pick ray
 
 # Define the voxel/block class
 class Voxel(Button):
@@ -31,20 +34,30 @@ class Voxel(Button):
             color=color.color(0, 0, random.uniform(0.9, 1)),
             highlight_color=color.lime,
         )
+        voxels[tuple(round(c) for c in self.position)] = self
 
-    def input(self, key):
-        if self.hovered:
-            if key == 'left mouse down':
-                if block_pick == 1:
-                    voxel = Voxel(position=self.position + mouse.normal, texture=grass_texture)
-                if block_pick == 2:
-                    voxel = Voxel(position=self.position + mouse.normal, texture=stone_texture)
-                if block_pick == 3:
-                    voxel = Voxel(position=self.position + mouse.normal, texture=dirt_texture)
-                if block_pick == 4:
-                    voxel = Voxel(position=self.position + mouse.normal, texture=brick_texture)
-            if key == 'right mouse down':
-                destroy(self)
+# Left click builds on the face the view ray enters, right click breaks the block.
+# The ray steps through the voxels grid; origin_y=0.5 puts each block one unit
+# below its position, so the eye is shifted up by that much.
+def input(key):
+    if key not in ('left mouse down', 'right mouse down'):
+        return
+    hit = voxel_raycast(camera.world_position + Vec3(0.5, 1, 0.5), camera.forward, PICK_DISTANCE, voxels.__contains__)
+    if not hit:
+        return
+    cell, normal = hit
+    position = Vec3(*cell) + Vec3(*normal)
+    if key == 'left mouse down' and any(normal):
+        if block_pick == 1:
+            voxel = Voxel(position=position, texture=grass_texture)
+        if block_pick == 2:
+            voxel = Voxel(position=position, texture=stone_texture)
+        if block_pick == 3:
+            voxel = Voxel(position=position, texture=dirt_texture)
+        if block_pick == 4:
+            voxel = Voxel(position=position, texture=brick_texture)
+    if key == 'right mouse down':
+        destroy(voxels.pop(cell))
 
 # Define the sky
 class Sky(Entity):
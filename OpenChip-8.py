@@ -1,21 +1,39 @@
 import pygame
 import zipfile
 import os
-import requests
+import sys
+
+from chip8core import Chip8 as Chip8Core
+
+# Chip-8 hex keypad layout on the left of a QWERTY keyboard
+KEYMAP = {
+    pygame.K_1: 0x1, pygame.K_2: 0x2, pygame.K_3: 0x3, pygame.K_4: 0xC,
+    pygame.K_q: 0x4, pygame.K_w: 0x5, pygame.K_e: 0x6, pygame.K_r: 0xD,
+    pygame.K_a: 0x7, pygame.K_s: 0x8, pygame.K_d: 0x9, pygame.K_f: 0xE,
+    pygame.K_z: 0xA, pygame.K_x: 0x0, pygame.K_c: 0xB, pygame.K_v: 0xF,
+}
 
 class Chip8:
     def __init__(self):
-        # Initialize Chip-8 state...
-        pass
+        # Initialize Chip-8 state (the shared core from chip8core.py)...
+        self.core = Chip8Core()
+        self.instructions_per_frame = 10
 
     def load_rom(self, rom_path):
         # Load a ROM file into memory...
         with open(rom_path, 'rb') as f:
             self.rom_data = f.read()
+        self.core.load_bytes(self.rom_data)
+
+    def load_rom_from_zip(self, zip_path, name):
+        # Load a ROM stored inside a zip archive without extracting it
+        with zipfile.ZipFile(zip_path, "r") as zfile:
+            self.rom_data = zfile.read(name)
+        self.core.load_bytes(self.rom_data)
 
     def run(self):
-        # Emulate the Chip-8...
-        pass
+        # Emulate one 60Hz frame: a batch of instructions, then the timers
+        self.core.run_frame(self.instructions_per_frame)
 
 class GUI:
     def __init__(self, chip8):
@@ -25,11 +43,24 @@ class GUI:
 
     def draw(self):
         # Draw the Chip-8's screen state to the window...
-        pass
+        core = self.chip8.core
+        if not core.dirty_rows:
+            return
+        frame = pygame.image.frombuffer(bytes(core.gfx), (core.width, core.height), 'P')
+        frame.set_palette([(0, 0, 0), (255, 255, 255)])
+        self.screen.blit(pygame.transform.scale(frame, self.screen.get_size()), (0, 0))
+        pygame.display.flip()
+        core.dirty_rows.clear()
 
     def handle_events(self):
         # Handle user input...
-        pass
+        keys = self.chip8.core.keys
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                raise SystemExit
+            elif event.type in (pygame.KEYDOWN, pygame.KEYUP) and event.key in KEYMAP:
+                keys[KEYMAP[event.key]] = 1 if event.type == pygame.KEYDOWN else 0
 
 def inspect_zip_for_modules(zip_path):
     # Inspect a zipfile for modules (could be adapted for ROMs)...
@@ -40,31 +71,33 @@ def inspect_zip_for_modules(zip_path):
                 result.append(name)
     return result
 
-def download_bios(url, bios_path):
-    # Download a BIOS file from the internet...
-    response = requests.get(url)
-    with open(bios_path, 'wb') as f:
-        f.write(response.content)
-
-def main():
-    # Create the Chip-8 emulator and GUI...
+def main(argv=None):
+    # Chip-8 has no BIOS: the font lives in the core, so a ROM is all that's needed
+    argv = sys.argv[1:] if argv is None else argv
+    rom_path = argv[0] if argv else 'roms.zip'
+    if not os.path.exists(rom_path):
+        print(f"Usage: OpenChip-8.py [ROM.ch8 | ROMS.zip]  ({rom_path} not found)")
+        return 1
     chip8 = Chip8()
-    gui = GUI(chip8)
-
-    # Load a ROM...
-    roms = inspect_zip_for_modules('roms.zip')
-    if roms:
-        chip8.load_rom(roms[0])
 
-    # Download and load a BIOS...
-    download_bios('http://example.com/bios.ch8', 'bios.ch8')
-    chip8.load_bios('bios.ch8')
+    # Load a ROM: a .ch8 file, or the first .ch8 inside a zip archive...
+    if zipfile.is_zipfile(rom_path):
+        roms = inspect_zip_for_modules(rom_path)
+        if not roms:
+            print(f"No .ch8 ROMs in {rom_path}")
+            return 1
+        chip8.load_rom_from_zip(rom_path, roms[0])
+    else:
+        chip8.load_rom(rom_path)
 
-    # Run the emulator...
+    # Create the GUI and run the emulator...
+    gui = GUI(chip8)
+    clock = pygame.time.Clock()
     while True:
         chip8.run()
         gui.draw()
         gui.handle_events()
+        clock.tick(60)
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,620 @@
+#!/usr/bin/env python3
+"""
+GUI-less Chip-8 / SCHIP core shared by emuchipv8-.py and OpenChip-8.py.
+
+Run directly it is a test-ROM harness: it executes a ROM for a fixed number of
+instructions, checks the framebuffer hash and registers against expectations
+and reports instructions per second, without needing a display server.
+
+    python chip8core.py test.ch8 --instructions 100000 --expect-hash 3f2a... --expect V0=0x12
+    python chip8core.py --manifest roms.txt
+"""
+
+import argparse
+import hashlib
+import random
+import sys
+import time
+
+# Interpreter quirks that ROMs disagree on:
+#  shift        - 8XY6/8XYE shift Vx in place instead of copying Vy first
+#  load_store_i - FX55/FX65 leave I pointing past the last register
+#  clip         - sprites are clipped at the screen edge instead of wrapping
+#
+# CLASSIC is what emuchipv8-.py always did (in-place shifts, I untouched by
+# FX55/FX65, wrapping sprites) and stays the default so existing ROMs behave
+# as before; the others are opt-in.
+QUIRK_PROFILES = {
+    "CLASSIC": {"shift": True,  "load_store_i": False, "clip": False},
+    "CHIP-8":  {"shift": False, "load_store_i": True,  "clip": True},
+    "SCHIP":   {"shift": True,  "load_store_i": False, "clip": True},
+    "XO-CHIP": {"shift": False, "load_store_i": True,  "clip": False},
+}
+DEFAULT_QUIRKS = "CLASSIC"
+
+# SCHIP 8x10 digits for FX30, stored right after the small font
+BIG_FONT_START = 0xA0
+BIG_FONTSET = [
+    0x3C,0x7E,0xE7,0xC3,0xC3,0xC3,0xC3,0xE7,0x7E,0x3C, # 0
+    0x18,0x38,0x58,0x18,0x18,0x18,0x18,0x18,0x18,0x3C, # 1
+    0x3E,0x7F,0xC3,0x06,0x0C,0x18,0x30,0x60,0xFF,0xFF, # 2
+    0x3C,0x7E,0xC3,0x03,0x0E,0x0E,0x03,0xC3,0x7E,0x3C, # 3
+    0x06,0x0E,0x1E,0x36,0x66,0xC6,0xFF,0xFF,0x06,0x06, # 4
+    0xFF,0xFF,0xC0,0xC0,0xFC,0xFE,0x03,0xC3,0x7E,0x3C, # 5
+    0x3E,0x7C,0xE0,0xC0,0xFC,0xFE,0xC3,0xC3,0x7E,0x3C, # 6
+    0xFF,0xFF,0x03,0x06,0x0C,0x18,0x30,0x60,0x60,0x60, # 7
+    0x3C,0x7E,0xC3,0xC3,0x7E,0x7E,0xC3,0xC3,0x7E,0x3C, # 8
+    0x3C,0x7E,0xC3,0xC3,0x7F,0x3F,0x03,0x03,0x3E,0x7C  # 9
+]
+
+class Chip8:
+    def __init__(self, quirks=DEFAULT_QUIRKS):
+        """
+        Create a Chip-8 machine with an empty program.
+
+        Parameters
+        ----------
+        quirks : str
+            Name of the QUIRK_PROFILES entry to emulate.
+        """
+        # Chip-8 Specs
+        self.MEMORY_SIZE = 4096
+        self.SCREEN_WIDTH = 64
+        self.SCREEN_HEIGHT = 32
+        self.PROGRAM_START = 0x200
+
+        # Key states for 16 Chip-8 keys (0-F)
+        self.keys = [0] * 16
+
+        # Called when the sound timer runs out
+        self.on_beep = None
+
+        # Quirk profile (see QUIRK_PROFILES)
+        self.set_quirks(quirks)
+
+        self.load_bytes(b"")
+
+    def load_rom(self, rom_path):
+        """Load a Chip-8 ROM from disk into emulator memory at 0x200."""
+        with open(rom_path, "rb") as f:
+            self.load_bytes(f.read())
+
+    def load_bytes(self, data):
+        """Reset the machine and place a program at 0x200."""
+        # Clear memory & reload font
+        self.memory = [0] * self.MEMORY_SIZE
+        self.load_fontset()
+
+        # Write ROM to memory
+        for i, b in enumerate(data):
+            self.memory[self.PROGRAM_START + i] = b
+
+        # Reset CPU state
+        self.V = [0] * 16  # V0..VF
+        self.I = 0
+        self.pc = self.PROGRAM_START
+        self.stack = []
+        self.sp = 0
+        self.delay_timer = 0
+        self.sound_timer = 0
+        # Set by the SCHIP EXIT instruction
+        self.halted = False
+
+        # Predecoded instructions by address: (handler, x, y, n, nn, nnn),
+        # filled on first execution and cleared when FX33/FX55 write memory
+        self.decoded = [None] * self.MEMORY_SIZE
+
+        # SCHIP RPL user flags (FX75/FX85)
+        self.rpl = [0] * 8
+
+        # Graphics buffer, one byte per pixel in row-major order; 64x32, or
+        # 128x64 while SCHIP hi-res mode is on. dirty_rows collects the rows
+        # touched by CLS/DRW/scrolls until the front end redraws them.
+        self.set_resolution(False)
+
+    def set_quirks(self, profile):
+        """Select one of the QUIRK_PROFILES by name."""
+        quirks = QUIRK_PROFILES[profile]
+        self.quirk_profile = profile
+        self.quirk_shift = quirks["shift"]
+        self.quirk_load_store_i = quirks["load_store_i"]
+        self.quirk_clip = quirks["clip"]
+
+    def set_resolution(self, hires):
+        """Switch between 64x32 and SCHIP 128x64 mode, clearing the screen."""
+        self.hires = hires
+        self.width = self.SCREEN_WIDTH * (2 if hires else 1)
+        self.height = self.SCREEN_HEIGHT * (2 if hires else 1)
+        self.gfx = bytearray(self.width * self.height)
+        self.dirty_rows = set(range(self.height))
+
+    def frame_hash(self):
+        """Short SHA-1 of the display mode and framebuffer, for test expectations."""
+        digest = hashlib.sha1(bytes([self.hires]) + bytes(self.gfx))
+        return digest.hexdigest()[:16]
+
+    # ----------------------------
+    # Fontset
+    # ----------------------------
+    def load_fontset(self):
+        """Load the standard Chip-8 4x5 font into memory at 0x50."""
+        fontset = [
+            0xF0,0x90,0x90,0x90,0xF0, # 0
+            0x20,0x60,0x20,0x20,0x70, # 1
+            0xF0,0x10,0xF0,0x80,0xF0, # 2
+            0xF0,0x10,0xF0,0x10,0xF0, # 3
+            0x90,0x90,0xF0,0x10,0x10, # 4
+            0xF0,0x80,0xF0,0x10,0xF0, # 5
+            0xF0,0x80,0xF0,0x90,0xF0, # 6
+            0xF0,0x10,0x20,0x40,0x40, # 7
+            0xF0,0x90,0xF0,0x90,0xF0, # 8
+            0xF0,0x90,0xF0,0x10,0xF0, # 9
+            0xF0,0x90,0xF0,0x90,0x90, # A
+            0xE0,0x90,0xE0,0x90,0xE0, # B
+            0xF0,0x80,0x80,0x80,0xF0, # C
+            0xE0,0x90,0xE0,0x90,0xE0, # D
+            0xF0,0x80,0xF0,0x80,0xF0, # E
+            0xF0,0x80,0xF0,0x80,0x80  # F
+        ]
+        start = 0x50
+        for i, b in enumerate(fontset):
+            self.memory[start + i] = b
+        for i, b in enumerate(BIG_FONTSET):
+            self.memory[BIG_FONT_START + i] = b
+
+    # ----------------------------
+    # Execution
+    # ----------------------------
+    def run(self, count):
+        """Execute up to count instructions, stopping early on EXIT."""
+        emulate_cycle = self.emulate_cycle
+        for _ in range(count):
+            if self.halted:
+                break
+            emulate_cycle()
+
+    def run_frame(self, instructions_per_frame):
+        """Execute one 60Hz tick: a batch of instructions followed by a timer update."""
+        self.run(instructions_per_frame)
+        self.update_timers()
+
+    # ----------------------------
+    # Fetch/Decode/Execute
+    # ----------------------------
+    def emulate_cycle(self):
+        """One CPU cycle: fetch the (predecoded) instruction and execute it."""
+        pc = self.pc
+        entry = self.decoded[pc]
+        if entry is None:
+            entry = self.decoded[pc] = self.decode(pc)
+        self.pc = pc + 2
+        handler, x, y, n, nn, nnn = entry
+        handler(x, y, n, nn, nnn)
+
+    def decode(self, addr):
+        """Decode the opcode at addr into (bound handler, x, y, n, nn, nnn)."""
+        opcode = (self.memory[addr] << 8) | self.memory[(addr + 1) & 0xFFF]
+
+        # Extract parts
+        x = (opcode & 0x0F00) >> 8
+        y = (opcode & 0x00F0) >> 4
+        n = opcode & 0x000F
+        nn = opcode & 0x00FF
+        nnn = opcode & 0x0FFF
+
+        family = opcode >> 12
+        if family == 0x0:
+            if (opcode & 0xFFF0) == 0x00C0:
+                handler = self.op_scroll_down
+            else:
+                handler = self.SYSTEM_OPS.get(opcode)
+        elif family == 0x5 or family == 0x9:
+            handler = self.FAMILY_OPS[family] if n == 0 else None
+        elif family == 0x8:
+            handler = self.ALU_OPS.get(n)
+        elif family == 0xE:
+            handler = self.KEY_OPS.get(nn)
+        elif family == 0xF:
+            handler = self.MISC_OPS.get(nn)
+        else:
+            handler = self.FAMILY_OPS[family]
+        if handler is None:
+            return (self.op_unknown, x, y, n, nn, opcode)
+        # The tables hold plain functions; bind them to this instance
+        return (handler.__get__(self), x, y, n, nn, nnn)
+
+    def invalidate(self, addr):
+        """Drop the decoded instructions that include the byte at addr."""
+        addr &= 0xFFF
+        self.decoded[addr] = None
+        self.decoded[addr - 1] = None
+
+    def op_unknown(self, x, y, n, nn, opcode):
+        print(f"Unknown opcode: {opcode:04X}")
+
+    def op_cls(self, x, y, n, nn, nnn):
+        # CLS
+        self.gfx[:] = bytes(len(self.gfx))
+        self.dirty_rows.update(range(self.height))
+
+    def op_ret(self, x, y, n, nn, nnn):
+        # RET
+        self.pc = self.stack.pop()
+
+    def op_scroll_down(self, x, y, n, nn, nnn):
+        # SCD n (SCHIP): scroll the display down n rows
+        shift = n * self.width
+        if shift:
+            self.gfx[shift:] = self.gfx[:-shift]
+            self.gfx[:shift] = bytes(shift)
+        self.dirty_rows.update(range(self.height))
+
+    def op_scroll_right(self, x, y, n, nn, nnn):
+        # SCR (SCHIP): scroll the display right 4 pixels
+        width = self.width
+        for base in range(0, len(self.gfx), width):
+            self.gfx[base:base + width] = bytes(4) + self.gfx[base:base + width - 4]
+        self.dirty_rows.update(range(self.height))
+
+    def op_scroll_left(self, x, y, n, nn, nnn):
+        # SCL (SCHIP): scroll the display left 4 pixels
+        width = self.width
+        for base in range(0, len(self.gfx), width):
+            self.gfx[base:base + width] = self.gfx[base + 4:base + width] + bytes(4)
+        self.dirty_rows.update(range(self.height))
+
+    def op_exit(self, x, y, n, nn, nnn):
+        # EXIT (SCHIP)
+        self.halted = True
+
+    def op_lores(self, x, y, n, nn, nnn):
+        # LOW (SCHIP)
+        self.set_resolution(False)
+
+    def op_hires(self, x, y, n, nn, nnn):
+        # HIGH (SCHIP)
+        self.set_resolution(True)
+
+    def op_jp(self, x, y, n, nn, nnn):
+        # JP nnn
+        self.pc = nnn
+
+    def op_call(self, x, y, n, nn, nnn):
+        # CALL nnn
+        self.stack.append(self.pc)
+        self.pc = nnn
+
+    def op_se(self, x, y, n, nn, nnn):
+        # SE Vx, nn
+        if self.V[x] == nn:
+            self.pc += 2
+
+    def op_sne(self, x, y, n, nn, nnn):
+        # SNE Vx, nn
+        if self.V[x] != nn:
+            self.pc += 2
+
+    def op_se_reg(self, x, y, n, nn, nnn):
+        # SE Vx, Vy
+        if self.V[x] == self.V[y]:
+            self.pc += 2
+
+    def op_ld(self, x, y, n, nn, nnn):
+        # LD Vx, nn
+        self.V[x] = nn
+
+    def op_add(self, x, y, n, nn, nnn):
+        # ADD Vx, nn
+        self.V[x] = (self.V[x] + nn) & 0xFF
+
+    def op_ld_reg(self, x, y, n, nn, nnn):
+        # LD Vx, Vy
+        self.V[x] = self.V[y]
+
+    def op_or(self, x, y, n, nn, nnn):
+        # OR Vx, Vy
+        self.V[x] |= self.V[y]
+
+    def op_and(self, x, y, n, nn, nnn):
+        # AND Vx, Vy
+        self.V[x] &= self.V[y]
+
+    def op_xor(self, x, y, n, nn, nnn):
+        # XOR Vx, Vy
+        self.V[x] ^= self.V[y]
+
+    def op_add_reg(self, x, y, n, nn, nnn):
+        # ADD Vx, Vy
+        s = self.V[x] + self.V[y]
+        self.V[x] = s & 0xFF
+        self.V[0xF] = 1 if s > 0xFF else 0
+
+    def op_sub(self, x, y, n, nn, nnn):
+        # SUB Vx, Vy
+        flag = 1 if self.V[x] >= self.V[y] else 0
+        self.V[x] = (self.V[x] - self.V[y]) & 0xFF
+        self.V[0xF] = flag
+
+    def op_shr(self, x, y, n, nn, nnn):
+        # SHR Vx {, Vy}
+        value = self.V[x] if self.quirk_shift else self.V[y]
+        self.V[x] = value >> 1
+        self.V[0xF] = value & 1
+
+    def op_subn(self, x, y, n, nn, nnn):
+        # SUBN Vx, Vy
+        flag = 1 if self.V[y] >= self.V[x] else 0
+        self.V[x] = (self.V[y] - self.V[x]) & 0xFF
+        self.V[0xF] = flag
+
+    def op_shl(self, x, y, n, nn, nnn):
+        # SHL Vx {, Vy}
+        value = self.V[x] if self.quirk_shift else self.V[y]
+        self.V[x] = (value << 1) & 0xFF
+        self.V[0xF] = (value & 0x80) >> 7
+
+    def op_sne_reg(self, x, y, n, nn, nnn):
+        # SNE Vx, Vy
+        if self.V[x] != self.V[y]:
+            self.pc += 2
+
+    def op_ld_i(self, x, y, n, nn, nnn):
+        # LD I, nnn
+        self.I = nnn
+
+    def op_jp_v0(self, x, y, n, nn, nnn):
+        # JP V0, nnn
+        self.pc = nnn + self.V[0]
+
+    def op_rnd(self, x, y, n, nn, nnn):
+        # RND Vx, nn
+        self.V[x] = random.randint(0, 255) & nn
+
+    def op_drw(self, x, y, n, nn, nnn):
+        # DRW Vx, Vy, n (n == 0 draws a 16x16 sprite in hi-res mode)
+        width, height = self.width, self.height
+        vx = self.V[x] % width
+        vy = self.V[y] % height
+        if n == 0 and self.hires:
+            rows, sprite_width = 16, 16
+        else:
+            rows, sprite_width = n, 8
+        gfx = self.gfx
+        memory = self.memory
+        self.V[0xF] = 0
+        for row in range(rows):
+            py = vy + row
+            if py >= height:
+                if self.quirk_clip:
+                    break
+                py %= height
+            if sprite_width == 16:
+                addr = (self.I + row * 2) & 0xFFF
+                sprite_bits = (memory[addr] << 8) | memory[(addr + 1) & 0xFFF]
+            else:
+                sprite_bits = memory[(self.I + row) & 0xFFF]
+            self.dirty_rows.add(py)
+            base = py * width
+            for col in range(sprite_width):
+                if sprite_bits & (1 << (sprite_width - 1 - col)):
+                    px = vx + col
+                    if px >= width:
+                        if self.quirk_clip:
+                            break
+                        px %= width
+                    if gfx[base + px] == 1:
+                        self.V[0xF] = 1
+                    gfx[base + px] ^= 1
+
+    def op_skp(self, x, y, n, nn, nnn):
+        # SKP Vx
+        if self.keys[self.V[x] & 0xF] == 1:
+            self.pc += 2
+
+    def op_sknp(self, x, y, n, nn, nnn):
+        # SKNP Vx
+        if self.keys[self.V[x] & 0xF] == 0:
+            self.pc += 2
+
+    def op_ld_vx_dt(self, x, y, n, nn, nnn):
+        # LD Vx, DT
+        self.V[x] = self.delay_timer
+
+    def op_ld_key(self, x, y, n, nn, nnn):
+        # LD Vx, K
+        pressed_key = None
+        for idx, val in enumerate(self.keys):
+            if val == 1:
+                pressed_key = idx
+                break
+        if pressed_key is not None:
+            self.V[x] = pressed_key
+        else:
+            # No key pressed => repeat this instr
+            self.pc -= 2
+
+    def op_ld_dt(self, x, y, n, nn, nnn):
+        # LD DT, Vx
+        self.delay_timer = self.V[x]
+
+    def op_ld_st(self, x, y, n, nn, nnn):
+        # LD ST, Vx
+        self.sound_timer = self.V[x]
+
+    def op_add_i(self, x, y, n, nn, nnn):
+        # ADD I, Vx
+        self.I += self.V[x]
+        self.I &= 0xFFF
+
+    def op_ld_font(self, x, y, n, nn, nnn):
+        # LD F, Vx
+        digit = self.V[x] & 0xF
+        self.I = 0x50 + digit * 5
+
+    def op_ld_big_font(self, x, y, n, nn, nnn):
+        # LD HF, Vx (SCHIP)
+        digit = self.V[x] % 10
+        self.I = BIG_FONT_START + digit * 10
+
+    def op_bcd(self, x, y, n, nn, nnn):
+        # LD B, Vx
+        val = self.V[x]
+        for offset, digit in enumerate((val // 100, (val // 10) % 10, val % 10)):
+            addr = (self.I + offset) & 0xFFF
+            self.memory[addr] = digit
+            self.invalidate(addr)
+
+    def op_store(self, x, y, n, nn, nnn):
+        # LD [I], V0..Vx
+        for idx in range(x + 1):
+            addr = (self.I + idx) & 0xFFF
+            self.memory[addr] = self.V[idx]
+            self.invalidate(addr)
+        if self.quirk_load_store_i:
+            self.I = (self.I + x + 1) & 0xFFF
+
+    def op_load(self, x, y, n, nn, nnn):
+        # LD V0..Vx, [I]
+        for idx in range(x + 1):
+            self.V[idx] = self.memory[(self.I + idx) & 0xFFF]
+        if self.quirk_load_store_i:
+            self.I = (self.I + x + 1) & 0xFFF
+
+    def op_store_flags(self, x, y, n, nn, nnn):
+        # LD R, Vx (SCHIP)
+        for idx in range(min(x, 7) + 1):
+            self.rpl[idx] = self.V[idx]
+
+    def op_load_flags(self, x, y, n, nn, nnn):
+        # LD Vx, R (SCHIP)
+        for idx in range(min(x, 7) + 1):
+            self.V[idx] = self.rpl[idx]
+
+    # Decode tables (plain functions, bound per instance in decode)
+    SYSTEM_OPS = {
+        0x00E0: op_cls, 0x00EE: op_ret, 0x00FB: op_scroll_right, 0x00FC: op_scroll_left,
+        0x00FD: op_exit, 0x00FE: op_lores, 0x00FF: op_hires,
+    }
+    FAMILY_OPS = {
+        0x1: op_jp, 0x2: op_call, 0x3: op_se, 0x4: op_sne, 0x5: op_se_reg, 0x6: op_ld,
+        0x7: op_add, 0x9: op_sne_reg, 0xA: op_ld_i, 0xB: op_jp_v0, 0xC: op_rnd, 0xD: op_drw,
+    }
+    ALU_OPS = {
+        0x0: op_ld_reg, 0x1: op_or, 0x2: op_and, 0x3: op_xor, 0x4: op_add_reg,
+        0x5: op_sub, 0x6: op_shr, 0x7: op_subn, 0xE: op_shl,
+    }
+    KEY_OPS = {0x9E: op_skp, 0xA1: op_sknp}
+    MISC_OPS = {
+        0x07: op_ld_vx_dt, 0x0A: op_ld_key, 0x15: op_ld_dt, 0x18: op_ld_st, 0x1E: op_add_i,
+        0x29: op_ld_font, 0x30: op_ld_big_font, 0x33: op_bcd, 0x55: op_store, 0x65: op_load,
+        0x75: op_store_flags, 0x85: op_load_flags,
+    }
+
+    def update_timers(self):
+        """Count the delay and sound timers down; called once per 60Hz tick."""
+        if self.delay_timer > 0:
+            self.delay_timer -= 1
+        if self.sound_timer > 0:
+            self.sound_timer -= 1
+            if self.sound_timer == 0 and self.on_beep:
+                self.on_beep()
+
+
+# ----------------------------
+# Test-ROM harness
+# ----------------------------
+REGISTER_NAMES = ["V%X" % i for i in range(16)] + ["I", "PC", "DT", "ST"]
+
+def read_register(chip8, name):
+    name = name.upper()
+    if name.startswith("V") and len(name) == 2:
+        return chip8.V[int(name[1], 16)]
+    return {"I": chip8.I, "PC": chip8.pc, "DT": chip8.delay_timer, "ST": chip8.sound_timer}[name]
+
+def parse_expectations(items):
+    """Turn ["V0=0x12", "PC=512"] into {"V0": 0x12, "PC": 512}."""
+    expected = {}
+    for item in items:
+        name, _, value = item.partition("=")
+        if name.upper() not in REGISTER_NAMES:
+            raise ValueError("Unknown register %r" % name)
+        expected[name.upper()] = int(value, 0)
+    return expected
+
+def run_test(rom_path, instructions, quirks=DEFAULT_QUIRKS, instructions_per_frame=10):
+    """
+    Run a ROM headless for a number of instructions.
+
+    Timers are ticked once every instructions_per_frame instructions, as they
+    would be at 60Hz in the GUI. Returns the machine and the run time in seconds.
+    """
+    chip8 = Chip8(quirks)
+    chip8.load_rom(rom_path)
+    start = time.perf_counter()
+    remaining = instructions
+    while remaining > 0 and not chip8.halted:
+        batch = min(instructions_per_frame, remaining)
+        chip8.run_frame(batch)
+        remaining -= batch
+    return chip8, time.perf_counter() - start
+
+def check_test(rom_path, instructions, quirks=DEFAULT_QUIRKS, expect_hash=None, expected=None, quiet=False):
+    """Run one test case and return a list of failure messages (empty when it passes)."""
+    chip8, elapsed = run_test(rom_path, instructions, quirks)
+    failures = []
+    actual_hash = chip8.frame_hash()
+    if expect_hash and actual_hash != expect_hash:
+        failures.append("frame hash %s, expected %s" % (actual_hash, expect_hash))
+    for name, value in (expected or {}).items():
+        actual = read_register(chip8, name)
+        if actual != value:
+            failures.append("%s = 0x%X, expected 0x%X" % (name, actual, value))
+    if not quiet:
+        print("%s: %d instructions in %.3f s (%.0f instructions/sec), hash %s, PC=%03X I=%03X %s" % (
+            rom_path, instructions, elapsed, instructions / (elapsed or 1e-9), actual_hash,
+            chip8.pc, chip8.I, "FAIL" if failures else "ok"))
+        for failure in failures:
+            print("  " + failure)
+    return failures
+
+def run_manifest(path):
+    """
+    Run every case in a manifest file and return the number of failing cases.
+
+    Each non-blank, non-# line is: rom instructions [quirks=NAME] [hash=HEX] [REG=VALUE ...]
+    """
+    failed = 0
+    with open(path) as f:
+        for line in f:
+            fields = line.split("#", 1)[0].split()
+            if not fields:
+                continue
+            rom, instructions = fields[0], int(fields[1])
+            options = dict(field.partition("=")[::2] for field in fields[2:])
+            quirks = options.pop("quirks", DEFAULT_QUIRKS)
+            expect_hash = options.pop("hash", None)
+            expected = parse_expectations("%s=%s" % item for item in options.items())
+            if check_test(rom, instructions, quirks, expect_hash, expected):
+                failed += 1
+    return failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Chip-8 test-ROM harness")
+    parser.add_argument("rom", nargs="?", help="ROM to run")
+    parser.add_argument("--instructions", type=int, default=100000, help="number of instructions to execute")
+    parser.add_argument("--quirks", default=DEFAULT_QUIRKS, choices=sorted(QUIRK_PROFILES), help="quirk profile")
+    parser.add_argument("--expect-hash", help="expected framebuffer hash after the run")
+    parser.add_argument("--expect", action="append", default=[], metavar="REG=VALUE",
+                        help="expected register value, e.g. V3=0x10 or PC=0x22A (repeatable)")
+    parser.add_argument("--manifest", help="file listing test cases, one per line")
+    args = parser.parse_args(argv)
+    if args.manifest:
+        return 1 if run_manifest(args.manifest) else 0
+    if not args.rom:
+        parser.error("a ROM or --manifest is required")
+    failures = check_test(args.rom, args.instructions, args.quirks, args.expect_hash,
+                          parse_expectations(args.expect))
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,9 @@
 # Translated directly (and naively) from the provided C++ example.
 
 import sys
+import argparse
+import array
+import hashlib
 import pygame
 import struct
 import time
@@ -14,6 +17,27 @@ MASTER_CYCLES_PER_FRAME = 29781
 CPU_FREQ                = 1789773
 PPU_FREQ                = 5369318
 
+# PPU timing in CPU cycles: 341 dots per scanline at three dots per cycle;
+# vblank starts on scanline 241.
+DOTS_PER_SCANLINE = 341
+VBLANK_CYCLE      = (241*DOTS_PER_SCANLINE + 2) // 3
+
+# Base cycle count of every opcode (page-cross and branch penalties are not
+# modelled); unofficial opcodes run as 2-cycle NOPs.
+CYCLES = (
+    7,6,2,8,3,3,5,5,3,2,2,2,4,4,6,6, 2,5,2,8,4,4,6,6,2,4,2,7,4,4,7,7,
+    6,6,2,8,3,3,5,5,4,2,2,2,4,4,6,6, 2,5,2,8,4,4,6,6,2,4,2,7,4,4,7,7,
+    6,6,2,8,3,3,5,5,3,2,2,2,3,4,6,6, 2,5,2,8,4,4,6,6,2,4,2,7,4,4,7,7,
+    6,6,2,8,3,3,5,5,4,2,2,2,5,4,6,6, 2,5,2,8,4,4,6,6,2,4,2,7,4,4,7,7,
+    2,6,2,6,3,3,3,3,2,2,2,2,4,4,4,4, 2,6,2,6,4,4,4,4,2,5,2,5,5,5,5,5,
+    2,6,2,6,3,3,3,3,2,2,2,2,4,4,4,4, 2,5,2,5,4,4,4,4,2,4,2,4,4,4,4,4,
+    2,6,2,8,3,3,5,5,2,2,2,2,4,4,6,6, 2,5,2,8,4,4,6,6,2,4,2,7,4,4,7,7,
+    2,6,2,8,3,3,5,5,2,2,2,2,4,4,6,6, 2,5,2,8,4,4,6,6,2,4,2,7,4,4,7,7,
+)
+
+BG_COLORS     = (0xFF606060, 0xFFFF0000, 0xFF00FF00, 0xFF0000FF)
+SPRITE_COLORS = (0xFFFFFFFF, 0xFFFFFF00, 0xFFFF00FF, 0xFF00FFFF)
+
 def makeWord(low, high):
     return (low & 0xFF) | ((high & 0xFF) << 8)
 
@@ -69,11 +93,23 @@ class PPU:
         self.tempAddr    = 0
         self.fineX       = 0
         self.chrROM      = None
+        self.chrRAM      = False
+        # Decoded pattern tiles: 8 rows of 8 two-bit color indices, plus the
+        # same rows already mapped to background colors. Entries are rebuilt
+        # lazily after a CHR RAM write invalidates them.
+        self.tileCache   = [None]*512
+        self.bgTileCache = [None]*512
+        # Catch-up rendering: scanlines are drawn lazily, up to the CPU cycle
+        # of each register access, with the register state in effect then.
+        self.renderedLines = 0
+        self.scrollY       = 0
+        self.renderTime    = 0.0
 
     def writeRegister(self, addr, val):
         reg = addr & 7
         if reg == 0:  # 0x2000
             self.PPUCTRL = val
+            self.tempAddr = (self.tempAddr & 0xF3FF) | ((val & 0x03) << 10)
         elif reg == 1:  # 0x2001
             self.PPUMASK = val
         elif reg == 2:  # 0x2002
@@ -127,8 +163,10 @@ class PPU:
     def writeVRAM(self, addr, val):
         addr &= 0x3FFF
         if addr < 0x2000:
-            if addr < len(self.chrROM):
+            if self.chrRAM and addr < len(self.chrROM):
                 self.chrROM[addr] = val
+                self.tileCache[addr >> 4] = None
+                self.bgTileCache[addr >> 4] = None
         elif addr < 0x3F00:
             self.nametable[addr & 0x07FF] = val
         else:
@@ -145,69 +183,137 @@ class PPU:
         else:
             return 0
 
-    def renderBackground(self):
-        baseNT = 0x2000
-        for row in range(30):
-            for col in range(32):
-                ntAddr = baseNT + row*32 + col
-                tileIndex = self.nametable[ntAddr & 0x07FF]
-                patternAddr = ((self.PPUCTRL & 0x10) and 0x1000 or 0x0000) + (tileIndex*16)
-                for fy in range(8):
-                    lowByte  = self.readVRAM(patternAddr + fy)
-                    highByte = self.readVRAM(patternAddr + fy + 8)
-                    for fx in range(8):
-                        bit = 7 - fx
-                        paletteIndex = ((lowByte >> bit) & 1) | (((highByte >> bit) & 1) << 1)
-                        color = 0xFF606060
-                        if paletteIndex == 1:
-                            color = 0xFFFF0000
-                        elif paletteIndex == 2:
-                            color = 0xFF00FF00
-                        elif paletteIndex == 3:
-                            color = 0xFF0000FF
-                        sx = col*8 + fx
-                        sy = row*8 + fy
-                        if sx < SCREEN_WIDTH and sy < SCREEN_HEIGHT:
-                            self.framebuffer[sy*SCREEN_WIDTH + sx] = color
-
-    def renderSprites(self):
+    def decodeTile(self, tileNum):
+        tile = self.tileCache[tileNum]
+        if tile is None:
+            patternAddr = tileNum*16
+            tile = []
+            for fy in range(8):
+                lowByte  = self.readVRAM(patternAddr + fy)
+                highByte = self.readVRAM(patternAddr + fy + 8)
+                tile.append(tuple(((lowByte >> bit) & 1) | (((highByte >> bit) & 1) << 1)
+                                  for bit in range(7, -1, -1)))
+            self.tileCache[tileNum] = tile
+        return tile
+
+    def backgroundTile(self, tileNum):
+        rows = self.bgTileCache[tileNum]
+        if rows is None:
+            rows = [[BG_COLORS[i] for i in row] for row in self.decodeTile(tileNum)]
+            self.bgTileCache[tileNum] = rows
+        return rows
+
+    def beginFrame(self):
+        # Pre-render line: clear vblank and sprite-0 hit, latch the vertical
+        # scroll (mid-frame $2005 writes only move it from the next frame on)
+        self.PPUSTATUS &= 0x3F
+        self.renderedLines = 0
+        t = self.tempAddr
+        self.scrollY = ((t >> 11) & 1)*240 + ((t >> 5) & 0x1F)*8 + ((t >> 12) & 7)
+
+    def scrollX(self):
+        t = self.tempAddr
+        return ((t >> 10) & 1)*256 + (t & 0x1F)*8 + self.fineX
+
+    def catchUp(self, cycle):
+        line = min(SCREEN_HEIGHT, cycle*3 // DOTS_PER_SCANLINE)
+        if line > self.renderedLines:
+            start = time.perf_counter()
+            self.renderLines(self.renderedLines, line)
+            self.renderedLines = line
+            self.renderTime += time.perf_counter() - start
+
+    def renderLines(self, y0, y1):
+        if self.PPUMASK & 0x08:
+            self.renderBackground(y0, y1)
+        else:
+            self.framebuffer[y0*SCREEN_WIDTH:y1*SCREEN_WIDTH] = [0xFF000000]*((y1 - y0)*SCREEN_WIDTH)
+        if self.PPUMASK & 0x10:
+            self.renderSprites(y0, y1)
+        if (self.PPUMASK & 0x18) == 0x18 and not (self.PPUSTATUS & 0x40):
+            self.checkSprite0Hit(y0, y1)
+
+    def nametableTile(self, tileX, srcY):
+        # tileX in 0-63 and srcY in 0-479 span the 2x2 nametable layout
+        nt = (srcY // 240)*2 + (tileX >> 5)
+        ntAddr = 0x2000 + nt*0x400 + ((srcY % 240) >> 3)*32 + (tileX & 31)
+        return self.nametable[ntAddr & 0x07FF]
+
+    def renderBackground(self, y0, y1):
+        bank = 256 if (self.PPUCTRL & 0x10) else 0
+        fb = self.framebuffer
+        scrollX = self.scrollX()
+        firstTile = scrollX >> 3
+        fineX = scrollX & 7
+        tileRow = None
+        for y in range(y0, y1):
+            srcY = (self.scrollY + y) % 480
+            if srcY >> 3 != tileRow:
+                tileRow = srcY >> 3
+                tiles = [self.backgroundTile(bank + self.nametableTile((firstTile + i) & 63, srcY))
+                         for i in range(33)]
+            fy = srcY & 7
+            line = []
+            for rows in tiles:
+                line += rows[fy]
+            pos = y*SCREEN_WIDTH
+            fb[pos:pos + SCREEN_WIDTH] = line[fineX:fineX + SCREEN_WIDTH]
+
+    def spriteRows(self, i, bank):
+        y    = self.OAM[i*4 + 0]
+        tile = self.OAM[i*4 + 1]
+        attr = self.OAM[i*4 + 2]
+        x    = self.OAM[i*4 + 3]
+        rows = self.decodeTile(bank + tile)
+        if attr & 0x80:
+            rows = rows[::-1]
+        if attr & 0x40:
+            rows = [row[::-1] for row in rows]
+        return x, y, rows
+
+    def renderSprites(self, y0, y1):
+        bank = 256 if (self.PPUCTRL & 0x08) else 0
+        fb = self.framebuffer
         for i in range(64):
-            y    = self.OAM[i*4 + 0]
-            tile = self.OAM[i*4 + 1]
-            attr = self.OAM[i*4 + 2]
-            x    = self.OAM[i*4 + 3]
-            flipH = (attr & 0x40) != 0
-            flipV = (attr & 0x80) != 0
-            patternAddr = ((self.PPUCTRL & 0x08) and 0x1000 or 0x0000) + (tile*16)
-            for row in range(8):
-                actualRow = (7 - row) if flipV else row
-                lowByte  = self.readVRAM(patternAddr + actualRow)
-                highByte = self.readVRAM(patternAddr + actualRow + 8)
+            y = self.OAM[i*4]
+            if y >= y1 or y + 8 <= y0:
+                continue
+            x, y, rows = self.spriteRows(i, bank)
+            for row in range(max(0, y0 - y), min(8, y1 - y)):
+                indices = rows[row]
+                base = (y + row)*SCREEN_WIDTH
                 for col in range(8):
-                    bit = col if flipH else (7 - col)
-                    paletteIndex = ((lowByte >> bit) & 1) | (((highByte >> bit) & 1) << 1)
+                    paletteIndex = indices[col]
                     if paletteIndex == 0:
                         continue
-                    color = 0xFFFFFFFF
-                    if paletteIndex == 1:
-                        color = 0xFFFFFF00
-                    elif paletteIndex == 2:
-                        color = 0xFFFF00FF
-                    elif paletteIndex == 3:
-                        color = 0xFF00FFFF
                     px = x + col
-                    py = y + row
-                    if 0 <= px < SCREEN_WIDTH and 0 <= py < SCREEN_HEIGHT:
-                        self.framebuffer[py*SCREEN_WIDTH + px] = color
+                    if px < SCREEN_WIDTH:
+                        fb[base + px] = SPRITE_COLORS[paletteIndex]
+
+    def checkSprite0Hit(self, y0, y1):
+        y = self.OAM[0]
+        if y >= y1 or y + 8 <= y0:
+            return
+        x, y, rows = self.spriteRows(0, 256 if (self.PPUCTRL & 0x08) else 0)
+        bank = 256 if (self.PPUCTRL & 0x10) else 0
+        scrollX = self.scrollX()
+        for row in range(max(0, y0 - y), min(8, y1 - y)):
+            srcY = (self.scrollY + y + row) % 480
+            for col in range(8):
+                px = x + col
+                if px >= SCREEN_WIDTH - 1:
+                    break
+                if rows[row][col] == 0:
+                    continue
+                srcX = (scrollX + px) & 511
+                tile = self.nametableTile(srcX >> 3, srcY)
+                if self.decodeTile(bank + tile)[srcY & 7][srcX & 7]:
+                    self.PPUSTATUS |= 0x40
+                    return
 
     def render(self):
-        if self.PPUMASK & 0x08:
-            self.renderBackground()
-        else:
-            for i in range(SCREEN_WIDTH*SCREEN_HEIGHT):
-                self.framebuffer[i] = 0xFF000000
-        if self.PPUMASK & 0x10:
-            self.renderSprites()
+        # Draw the whole frame at once with the current register state
+        self.renderLines(0, SCREEN_HEIGHT)
 
 class APU:
     def writeRegister(self, addr, val):
@@ -247,12 +353,14 @@ class CPU:
         self.ppu  = None
         self.apu  = None
         self.controller = None
+        self.cycles = 0
 
     def read(self, addr):
         addr &= 0xFFFF
         if addr < 0x2000:
             return self.RAM[addr & 0x07FF]
         elif addr < 0x4000:
+            self.ppu.catchUp(self.cycles)
             return self.ppu.readRegister(addr)
         elif addr == 0x4016:
             return self.controller.read()
@@ -276,8 +384,10 @@ class CPU:
         if addr < 0x2000:
             self.RAM[addr & 0x07FF] = val
         elif addr < 0x4000:
+            self.ppu.catchUp(self.cycles)
             self.ppu.writeRegister(addr, val)
         elif addr == 0x4014:
+            self.ppu.catchUp(self.cycles)
             base = val << 8
             for i in range(256):
                 self.ppu.OAM[i] = self.read(base + i)
@@ -310,6 +420,7 @@ class CPU:
         self.PC = makeWord(lo, hi)
 
     def nmi(self):
+        self.cycles += 7
         self.push((self.PC >> 8) & 0xFF)
         self.push(self.PC & 0xFF)
         self.push(self.P & ~0x10)
@@ -413,6 +524,7 @@ class CPU:
     def step(self):
         opcode = self.read(self.PC)
         self.PC = (self.PC + 1) & 0xFFFF
+        self.cycles += CYCLES[opcode]
         # Just do a big switch-like structure:
         if opcode == 0xA9:  # LDA imm
             self.A = self.imm(); self.setNZ(self.A)
@@ -703,6 +815,9 @@ class NES:
         self.cpu.apu  = self.apu
         self.cpu.controller = self.controller
         self.ppu.chrROM = self.cart.chrROM
+        self.ppu.chrRAM = self.cart.hasCHRRAM
+        self.ppu.tileCache   = [None]*512
+        self.ppu.bgTileCache = [None]*512
         self.reset()
         return True
 
@@ -710,16 +825,127 @@ class NES:
         self.cpu.reset()
 
     def runFrame(self):
-        for _ in range(MASTER_CYCLES_PER_FRAME):
-            self.cpu.step()
+        self.runCPU()
+
+    def runCPU(self):
+        # Runs one frame; the PPU draws scanlines as the CPU touches its
+        # registers and catches up on the rest when vblank starts
+        cpu, ppu = self.cpu, self.ppu
+        cpu.cycles = 0
+        ppu.beginFrame()
+        instructions = 0
+        while cpu.cycles < VBLANK_CYCLE:
+            cpu.step()
             self.apu.step()
-        if self.ppu.PPUCTRL & 0x80:
-            self.cpu.nmi()
-        self.ppu.render()
+            instructions += 1
+        ppu.catchUp(VBLANK_CYCLE)
+        ppu.PPUSTATUS |= 0x80
+        if ppu.PPUCTRL & 0x80:
+            cpu.nmi()
+        while cpu.cycles < MASTER_CYCLES_PER_FRAME:
+            cpu.step()
+            self.apu.step()
+            instructions += 1
+        return instructions
+
+BUTTONS = {
+    "A": 0x80, "B": 0x40, "SELECT": 0x20, "START": 0x10,
+    "UP": 0x08, "DOWN": 0x04, "LEFT": 0x02, "RIGHT": 0x01,
+}
+
+def parseInputScript(script):
+    # "frame:BUTTON+BUTTON ..." -> {frame: controller state}; "120:" releases all
+    changes = {}
+    for entry in script.split():
+        frame, _, buttons = entry.partition(":")
+        state = 0
+        for name in filter(None, buttons.upper().split("+")):
+            if name not in BUTTONS:
+                raise ValueError("Unknown button %r in input script" % name)
+            state |= BUTTONS[name]
+        changes[int(frame)] = state
+    return changes
+
+def frameHash(framebuffer):
+    data = array.array('I', [p & 0xFFFFFFFF for p in framebuffer]).tobytes()
+    return hashlib.sha1(data).hexdigest()[:16]
+
+def runHeadless(path, frames, script="", hashEvery=0):
+    nes = NES()
+    if not nes.loadROM(path):
+        return None
+    inputs = parseInputScript(script)
+    stats = {"frames": frames, "instructions": 0, "cpuTime": 0.0, "renderTime": 0.0, "hashes": {}}
+    start = time.perf_counter()
+    for frame in range(frames):
+        if frame in inputs:
+            nes.controller.state = inputs[frame]
+        renderBefore = nes.ppu.renderTime
+        t0 = time.perf_counter()
+        stats["instructions"] += nes.runCPU()
+        elapsed = time.perf_counter() - t0
+        rendered = nes.ppu.renderTime - renderBefore
+        stats["cpuTime"] += elapsed - rendered
+        stats["renderTime"] += rendered
+        if hashEvery and (frame + 1) % hashEvery == 0:
+            stats["hashes"][frame + 1] = frameHash(nes.ppu.framebuffer)
+    stats["elapsed"] = time.perf_counter() - start
+    return stats
+
+def printHeadlessReport(stats):
+    elapsed = stats["elapsed"] or 1e-9
+    frames = stats["frames"] or 1
+    print("Frames:           %d" % stats["frames"])
+    print("Instructions:     %d" % stats["instructions"])
+    print("Elapsed:          %.3f s" % stats["elapsed"])
+    print("Frames/sec:       %.2f" % (stats["frames"] / elapsed))
+    print("Instructions/sec: %.0f" % (stats["instructions"] / (stats["cpuTime"] or 1e-9)))
+    print("CPU:              %.3f ms/frame (%.1f%%)" % (stats["cpuTime"] * 1000 / frames, 100 * stats["cpuTime"] / elapsed))
+    print("Render:           %.3f ms/frame (%.1f%%)" % (stats["renderTime"] * 1000 / frames, 100 * stats["renderTime"] / elapsed))
+    for frame, digest in stats["hashes"].items():
+        print("Frame %d: %s" % (frame, digest))
+
+def headlessMain(argv):
+    parser = argparse.ArgumentParser(description="Run the NES core without a window and report its speed.")
+    parser.add_argument("rom", nargs="?", default="test.nes",
+                        help="iNES ROM (default: test.nes, which only spins in a BRK loop: a smoke test, not a benchmark)")
+    parser.add_argument("--headless", action="store_true", help="run without a window; pass a real game ROM for meaningful numbers")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--input", default="", help='scripted controller input, e.g. "60:START 70: 120:RIGHT+A"')
+    parser.add_argument("--hash-every", type=int, default=0)
+    parser.add_argument("--save-hashes")
+    parser.add_argument("--expect-hashes")
+    args = parser.parse_args(argv)
+    stats = runHeadless(args.rom, args.frames, args.input, args.hash_every)
+    if stats is None:
+        print("Failed to load ROM.")
+        return 1
+    printHeadlessReport(stats)
+    if args.save_hashes:
+        with open(args.save_hashes, "w") as f:
+            for frame, digest in stats["hashes"].items():
+                f.write("%d %s\n" % (frame, digest))
+    if args.expect_hashes:
+        failed = 0
+        with open(args.expect_hashes) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                frame, digest = line.split()
+                actual = stats["hashes"].get(int(frame))
+                if actual != digest:
+                    print("Hash mismatch at frame %s: expected %s, got %s" % (frame, digest, actual))
+                    failed += 1
+        if failed:
+            return 1
+    return 0
 
 def main():
+    if "--headless" in sys.argv[1:]:
+        sys.exit(headlessMain(sys.argv[1:]))
     if len(sys.argv) < 2:
         print(f"Usage: python {sys.argv[0]} romfile.nes")
+        print(f"       python {sys.argv[0]} --headless [romfile.nes] [--frames N] [--input SCRIPT] [--hash-every N]")
         return
 
     pygame.init()
@@ -1,9 +1,20 @@
+import argparse
+import collections
+import hashlib
+import struct
+import sys
+import time
+import zlib
 import tkinter as tk
 from tkinter import filedialog, messagebox
 try:
     from PIL import Image, ImageTk
 except ImportError:
     Image = ImageTk = None  # If Pillow is not installed, we will handle later.
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Without NumPy we fall back to the (slow) per-pixel renderer.
 
 # --- Global NES Constants ---
 SCREEN_WIDTH = 256
@@ -23,6 +34,16 @@ NES_PALETTE_HEX = [
 ]
 NES_PALETTE = [(int(c[0:2],16), int(c[2:4],16), int(c[4:6],16)) for c in NES_PALETTE_HEX]
 
+if np is not None:
+    # Same palette as a (64, 3) uint8 lookup table for the vectorized renderer.
+    NES_PALETTE_RGB = np.array(NES_PALETTE, dtype=np.uint8)
+    # For each of the 30x32 tiles in a nametable: offset of its attribute byte
+    # (relative to the nametable start) and the shift selecting its 2-bit palette.
+    _tile_rows, _tile_cols = np.mgrid[0:30, 0:32]
+    NT_ATTR_INDEX = 0x3C0 + (_tile_rows // 4) * 8 + (_tile_cols // 4)
+    NT_ATTR_SHIFT = (((_tile_rows & 0x02) << 1) | (_tile_cols & 0x02)).astype(np.uint8)
+    del _tile_rows, _tile_cols
+
 # CPU Flags bit positions
 FLAG_C = 0x01  # Carry
 FLAG_Z = 0x02  # Zero
@@ -46,6 +67,13 @@ BUTTON_DOWN = 0x20
 BUTTON_LEFT = 0x40
 BUTTON_RIGHT = 0x80
 
+def decode_chr_tiles(chr_data):
+    """Decode CHR pattern data into a (tiles, 8, 8) uint8 array of 2-bit color indices."""
+    # Each tile is 16 bytes: 8 rows of bitplane 0 followed by 8 rows of bitplane 1.
+    planes = np.frombuffer(bytes(chr_data), dtype=np.uint8).reshape(-1, 2, 8)
+    bits = np.unpackbits(planes, axis=2).reshape(-1, 2, 8, 8)  # bit7 -> x=0
+    return bits[:, 0] | (bits[:, 1] << 1)
+
 # --- NES Emulator Classes ---
 
 class CPU6502:
@@ -259,723 +287,700 @@ class CPU6502:
         self.set_flag(FLAG_N, (value & 0x80) != 0)
         self.set_flag(FLAG_V, (value & 0x40) != 0)
     
+    def _branch(self, condition):
+        """Fetch a relative offset and branch if condition holds; return extra cycles."""
+        offset = self.fetch_byte()
+        if not condition:
+            return 0
+        # branch taken
+        new_pc = (self.PC + ((offset ^ 0x80) - 0x80)) & 0xFFFF  # sign-extend offset
+        extra = 1
+        if (new_pc & 0xFF00) != (self.PC & 0xFF00):
+            extra += 1  # page boundary crossed
+        self.PC = new_pc
+        return extra
+    
+    # Addressing modes used by the dispatch table. Each one consumes its operand
+    # bytes and returns the effective address. The *_pc variants charge the
+    # extra cycle on page crossing (read instructions only).
+    def addr_immediate(self):
+        addr = self.PC
+        self.PC = (self.PC + 1) & 0xFFFF
+        return addr
+    def addr_absolute_x_pc(self):
+        return self.addr_absolute_x(check_page_cross=True)
+    def addr_absolute_y_pc(self):
+        return self.addr_absolute_y(check_page_cross=True)
+    def addr_indirect_y_pc(self):
+        return self.addr_indirect_y(check_page_cross=True)
+    
+    # Opcode handlers: called as handler(cpu, mode). Branch handlers return the
+    # extra cycles taken; everything else returns None.
+    def op_brk(self, mode):
+        self.fetch_byte()  # BRK has an unused padding byte after opcode
+        self.set_flag(FLAG_B, True)
+        self.push((self.PC >> 8) & 0xFF)
+        self.push(self.PC & 0xFF)
+        self.push(self.STATUS)
+        self.set_flag(FLAG_I, True)
+        self.PC = self.bus.read(0xFFFE) | (self.bus.read(0xFFFF) << 8)
+    def op_nop(self, mode):
+        pass
+    
+    def op_ora(self, mode):
+        self.ora(self.bus.read(mode(self)))
+    def op_and(self, mode):
+        self.and_(self.bus.read(mode(self)))
+    def op_eor(self, mode):
+        self.eor(self.bus.read(mode(self)))
+    def op_adc(self, mode):
+        self.adc(self.bus.read(mode(self)))
+    def op_sbc(self, mode):
+        self.sbc(self.bus.read(mode(self)))
+    def op_cmp(self, mode):
+        self.cmp(self.A, self.bus.read(mode(self)))
+    def op_cpx(self, mode):
+        self.cmp(self.X, self.bus.read(mode(self)))
+    def op_cpy(self, mode):
+        self.cmp(self.Y, self.bus.read(mode(self)))
+    def op_bit(self, mode):
+        self.bit_test(self.bus.read(mode(self)))
+    
+    def op_lda(self, mode):
+        self.A = self.bus.read(mode(self))
+        self.update_zn(self.A)
+    def op_ldx(self, mode):
+        self.X = self.bus.read(mode(self))
+        self.update_zn(self.X)
+    def op_ldy(self, mode):
+        self.Y = self.bus.read(mode(self))
+        self.update_zn(self.Y)
+    def op_sta(self, mode):
+        self.bus.write(mode(self), self.A)
+    def op_stx(self, mode):
+        self.bus.write(mode(self), self.X)
+    def op_sty(self, mode):
+        self.bus.write(mode(self), self.Y)
+    
+    def op_asl(self, mode):
+        self.asl(mode(self))
+    def op_asl_a(self, mode):
+        self.asl()
+    def op_lsr(self, mode):
+        self.lsr(mode(self))
+    def op_lsr_a(self, mode):
+        self.lsr()
+    def op_rol(self, mode):
+        self.rol(mode(self))
+    def op_rol_a(self, mode):
+        self.rol()
+    def op_ror(self, mode):
+        self.ror(mode(self))
+    def op_ror_a(self, mode):
+        self.ror()
+    def op_inc(self, mode):
+        addr = mode(self)
+        val = (self.bus.read(addr) + 1) & 0xFF
+        self.bus.write(addr, val)
+        self.update_zn(val)
+    def op_dec(self, mode):
+        addr = mode(self)
+        val = (self.bus.read(addr) - 1) & 0xFF
+        self.bus.write(addr, val)
+        self.update_zn(val)
+    
+    def op_inx(self, mode):
+        self.X = (self.X + 1) & 0xFF
+        self.update_zn(self.X)
+    def op_iny(self, mode):
+        self.Y = (self.Y + 1) & 0xFF
+        self.update_zn(self.Y)
+    def op_dex(self, mode):
+        self.X = (self.X - 1) & 0xFF
+        self.update_zn(self.X)
+    def op_dey(self, mode):
+        self.Y = (self.Y - 1) & 0xFF
+        self.update_zn(self.Y)
+    def op_tax(self, mode):
+        self.X = self.A
+        self.update_zn(self.X)
+    def op_tay(self, mode):
+        self.Y = self.A
+        self.update_zn(self.Y)
+    def op_txa(self, mode):
+        self.A = self.X
+        self.update_zn(self.A)
+    def op_tya(self, mode):
+        self.A = self.Y
+        self.update_zn(self.A)
+    def op_tsx(self, mode):
+        self.X = self.SP
+        self.update_zn(self.X)
+    def op_txs(self, mode):
+        self.SP = self.X
+    
+    def op_pha(self, mode):
+        self.push(self.A)
+    def op_php(self, mode):
+        # Push SR with B flag and U flag set
+        self.push(self.STATUS | FLAG_B | FLAG_U)
+    def op_pla(self, mode):
+        self.A = self.pop()
+        self.update_zn(self.A)
+    def op_plp(self, mode):
+        self.STATUS = self.pop()
+        # The B flag and unused flag bits 4 and 5 in the status are not actual flags, ensure proper state:
+        self.STATUS |= FLAG_U
+        self.STATUS &= ~FLAG_B
+    
+    def op_jmp(self, mode):
+        self.PC = mode(self)
+    def op_jsr(self, mode):
+        addr = mode(self)  # get target address
+        # Push address of last byte of JSR (PC-1) onto stack
+        return_addr = (self.PC - 1) & 0xFFFF
+        self.push((return_addr >> 8) & 0xFF)
+        self.push(return_addr & 0xFF)
+        self.PC = addr
+    def op_rts(self, mode):
+        lo = self.pop()
+        hi = self.pop()
+        self.PC = ((lo | (hi << 8)) + 1) & 0xFFFF
+    def op_rti(self, mode):
+        # Pull flags, then PC from stack
+        self.STATUS = self.pop()
+        self.STATUS |= FLAG_U
+        self.STATUS &= ~FLAG_B
+        lo = self.pop()
+        hi = self.pop()
+        self.PC = lo | (hi << 8)
+    
+    def op_bpl(self, mode):
+        return self._branch(not self.get_flag(FLAG_N))
+    def op_bmi(self, mode):
+        return self._branch(self.get_flag(FLAG_N))
+    def op_bvc(self, mode):
+        return self._branch(not self.get_flag(FLAG_V))
+    def op_bvs(self, mode):
+        return self._branch(self.get_flag(FLAG_V))
+    def op_bcc(self, mode):
+        return self._branch(not self.get_flag(FLAG_C))
+    def op_bcs(self, mode):
+        return self._branch(self.get_flag(FLAG_C))
+    def op_bne(self, mode):
+        return self._branch(not self.get_flag(FLAG_Z))
+    def op_beq(self, mode):
+        return self._branch(self.get_flag(FLAG_Z))
+    
+    def op_clc(self, mode):
+        self.set_flag(FLAG_C, False)
+    def op_sec(self, mode):
+        self.set_flag(FLAG_C, True)
+    def op_cli(self, mode):
+        self.set_flag(FLAG_I, False)
+    def op_sei(self, mode):
+        self.set_flag(FLAG_I, True)
+    def op_clv(self, mode):
+        self.set_flag(FLAG_V, False)
+    def op_cld(self, mode):
+        self.set_flag(FLAG_D, False)
+    def op_sed(self, mode):
+        self.set_flag(FLAG_D, True)
+    
+    # Opcode -> (handler, addressing mode, base cycles). Base cycles exclude
+    # page-cross penalties (added to bus.cycles by the *_pc addressing modes)
+    # and branch penalties (returned by the branch handlers).
+    OPCODES = {
+        0x00: (op_brk, None, 7),                  # BRK
+        0x01: (op_ora, addr_indirect_x, 6),       # ORA (ind,X)
+        0x05: (op_ora, addr_zero_page, 3),        # ORA zpg
+        0x06: (op_asl, addr_zero_page, 5),        # ASL zpg
+        0x08: (op_php, None, 3),                  # PHP
+        0x09: (op_ora, addr_immediate, 2),        # ORA #imm
+        0x0A: (op_asl_a, None, 2),                # ASL A
+        0x0D: (op_ora, addr_absolute, 4),         # ORA abs
+        0x0E: (op_asl, addr_absolute, 6),         # ASL abs
+        0x10: (op_bpl, None, 2),                  # BPL
+        0x11: (op_ora, addr_indirect_y_pc, 5),    # ORA (ind),Y
+        0x15: (op_ora, addr_zero_page_x, 4),      # ORA zpg,X
+        0x16: (op_asl, addr_zero_page_x, 6),      # ASL zpg,X
+        0x18: (op_clc, None, 2),                  # CLC
+        0x19: (op_ora, addr_absolute_y_pc, 4),    # ORA abs,Y
+        0x1D: (op_ora, addr_absolute_x_pc, 4),    # ORA abs,X
+        0x1E: (op_asl, addr_absolute_x, 7),       # ASL abs,X
+        0x20: (op_jsr, addr_absolute, 6),         # JSR abs
+        0x21: (op_and, addr_indirect_x, 6),       # AND (ind,X)
+        0x24: (op_bit, addr_zero_page, 3),        # BIT zpg
+        0x25: (op_and, addr_zero_page, 3),        # AND zpg
+        0x26: (op_rol, addr_zero_page, 5),        # ROL zpg
+        0x28: (op_plp, None, 4),                  # PLP
+        0x29: (op_and, addr_immediate, 2),        # AND #imm
+        0x2A: (op_rol_a, None, 2),                # ROL A
+        0x2C: (op_bit, addr_absolute, 4),         # BIT abs
+        0x2D: (op_and, addr_absolute, 4),         # AND abs
+        0x2E: (op_rol, addr_absolute, 6),         # ROL abs
+        0x30: (op_bmi, None, 2),                  # BMI
+        0x31: (op_and, addr_indirect_y_pc, 5),    # AND (ind),Y
+        0x35: (op_and, addr_zero_page_x, 4),      # AND zpg,X
+        0x36: (op_rol, addr_zero_page_x, 6),      # ROL zpg,X
+        0x38: (op_sec, None, 2),                  # SEC
+        0x39: (op_and, addr_absolute_y_pc, 4),    # AND abs,Y
+        0x3D: (op_and, addr_absolute_x_pc, 4),    # AND abs,X
+        0x3E: (op_rol, addr_absolute_x, 7),       # ROL abs,X
+        0x40: (op_rti, None, 6),                  # RTI
+        0x41: (op_eor, addr_indirect_x, 6),       # EOR (ind,X)
+        0x45: (op_eor, addr_zero_page, 3),        # EOR zpg
+        0x46: (op_lsr, addr_zero_page, 5),        # LSR zpg
+        0x48: (op_pha, None, 3),                  # PHA
+        0x49: (op_eor, addr_immediate, 2),        # EOR #imm
+        0x4A: (op_lsr_a, None, 2),                # LSR A
+        0x4C: (op_jmp, addr_absolute, 3),         # JMP abs
+        0x4D: (op_eor, addr_absolute, 4),         # EOR abs
+        0x4E: (op_lsr, addr_absolute, 6),         # LSR abs
+        0x50: (op_bvc, None, 2),                  # BVC
+        0x51: (op_eor, addr_indirect_y_pc, 5),    # EOR (ind),Y
+        0x55: (op_eor, addr_zero_page_x, 4),      # EOR zpg,X
+        0x56: (op_lsr, addr_zero_page_x, 6),      # LSR zpg,X
+        0x58: (op_cli, None, 2),                  # CLI
+        0x59: (op_eor, addr_absolute_y_pc, 4),    # EOR abs,Y
+        0x5D: (op_eor, addr_absolute_x_pc, 4),    # EOR abs,X
+        0x5E: (op_lsr, addr_absolute_x, 7),       # LSR abs,X
+        0x60: (op_rts, None, 6),                  # RTS
+        0x61: (op_adc, addr_indirect_x, 6),       # ADC (ind,X)
+        0x65: (op_adc, addr_zero_page, 3),        # ADC zpg
+        0x66: (op_ror, addr_zero_page, 5),        # ROR zpg
+        0x68: (op_pla, None, 4),                  # PLA
+        0x69: (op_adc, addr_immediate, 2),        # ADC #imm
+        0x6A: (op_ror_a, None, 2),                # ROR A
+        0x6C: (op_jmp, addr_indirect, 5),         # JMP (ind)
+        0x6D: (op_adc, addr_absolute, 4),         # ADC abs
+        0x6E: (op_ror, addr_absolute, 6),         # ROR abs
+        0x70: (op_bvs, None, 2),                  # BVS
+        0x71: (op_adc, addr_indirect_y_pc, 5),    # ADC (ind),Y
+        0x75: (op_adc, addr_zero_page_x, 4),      # ADC zpg,X
+        0x76: (op_ror, addr_zero_page_x, 6),      # ROR zpg,X
+        0x78: (op_sei, None, 2),                  # SEI
+        0x79: (op_adc, addr_absolute_y_pc, 4),    # ADC abs,Y
+        0x7D: (op_adc, addr_absolute_x_pc, 4),    # ADC abs,X
+        0x7E: (op_ror, addr_absolute_x, 7),       # ROR abs,X
+        0x81: (op_sta, addr_indirect_x, 6),       # STA (ind,X)
+        0x84: (op_sty, addr_zero_page, 3),        # STY zpg
+        0x85: (op_sta, addr_zero_page, 3),        # STA zpg
+        0x86: (op_stx, addr_zero_page, 3),        # STX zpg
+        0x88: (op_dey, None, 2),                  # DEY
+        0x8A: (op_txa, None, 2),                  # TXA
+        0x8C: (op_sty, addr_absolute, 4),         # STY abs
+        0x8D: (op_sta, addr_absolute, 4),         # STA abs
+        0x8E: (op_stx, addr_absolute, 4),         # STX abs
+        0x90: (op_bcc, None, 2),                  # BCC
+        0x91: (op_sta, addr_indirect_y, 6),       # STA (ind),Y
+        0x94: (op_sty, addr_zero_page_x, 4),      # STY zpg,X
+        0x95: (op_sta, addr_zero_page_x, 4),      # STA zpg,X
+        0x96: (op_stx, addr_zero_page_y, 4),      # STX zpg,Y
+        0x98: (op_tya, None, 2),                  # TYA
+        0x99: (op_sta, addr_absolute_y, 5),       # STA abs,Y
+        0x9A: (op_txs, None, 2),                  # TXS
+        0x9D: (op_sta, addr_absolute_x, 5),       # STA abs,X
+        0xA0: (op_ldy, addr_immediate, 2),        # LDY #imm
+        0xA1: (op_lda, addr_indirect_x, 6),       # LDA (ind,X)
+        0xA2: (op_ldx, addr_immediate, 2),        # LDX #imm
+        0xA4: (op_ldy, addr_zero_page, 3),        # LDY zpg
+        0xA5: (op_lda, addr_zero_page, 3),        # LDA zpg
+        0xA6: (op_ldx, addr_zero_page, 3),        # LDX zpg
+        0xA8: (op_tay, None, 2),                  # TAY
+        0xA9: (op_lda, addr_immediate, 2),        # LDA #imm
+        0xAA: (op_tax, None, 2),                  # TAX
+        0xAC: (op_ldy, addr_absolute, 4),         # LDY abs
+        0xAD: (op_lda, addr_absolute, 4),         # LDA abs
+        0xAE: (op_ldx, addr_absolute, 4),         # LDX abs
+        0xB0: (op_bcs, None, 2),                  # BCS
+        0xB1: (op_lda, addr_indirect_y_pc, 5),    # LDA (ind),Y
+        0xB4: (op_ldy, addr_zero_page_x, 4),      # LDY zpg,X
+        0xB5: (op_lda, addr_zero_page_x, 4),      # LDA zpg,X
+        0xB6: (op_ldx, addr_zero_page_y, 4),      # LDX zpg,Y
+        0xB8: (op_clv, None, 2),                  # CLV
+        0xB9: (op_lda, addr_absolute_y_pc, 4),    # LDA abs,Y
+        0xBA: (op_tsx, None, 2),                  # TSX
+        0xBC: (op_ldy, addr_absolute_x_pc, 4),    # LDY abs,X
+        0xBD: (op_lda, addr_absolute_x_pc, 4),    # LDA abs,X
+        0xBE: (op_ldx, addr_absolute_y_pc, 4),    # LDX abs,Y
+        0xC0: (op_cpy, addr_immediate, 2),        # CPY #imm
+        0xC1: (op_cmp, addr_indirect_x, 6),       # CMP (ind,X)
+        0xC4: (op_cpy, addr_zero_page, 3),        # CPY zpg
+        0xC5: (op_cmp, addr_zero_page, 3),        # CMP zpg
+        0xC6: (op_dec, addr_zero_page, 5),        # DEC zpg
+        0xC8: (op_iny, None, 2),                  # INY
+        0xC9: (op_cmp, addr_immediate, 2),        # CMP #imm
+        0xCA: (op_dex, None, 2),                  # DEX
+        0xCC: (op_cpy, addr_absolute, 4),         # CPY abs
+        0xCD: (op_cmp, addr_absolute, 4),         # CMP abs
+        0xCE: (op_dec, addr_absolute, 6),         # DEC abs
+        0xD0: (op_bne, None, 2),                  # BNE
+        0xD1: (op_cmp, addr_indirect_y_pc, 5),    # CMP (ind),Y
+        0xD5: (op_cmp, addr_zero_page_x, 4),      # CMP zpg,X
+        0xD6: (op_dec, addr_zero_page_x, 6),      # DEC zpg,X
+        0xD8: (op_cld, None, 2),                  # CLD
+        0xD9: (op_cmp, addr_absolute_y_pc, 4),    # CMP abs,Y
+        0xDD: (op_cmp, addr_absolute_x_pc, 4),    # CMP abs,X
+        0xDE: (op_dec, addr_absolute_x, 7),       # DEC abs,X
+        0xE0: (op_cpx, addr_immediate, 2),        # CPX #imm
+        0xE1: (op_sbc, addr_indirect_x, 6),       # SBC (ind,X)
+        0xE4: (op_cpx, addr_zero_page, 3),        # CPX zpg
+        0xE5: (op_sbc, addr_zero_page, 3),        # SBC zpg
+        0xE6: (op_inc, addr_zero_page, 5),        # INC zpg
+        0xE8: (op_inx, None, 2),                  # INX
+        0xE9: (op_sbc, addr_immediate, 2),        # SBC #imm
+        0xEA: (op_nop, None, 2),                  # NOP
+        0xEC: (op_cpx, addr_absolute, 4),         # CPX abs
+        0xED: (op_sbc, addr_absolute, 4),         # SBC abs
+        0xEE: (op_inc, addr_absolute, 6),         # INC abs
+        0xF0: (op_beq, None, 2),                  # BEQ
+        0xF1: (op_sbc, addr_indirect_y_pc, 5),    # SBC (ind),Y
+        0xF5: (op_sbc, addr_zero_page_x, 4),      # SBC zpg,X
+        0xF6: (op_inc, addr_zero_page_x, 6),      # INC zpg,X
+        0xF8: (op_sed, None, 2),                  # SED
+        0xF9: (op_sbc, addr_absolute_y_pc, 4),    # SBC abs,Y
+        0xFD: (op_sbc, addr_absolute_x_pc, 4),    # SBC abs,X
+        0xFE: (op_inc, addr_absolute_x, 7),       # INC abs,X
+    }
+    # Flat 256-entry dispatch table, built once at class load. Unsupported/illegal
+    # opcodes are treated as 2-cycle single-byte NOPs.
+    DISPATCH = [(op_nop, None, 2)] * 256
+    for _opcode, _entry in OPCODES.items():
+        DISPATCH[_opcode] = _entry
+    del _opcode, _entry
+    
     def execute_instruction(self):
         """Fetch and execute one CPU instruction, return number of cycles used."""
-        opcode = self.fetch_byte()
-        # Base cycle counts for each opcode (without page-cross penalties)
-        # A partial list for demonstration (complete list should cover all 256 opcodes or at least all official ones).
-        # For brevity, not all opcodes are enumerated in comments; our logic covers main ones.
-        # We will handle branch and page-cross cycle additions in code.
-        cycles_base = {
-            0x00: 7,  # BRK
-            0x01: 6,  # ORA (ind,X)
-            0x05: 3,  # ORA zpg
-            0x06: 5,  # ASL zpg
-            0x08: 3,  # PHP
-            0x09: 2,  # ORA #imm
-            0x0A: 2,  # ASL A
-            0x0D: 4,  # ORA abs
-            0x0E: 6,  # ASL abs
-            0x10: 2,  # BPL (branch - may add 1 or 2 cycles)
-            0x11: 5,  # ORA (ind),Y (+1 if page crossed)
-            0x15: 4,  # ORA zpg,X
-            0x16: 6,  # ASL zpg,X
-            0x18: 2,  # CLC
-            0x19: 4,  # ORA abs,Y (+1 if page crossed)
-            0x1D: 4,  # ORA abs,X (+1 if page crossed)
-            0x1E: 7,  # ASL abs,X
-            0x20: 6,  # JSR abs
-            0x21: 6,  # AND (ind,X)
-            0x24: 3,  # BIT zpg
-            0x25: 3,  # AND zpg
-            0x26: 5,  # ROL zpg
-            0x28: 4,  # PLP
-            0x29: 2,  # AND #imm
-            0x2A: 2,  # ROL A
-            0x2C: 4,  # BIT abs
-            0x2D: 4,  # AND abs
-            0x2E: 6,  # ROL abs
-            0x30: 2,  # BMI
-            0x31: 5,  # AND (ind),Y (+1 if page crossed)
-            0x35: 4,  # AND zpg,X
-            0x36: 6,  # ROL zpg,X
-            0x38: 2,  # SEC
-            0x39: 4,  # AND abs,Y (+1 if page crossed)
-            0x3D: 4,  # AND abs,X (+1 if page crossed)
-            0x3E: 7,  # ROL abs,X
-            0x40: 6,  # RTI
-            0x41: 6,  # EOR (ind,X)
-            0x45: 3,  # EOR zpg
-            0x46: 5,  # LSR zpg
-            0x48: 3,  # PHA
-            0x49: 2,  # EOR #imm
-            0x4A: 2,  # LSR A
-            0x4C: 3,  # JMP abs
-            0x4D: 4,  # EOR abs
-            0x4E: 6,  # LSR abs
-            0x50: 2,  # BVC
-            0x51: 5,  # EOR (ind),Y (+1 if page crossed)
-            0x55: 4,  # EOR zpg,X
-            0x56: 6,  # LSR zpg,X
-            0x58: 2,  # CLI
-            0x59: 4,  # EOR abs,Y (+1 if page crossed)
-            0x5D: 4,  # EOR abs,X (+1 if page crossed)
-            0x5E: 7,  # LSR abs,X
-            0x60: 6,  # RTS
-            0x61: 6,  # ADC (ind,X)
-            0x65: 3,  # ADC zpg
-            0x66: 5,  # ROR zpg
-            0x68: 4,  # PLA
-            0x69: 2,  # ADC #imm
-            0x6A: 2,  # ROR A
-            0x6C: 5,  # JMP (ind)
-            0x6D: 4,  # ADC abs
-            0x6E: 6,  # ROR abs
-            0x70: 2,  # BVS
-            0x71: 5,  # ADC (ind),Y (+1 if page crossed)
-            0x75: 4,  # ADC zpg,X
-            0x76: 6,  # ROR zpg,X
-            0x78: 2,  # SEI
-            0x79: 4,  # ADC abs,Y (+1 if page crossed)
-            0x7D: 4,  # ADC abs,X (+1 if page crossed)
-            0x7E: 7,  # ROR abs,X
-            0x81: 6,  # STA (ind,X)
-            0x84: 3,  # STY zpg
-            0x85: 3,  # STA zpg
-            0x86: 3,  # STX zpg
-            0x88: 2,  # DEY
-            0x8A: 2,  # TXA
-            0x8C: 4,  # STY abs
-            0x8D: 4,  # STA abs
-            0x8E: 4,  # STX abs
-            0x90: 2,  # BCC
-            0x91: 6,  # STA (ind),Y
-            0x94: 4,  # STY zpg,X
-            0x95: 4,  # STA zpg,X
-            0x96: 4,  # STX zpg,Y
-            0x98: 2,  # TYA
-            0x99: 5,  # STA abs,Y
-            0x9A: 2,  # TXS
-            0x9D: 5,  # STA abs,X
-            0xA0: 2,  # LDY #imm
-            0xA1: 6,  # LDA (ind,X)
-            0xA2: 2,  # LDX #imm
-            0xA4: 3,  # LDY zpg
-            0xA5: 3,  # LDA zpg
-            0xA6: 3,  # LDX zpg
-            0xA8: 2,  # TAY
-            0xA9: 2,  # LDA #imm
-            0xAA: 2,  # TAX
-            0xAC: 4,  # LDY abs
-            0xAD: 4,  # LDA abs
-            0xAE: 4,  # LDX abs
-            0xB0: 2,  # BCS
-            0xB1: 5,  # LDA (ind),Y (+1 if page crossed)
-            0xB4: 4,  # LDY zpg,X
-            0xB5: 4,  # LDA zpg,X
-            0xB6: 4,  # LDX zpg,Y
-            0xB8: 2,  # CLV
-            0xB9: 4,  # LDA abs,Y (+1 if page crossed)
-            0xBA: 2,  # TSX
-            0xBC: 4,  # LDY abs,X (+1 if page crossed)
-            0xBD: 4,  # LDA abs,X (+1 if page crossed)
-            0xBE: 4,  # LDX abs,Y (+1 if page crossed)
-            0xC0: 2,  # CPY #imm
-            0xC1: 6,  # CMP (ind,X)
-            0xC4: 3,  # CPY zpg
-            0xC5: 3,  # CMP zpg
-            0xC6: 5,  # DEC zpg
-            0xC8: 2,  # INY
-            0xC9: 2,  # CMP #imm
-            0xCA: 2,  # DEX
-            0xCC: 4,  # CPY abs
-            0xCD: 4,  # CMP abs
-            0xCE: 6,  # DEC abs
-            0xD0: 2,  # BNE
-            0xD1: 5,  # CMP (ind),Y (+1 if page crossed)
-            0xD5: 4,  # CMP zpg,X
-            0xD6: 6,  # DEC zpg,X
-            0xD8: 2,  # CLD
-            0xD9: 4,  # CMP abs,Y (+1 if page crossed)
-            0xDD: 4,  # CMP abs,X (+1 if page crossed)
-            0xDE: 7,  # DEC abs,X
-            0xE0: 2,  # CPX #imm
-            0xE1: 6,  # SBC (ind,X)
-            0xE4: 3,  # CPX zpg
-            0xE5: 3,  # SBC zpg
-            0xE6: 5,  # INC zpg
-            0xE8: 2,  # INX
-            0xE9: 2,  # SBC #imm
-            0xEA: 2,  # NOP
-            0xEC: 4,  # CPX abs
-            0xED: 4,  # SBC abs
-            0xEE: 6,  # INC abs
-            0xF0: 2,  # BEQ
-            0xF1: 5,  # SBC (ind),Y (+1 if page crossed)
-            0xF5: 4,  # SBC zpg,X
-            0xF6: 6,  # INC zpg,X
-            0xF8: 2,  # SED
-            0xF9: 4,  # SBC abs,Y (+1 if page crossed)
-            0xFD: 4,  # SBC abs,X (+1 if page crossed)
-            0xFE: 7,  # INC abs,X
-        }
-        # Set base cycles for this opcode, will add extras later if needed
-        cycles = cycles_base.get(opcode, 2)
+        handler, mode, cycles = self.DISPATCH[self.fetch_byte()]
+        extra = handler(self, mode)
+        if extra:
+            cycles += extra
+        return cycles
+
+# Bus regions tracked by the profiler, indexed by the high byte of the address
+BUS_REGIONS = ("RAM", "PPU regs", "APU/IO", "Expansion", "PRG RAM", "PRG ROM")
+BUS_REGION_BY_PAGE = ([0] * 0x20 + [1] * 0x20 + [2] + [3] * 0x1F + [4] * 0x20 + [5] * 0x80)
+
+class CPUProfiler:
+    """Opt-in instruction-level profiler for CPU6502.
+
+    While running, the CPU's execute_instruction and the bus read/write
+    methods are shadowed by instrumented instance attributes; stop() deletes
+    them again, so the normal dispatch path carries no profiling checks.
+    """
+    PC_RANGE_BITS = 4  # hot PC ranges are reported in 16-byte buckets
+    
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.active = False
+        self.instructions = 0
+        self.opcode_counts = [0] * 256
+        self.opcode_time = [0.0] * 256
+        self.pc_counts = {}
+        self.read_counts = [0] * len(BUS_REGIONS)
+        self.write_counts = [0] * len(BUS_REGIONS)
+    
+    def clear(self):
+        # Reset in place: a running profiler holds references to these containers
+        self.instructions = 0
+        self.opcode_counts[:] = [0] * 256
+        self.opcode_time[:] = [0.0] * 256
+        self.pc_counts.clear()
+        self.read_counts[:] = [0] * len(BUS_REGIONS)
+        self.write_counts[:] = [0] * len(BUS_REGIONS)
+    
+    def start(self):
+        if self.active:
+            return
+        cpu = self.cpu
+        bus = cpu.bus
+        dispatch = cpu.DISPATCH
+        clock = time.perf_counter
+        opcode_counts, opcode_time = self.opcode_counts, self.opcode_time
+        pc_counts = self.pc_counts
+        pc_shift = self.PC_RANGE_BITS
+        bus_read, bus_write = bus.read, bus.write
+        read_counts, write_counts = self.read_counts, self.write_counts
+        region_by_page = BUS_REGION_BY_PAGE
         
-        # Decode and execute the opcode
-        if opcode == 0x00:  # BRK - Force Interrupt
-            self.fetch_byte()  # BRK has an unused padding byte after opcode
-            self.set_flag(FLAG_B, True)
-            self.push((self.PC >> 8) & 0xFF)
-            self.push(self.PC & 0xFF)
-            self.push(self.STATUS)
-            self.set_flag(FLAG_I, True)
-            self.PC = self.bus.read(0xFFFE) | (self.bus.read(0xFFFF) << 8)
-        elif opcode == 0x01:  # ORA (Indirect,X)
-            addr = self.addr_indirect_x()
-            self.ora(self.bus.read(addr))
-        elif opcode == 0x05:  # ORA Zero Page
-            addr = self.addr_zero_page()
-            self.ora(self.bus.read(addr))
-        elif opcode == 0x06:  # ASL Zero Page
-            addr = self.addr_zero_page()
-            self.asl(addr)
-        elif opcode == 0x08:  # PHP
-            # Push SR with B flag and U flag set
-            flags = self.STATUS | FLAG_B | FLAG_U
-            self.push(flags)
-        elif opcode == 0x09:  # ORA Immediate
-            value = self.fetch_byte()
-            self.ora(value)
-        elif opcode == 0x0A:  # ASL A
-            self.asl()
-        elif opcode == 0x0D:  # ORA Absolute
-            addr = self.addr_absolute()
-            self.ora(self.bus.read(addr))
-        elif opcode == 0x0E:  # ASL Absolute
-            addr = self.addr_absolute()
-            self.asl(addr)
-        elif opcode == 0x10:  # BPL (Branch if Positive)
-            offset = self.fetch_byte()
-            if not self.get_flag(FLAG_N):  # Negative flag clear => positive
-                # branch taken
-                cycles += 1
-                new_pc = (self.PC + ((offset ^ 0x80) - 0x80)) & 0xFFFF  # sign-extend offset
-                if (new_pc & 0xFF00) != (self.PC & 0xFF00):
-                    cycles += 1  # page boundary crossed
-                self.PC = new_pc
-        elif opcode == 0x11:  # ORA (Indirect),Y
-            addr = self.addr_indirect_y(check_page_cross=True)
-            self.ora(self.bus.read(addr))
-        elif opcode == 0x15:  # ORA Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.ora(self.bus.read(addr))
-        elif opcode == 0x16:  # ASL Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.asl(addr)
-        elif opcode == 0x18:  # CLC
-            self.set_flag(FLAG_C, False)
-        elif opcode == 0x19:  # ORA Absolute,Y
-            addr = self.addr_absolute_y(check_page_cross=True)
-            self.ora(self.bus.read(addr))
-        elif opcode == 0x1D:  # ORA Absolute,X
-            addr = self.addr_absolute_x(check_page_cross=True)
-            self.ora(self.bus.read(addr))
-        elif opcode == 0x1E:  # ASL Absolute,X
-            addr = self.addr_absolute_x()  # ASL abs,X ignores page penalty
-            self.asl(addr)
-        elif opcode == 0x20:  # JSR Absolute
-            addr = self.addr_absolute()  # get target address
-            # Push address of last byte of JSR (PC-1) onto stack
-            return_addr = (self.PC - 1) & 0xFFFF
-            self.push((return_addr >> 8) & 0xFF)
-            self.push(return_addr & 0xFF)
-            self.PC = addr
-        elif opcode == 0x21:  # AND (Indirect,X)
-            addr = self.addr_indirect_x()
-            self.and_(self.bus.read(addr))
-        elif opcode == 0x24:  # BIT Zero Page
-            addr = self.addr_zero_page()
-            self.bit_test(self.bus.read(addr))
-        elif opcode == 0x25:  # AND Zero Page
-            addr = self.addr_zero_page()
-            self.and_(self.bus.read(addr))
-        elif opcode == 0x26:  # ROL Zero Page
-            addr = self.addr_zero_page()
-            self.rol(addr)
-        elif opcode == 0x28:  # PLP
-            self.STATUS = self.pop()
-            # The B flag and unused flag bits 4 and 5 in the status are not actual flags, ensure proper state:
-            self.STATUS |= FLAG_U
-            self.STATUS &= ~FLAG_B
-        elif opcode == 0x29:  # AND Immediate
-            val = self.fetch_byte()
-            self.and_(val)
-        elif opcode == 0x2A:  # ROL A
-            self.rol()
-        elif opcode == 0x2C:  # BIT Absolute
-            addr = self.addr_absolute()
-            self.bit_test(self.bus.read(addr))
-        elif opcode == 0x2D:  # AND Absolute
-            addr = self.addr_absolute()
-            self.and_(self.bus.read(addr))
-        elif opcode == 0x2E:  # ROL Absolute
-            addr = self.addr_absolute()
-            self.rol(addr)
-        elif opcode == 0x30:  # BMI (Branch if Minus)
-            offset = self.fetch_byte()
-            if self.get_flag(FLAG_N):
-                cycles += 1
-                new_pc = (self.PC + ((offset ^ 0x80) - 0x80)) & 0xFFFF
-                if (new_pc & 0xFF00) != (self.PC & 0xFF00):
-                    cycles += 1
-                self.PC = new_pc
-        elif opcode == 0x31:  # AND (Indirect),Y
-            addr = self.addr_indirect_y(check_page_cross=True)
-            self.and_(self.bus.read(addr))
-        elif opcode == 0x35:  # AND Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.and_(self.bus.read(addr))
-        elif opcode == 0x36:  # ROL Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.rol(addr)
-        elif opcode == 0x38:  # SEC
-            self.set_flag(FLAG_C, True)
-        elif opcode == 0x39:  # AND Absolute,Y
-            addr = self.addr_absolute_y(check_page_cross=True)
-            self.and_(self.bus.read(addr))
-        elif opcode == 0x3D:  # AND Absolute,X
-            addr = self.addr_absolute_x(check_page_cross=True)
-            self.and_(self.bus.read(addr))
-        elif opcode == 0x3E:  # ROL Absolute,X
-            addr = self.addr_absolute_x()
-            self.rol(addr)
-        elif opcode == 0x40:  # RTI
-            # Pull flags, then PC from stack
-            self.STATUS = self.pop()
-            self.STATUS |= FLAG_U
-            self.STATUS &= ~FLAG_B
-            lo = self.pop()
-            hi = self.pop()
-            self.PC = lo | (hi << 8)
-        elif opcode == 0x41:  # EOR (Indirect,X)
-            addr = self.addr_indirect_x()
-            self.eor(self.bus.read(addr))
-        elif opcode == 0x45:  # EOR Zero Page
-            addr = self.addr_zero_page()
-            self.eor(self.bus.read(addr))
-        elif opcode == 0x46:  # LSR Zero Page
-            addr = self.addr_zero_page()
-            self.lsr(addr)
-        elif opcode == 0x48:  # PHA
-            self.push(self.A)
-        elif opcode == 0x49:  # EOR Immediate
-            val = self.fetch_byte()
-            self.eor(val)
-        elif opcode == 0x4A:  # LSR A
-            self.lsr()
-        elif opcode == 0x4C:  # JMP Absolute
-            addr = self.addr_absolute()
-            self.PC = addr
-        elif opcode == 0x4D:  # EOR Absolute
-            addr = self.addr_absolute()
-            self.eor(self.bus.read(addr))
-        elif opcode == 0x4E:  # LSR Absolute
-            addr = self.addr_absolute()
-            self.lsr(addr)
-        elif opcode == 0x50:  # BVC (Branch if Overflow Clear)
-            offset = self.fetch_byte()
-            if not self.get_flag(FLAG_V):
-                cycles += 1
-                new_pc = (self.PC + ((offset ^ 0x80) - 0x80)) & 0xFFFF
-                if (new_pc & 0xFF00) != (self.PC & 0xFF00):
-                    cycles += 1
-                self.PC = new_pc
-        elif opcode == 0x51:  # EOR (Indirect),Y
-            addr = self.addr_indirect_y(check_page_cross=True)
-            self.eor(self.bus.read(addr))
-        elif opcode == 0x55:  # EOR Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.eor(self.bus.read(addr))
-        elif opcode == 0x56:  # LSR Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.lsr(addr)
-        elif opcode == 0x58:  # CLI
-            self.set_flag(FLAG_I, False)
-        elif opcode == 0x59:  # EOR Absolute,Y
-            addr = self.addr_absolute_y(check_page_cross=True)
-            self.eor(self.bus.read(addr))
-        elif opcode == 0x5D:  # EOR Absolute,X
-            addr = self.addr_absolute_x(check_page_cross=True)
-            self.eor(self.bus.read(addr))
-        elif opcode == 0x5E:  # LSR Absolute,X
-            addr = self.addr_absolute_x()
-            self.lsr(addr)
-        elif opcode == 0x60:  # RTS
-            lo = self.pop()
-            hi = self.pop()
-            self.PC = (lo | (hi << 8)) + 1
-            self.PC &= 0xFFFF
-        elif opcode == 0x61:  # ADC (Indirect,X)
-            addr = self.addr_indirect_x()
-            self.adc(self.bus.read(addr))
-        elif opcode == 0x65:  # ADC Zero Page
-            addr = self.addr_zero_page()
-            self.adc(self.bus.read(addr))
-        elif opcode == 0x66:  # ROR Zero Page
-            addr = self.addr_zero_page()
-            self.ror(addr)
-        elif opcode == 0x68:  # PLA
-            self.A = self.pop()
-            self.update_zn(self.A)
-        elif opcode == 0x69:  # ADC Immediate
-            val = self.fetch_byte()
-            self.adc(val)
-        elif opcode == 0x6A:  # ROR A
-            self.ror()
-        elif opcode == 0x6C:  # JMP (Indirect)
-            addr = self.addr_indirect()
-            self.PC = addr
-        elif opcode == 0x6D:  # ADC Absolute
-            addr = self.addr_absolute()
-            self.adc(self.bus.read(addr))
-        elif opcode == 0x6E:  # ROR Absolute
-            addr = self.addr_absolute()
-            self.ror(addr)
-        elif opcode == 0x70:  # BVS (Branch if Overflow Set)
-            offset = self.fetch_byte()
-            if self.get_flag(FLAG_V):
-                cycles += 1
-                new_pc = (self.PC + ((offset ^ 0x80) - 0x80)) & 0xFFFF
-                if (new_pc & 0xFF00) != (self.PC & 0xFF00):
-                    cycles += 1
-                self.PC = new_pc
-        elif opcode == 0x71:  # ADC (Indirect),Y
-            addr = self.addr_indirect_y(check_page_cross=True)
-            self.adc(self.bus.read(addr))
-        elif opcode == 0x75:  # ADC Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.adc(self.bus.read(addr))
-        elif opcode == 0x76:  # ROR Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.ror(addr)
-        elif opcode == 0x78:  # SEI
-            self.set_flag(FLAG_I, True)
-        elif opcode == 0x79:  # ADC Absolute,Y
-            addr = self.addr_absolute_y(check_page_cross=True)
-            self.adc(self.bus.read(addr))
-        elif opcode == 0x7D:  # ADC Absolute,X
-            addr = self.addr_absolute_x(check_page_cross=True)
-            self.adc(self.bus.read(addr))
-        elif opcode == 0x7E:  # ROR Absolute,X
-            addr = self.addr_absolute_x()
-            self.ror(addr)
-        elif opcode == 0x81:  # STA (Indirect,X)
-            addr = self.addr_indirect_x()
-            self.bus.write(addr, self.A)
-        elif opcode == 0x84:  # STY Zero Page
-            addr = self.addr_zero_page()
-            self.bus.write(addr, self.Y)
-        elif opcode == 0x85:  # STA Zero Page
-            addr = self.addr_zero_page()
-            self.bus.write(addr, self.A)
-        elif opcode == 0x86:  # STX Zero Page
-            addr = self.addr_zero_page()
-            self.bus.write(addr, self.X)
-        elif opcode == 0x88:  # DEY
-            self.Y = (self.Y - 1) & 0xFF
-            self.update_zn(self.Y)
-        elif opcode == 0x8A:  # TXA
-            self.A = self.X
-            self.update_zn(self.A)
-        elif opcode == 0x8C:  # STY Absolute
-            addr = self.addr_absolute()
-            self.bus.write(addr, self.Y)
-        elif opcode == 0x8D:  # STA Absolute
-            addr = self.addr_absolute()
-            self.bus.write(addr, self.A)
-        elif opcode == 0x8E:  # STX Absolute
-            addr = self.addr_absolute()
-            self.bus.write(addr, self.X)
-        elif opcode == 0x90:  # BCC
-            offset = self.fetch_byte()
-            if not self.get_flag(FLAG_C):
-                cycles += 1
-                new_pc = (self.PC + ((offset ^ 0x80) - 0x80)) & 0xFFFF
-                if (new_pc & 0xFF00) != (self.PC & 0xFF00):
-                    cycles += 1
-                self.PC = new_pc
-        elif opcode == 0x91:  # STA (Indirect),Y
-            addr = self.addr_indirect_y()
-            self.bus.write(addr, self.A)
-        elif opcode == 0x94:  # STY Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.bus.write(addr, self.Y)
-        elif opcode == 0x95:  # STA Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.bus.write(addr, self.A)
-        elif opcode == 0x96:  # STX Zero Page,Y
-            addr = self.addr_zero_page_y()
-            self.bus.write(addr, self.X)
-        elif opcode == 0x98:  # TYA
-            self.A = self.Y
-            self.update_zn(self.A)
-        elif opcode == 0x99:  # STA Absolute,Y
-            addr = self.addr_absolute_y()
-            self.bus.write(addr, self.A)
-        elif opcode == 0x9A:  # TXS
-            self.SP = self.X
-        elif opcode == 0x9D:  # STA Absolute,X
-            addr = self.addr_absolute_x()
-            self.bus.write(addr, self.A)
-        elif opcode == 0xA0:  # LDY Immediate
-            self.Y = self.fetch_byte()
-            self.update_zn(self.Y)
-        elif opcode == 0xA1:  # LDA (Indirect,X)
-            addr = self.addr_indirect_x()
-            self.A = self.bus.read(addr)
-            self.update_zn(self.A)
-        elif opcode == 0xA2:  # LDX Immediate
-            self.X = self.fetch_byte()
-            self.update_zn(self.X)
-        elif opcode == 0xA4:  # LDY Zero Page
-            addr = self.addr_zero_page()
-            self.Y = self.bus.read(addr)
-            self.update_zn(self.Y)
-        elif opcode == 0xA5:  # LDA Zero Page
-            addr = self.addr_zero_page()
-            self.A = self.bus.read(addr)
-            self.update_zn(self.A)
-        elif opcode == 0xA6:  # LDX Zero Page
-            addr = self.addr_zero_page()
-            self.X = self.bus.read(addr)
-            self.update_zn(self.X)
-        elif opcode == 0xA8:  # TAY
-            self.Y = self.A
-            self.update_zn(self.Y)
-        elif opcode == 0xA9:  # LDA Immediate
-            self.A = self.fetch_byte()
-            self.update_zn(self.A)
-        elif opcode == 0xAA:  # TAX
-            self.X = self.A
-            self.update_zn(self.X)
-        elif opcode == 0xAC:  # LDY Absolute
-            addr = self.addr_absolute()
-            self.Y = self.bus.read(addr)
-            self.update_zn(self.Y)
-        elif opcode == 0xAD:  # LDA Absolute
-            addr = self.addr_absolute()
-            self.A = self.bus.read(addr)
-            self.update_zn(self.A)
-        elif opcode == 0xAE:  # LDX Absolute
-            addr = self.addr_absolute()
-            self.X = self.bus.read(addr)
-            self.update_zn(self.X)
-        elif opcode == 0xB0:  # BCS
-            offset = self.fetch_byte()
-            if self.get_flag(FLAG_C):
-                cycles += 1
-                new_pc = (self.PC + ((offset ^ 0x80) - 0x80)) & 0xFFFF
-                if (new_pc & 0xFF00) != (self.PC & 0xFF00):
-                    cycles += 1
-                self.PC = new_pc
-        elif opcode == 0xB1:  # LDA (Indirect),Y
-            addr = self.addr_indirect_y(check_page_cross=True)
-            self.A = self.bus.read(addr)
-            self.update_zn(self.A)
-        elif opcode == 0xB4:  # LDY Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.Y = self.bus.read(addr)
-            self.update_zn(self.Y)
-        elif opcode == 0xB5:  # LDA Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.A = self.bus.read(addr)
-            self.update_zn(self.A)
-        elif opcode == 0xB6:  # LDX Zero Page,Y
-            addr = self.addr_zero_page_y()
-            self.X = self.bus.read(addr)
-            self.update_zn(self.X)
-        elif opcode == 0xB8:  # CLV
-            self.set_flag(FLAG_V, False)
-        elif opcode == 0xB9:  # LDA Absolute,Y
-            addr = self.addr_absolute_y(check_page_cross=True)
-            self.A = self.bus.read(addr)
-            self.update_zn(self.A)
-        elif opcode == 0xBA:  # TSX
-            self.X = self.SP
-            self.update_zn(self.X)
-        elif opcode == 0xBC:  # LDY Absolute,X
-            addr = self.addr_absolute_x(check_page_cross=True)
-            self.Y = self.bus.read(addr)
-            self.update_zn(self.Y)
-        elif opcode == 0xBD:  # LDA Absolute,X
-            addr = self.addr_absolute_x(check_page_cross=True)
-            self.A = self.bus.read(addr)
-            self.update_zn(self.A)
-        elif opcode == 0xBE:  # LDX Absolute,Y
-            addr = self.addr_absolute_y(check_page_cross=True)
-            self.X = self.bus.read(addr)
-            self.update_zn(self.X)
-        elif opcode == 0xC0:  # CPY Immediate
-            value = self.fetch_byte()
-            self.cmp(self.Y, value)
-        elif opcode == 0xC1:  # CMP (Indirect,X)
-            addr = self.addr_indirect_x()
-            self.cmp(self.A, self.bus.read(addr))
-        elif opcode == 0xC4:  # CPY Zero Page
-            addr = self.addr_zero_page()
-            self.cmp(self.Y, self.bus.read(addr))
-        elif opcode == 0xC5:  # CMP Zero Page
-            addr = self.addr_zero_page()
-            self.cmp(self.A, self.bus.read(addr))
-        elif opcode == 0xC6:  # DEC Zero Page
-            addr = self.addr_zero_page()
-            val = (self.bus.read(addr) - 1) & 0xFF
-            self.bus.write(addr, val)
-            self.update_zn(val)
-        elif opcode == 0xC8:  # INY
-            self.Y = (self.Y + 1) & 0xFF
-            self.update_zn(self.Y)
-        elif opcode == 0xC9:  # CMP Immediate
-            value = self.fetch_byte()
-            self.cmp(self.A, value)
-        elif opcode == 0xCA:  # DEX
-            self.X = (self.X - 1) & 0xFF
-            self.update_zn(self.X)
-        elif opcode == 0xCC:  # CPY Absolute
-            addr = self.addr_absolute()
-            self.cmp(self.Y, self.bus.read(addr))
-        elif opcode == 0xCD:  # CMP Absolute
-            addr = self.addr_absolute()
-            self.cmp(self.A, self.bus.read(addr))
-        elif opcode == 0xCE:  # DEC Absolute
-            addr = self.addr_absolute()
-            val = (self.bus.read(addr) - 1) & 0xFF
-            self.bus.write(addr, val)
-            self.update_zn(val)
-        elif opcode == 0xD0:  # BNE
-            offset = self.fetch_byte()
-            if not self.get_flag(FLAG_Z):
-                cycles += 1
-                new_pc = (self.PC + ((offset ^ 0x80) - 0x80)) & 0xFFFF
-                if (new_pc & 0xFF00) != (self.PC & 0xFF00):
-                    cycles += 1
-                self.PC = new_pc
-        elif opcode == 0xD1:  # CMP (Indirect),Y
-            addr = self.addr_indirect_y(check_page_cross=True)
-            self.cmp(self.A, self.bus.read(addr))
-        elif opcode == 0xD5:  # CMP Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.cmp(self.A, self.bus.read(addr))
-        elif opcode == 0xD6:  # DEC Zero Page,X
-            addr = self.addr_zero_page_x()
-            val = (self.bus.read(addr) - 1) & 0xFF
-            self.bus.write(addr, val)
-            self.update_zn(val)
-        elif opcode == 0xD8:  # CLD
-            self.set_flag(FLAG_D, False)
-        elif opcode == 0xD9:  # CMP Absolute,Y
-            addr = self.addr_absolute_y(check_page_cross=True)
-            self.cmp(self.A, self.bus.read(addr))
-        elif opcode == 0xDD:  # CMP Absolute,X
-            addr = self.addr_absolute_x(check_page_cross=True)
-            self.cmp(self.A, self.bus.read(addr))
-        elif opcode == 0xDE:  # DEC Absolute,X
-            addr = self.addr_absolute_x()
-            val = (self.bus.read(addr) - 1) & 0xFF
-            self.bus.write(addr, val)
-            self.update_zn(val)
-        elif opcode == 0xE0:  # CPX Immediate
-            value = self.fetch_byte()
-            self.cmp(self.X, value)
-        elif opcode == 0xE1:  # SBC (Indirect,X)
-            addr = self.addr_indirect_x()
-            self.sbc(self.bus.read(addr))
-        elif opcode == 0xE4:  # CPX Zero Page
-            addr = self.addr_zero_page()
-            self.cmp(self.X, self.bus.read(addr))
-        elif opcode == 0xE5:  # SBC Zero Page
-            addr = self.addr_zero_page()
-            self.sbc(self.bus.read(addr))
-        elif opcode == 0xE6:  # INC Zero Page
-            addr = self.addr_zero_page()
-            val = (self.bus.read(addr) + 1) & 0xFF
-            self.bus.write(addr, val)
-            self.update_zn(val)
-        elif opcode == 0xE8:  # INX
-            self.X = (self.X + 1) & 0xFF
-            self.update_zn(self.X)
-        elif opcode == 0xE9:  # SBC Immediate
-            val = self.fetch_byte()
-            self.sbc(val)
-        elif opcode == 0xEA:  # NOP
-            pass  # do nothing
-        elif opcode == 0xEC:  # CPX Absolute
-            addr = self.addr_absolute()
-            self.cmp(self.X, self.bus.read(addr))
-        elif opcode == 0xED:  # SBC Absolute
-            addr = self.addr_absolute()
-            self.sbc(self.bus.read(addr))
-        elif opcode == 0xEE:  # INC Absolute
-            addr = self.addr_absolute()
-            val = (self.bus.read(addr) + 1) & 0xFF
-            self.bus.write(addr, val)
-            self.update_zn(val)
-        elif opcode == 0xF0:  # BEQ
-            offset = self.fetch_byte()
-            if self.get_flag(FLAG_Z):
-                cycles += 1
-                new_pc = (self.PC + ((offset ^ 0x80) - 0x80)) & 0xFFFF
-                if (new_pc & 0xFF00) != (self.PC & 0xFF00):
-                    cycles += 1
-                self.PC = new_pc
-        elif opcode == 0xF1:  # SBC (Indirect),Y
-            addr = self.addr_indirect_y(check_page_cross=True)
-            self.sbc(self.bus.read(addr))
-        elif opcode == 0xF5:  # SBC Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.sbc(self.bus.read(addr))
-        elif opcode == 0xF6:  # INC Zero Page,X
-            addr = self.addr_zero_page_x()
-            val = (self.bus.read(addr) + 1) & 0xFF
-            self.bus.write(addr, val)
-            self.update_zn(val)
-        elif opcode == 0xF8:  # SED
-            self.set_flag(FLAG_D, True)
-        elif opcode == 0xF9:  # SBC Absolute,Y
-            addr = self.addr_absolute_y(check_page_cross=True)
-            self.sbc(self.bus.read(addr))
-        elif opcode == 0xFD:  # SBC Absolute,X
-            addr = self.addr_absolute_x(check_page_cross=True)
-            self.sbc(self.bus.read(addr))
-        elif opcode == 0xFE:  # INC Absolute,X
-            addr = self.addr_absolute_x()
-            val = (self.bus.read(addr) + 1) & 0xFF
-            self.bus.write(addr, val)
-            self.update_zn(val)
-        else:
-            # Unsupported/illegal opcode
-            # For simplicity, we'll treat any unknown opcode as NOP
-            # In a full emulator, you might implement unofficial opcodes or handle gracefully.
-            pass
+        def execute_instruction():
+            bucket = cpu.PC >> pc_shift
+            start = clock()
+            opcode = cpu.fetch_byte()
+            handler, mode, cycles = dispatch[opcode]
+            extra = handler(cpu, mode)
+            elapsed = clock() - start
+            self.instructions += 1
+            opcode_counts[opcode] += 1
+            opcode_time[opcode] += elapsed
+            pc_counts[bucket] = pc_counts.get(bucket, 0) + 1
+            if extra:
+                cycles += extra
+            return cycles
         
-        return cycles
+        def read(addr):
+            read_counts[region_by_page[(addr >> 8) & 0xFF]] += 1
+            return bus_read(addr)
+        
+        def write(addr, data):
+            write_counts[region_by_page[(addr >> 8) & 0xFF]] += 1
+            bus_write(addr, data)
+        
+        cpu.execute_instruction = execute_instruction
+        bus.read = read
+        bus.write = write
+        self.active = True
+    
+    def stop(self):
+        if not self.active:
+            return
+        del self.cpu.execute_instruction
+        del self.cpu.bus.read
+        del self.cpu.bus.write
+        self.active = False
+    
+    def _mode_totals(self):
+        """Aggregate per-opcode counts and times by addressing mode."""
+        counts, times = {}, {}
+        for opcode, (handler, mode, cycles) in enumerate(self.cpu.DISPATCH):
+            if not self.opcode_counts[opcode]:
+                continue
+            name = mode.__name__[5:] if mode else "implied"  # strip the "addr_" prefix
+            counts[name] = counts.get(name, 0) + self.opcode_counts[opcode]
+            times[name] = times.get(name, 0.0) + self.opcode_time[opcode]
+        return counts, times
+    
+    def report(self, top=16):
+        """Return a text report sorted by host time spent."""
+        total_time = sum(self.opcode_time) or 1e-9
+        lines = [f"Instructions: {self.instructions}  Host time: {total_time * 1000:.1f} ms", ""]
+        lines.append("Opcode  Handler       Count      ms      %")
+        hot = sorted(range(256), key=lambda op: self.opcode_time[op], reverse=True)
+        for opcode in hot[:top]:
+            if not self.opcode_counts[opcode]:
+                break
+            handler = self.cpu.DISPATCH[opcode][0].__name__
+            ms = self.opcode_time[opcode] * 1000
+            lines.append(f"  ${opcode:02X}   {handler:<10} {self.opcode_counts[opcode]:>9} {ms:>7.1f} {100 * self.opcode_time[opcode] / total_time:>6.1f}")
+        lines += ["", "Addressing mode       Count      ms      %"]
+        counts, times = self._mode_totals()
+        for name in sorted(times, key=times.get, reverse=True):
+            lines.append(f"  {name:<16} {counts[name]:>9} {times[name] * 1000:>7.1f} {100 * times[name] / total_time:>6.1f}")
+        lines += ["", "Hot PC ranges         Count      %"]
+        size = 1 << self.PC_RANGE_BITS
+        for bucket in sorted(self.pc_counts, key=self.pc_counts.get, reverse=True)[:top]:
+            start = bucket * size
+            count = self.pc_counts[bucket]
+            lines.append(f"  ${start:04X}-${start + size - 1:04X}   {count:>9} {100 * count / (self.instructions or 1):>6.1f}")
+        lines += ["", "Bus region         Reads     Writes"]
+        for i, name in enumerate(BUS_REGIONS):
+            lines.append(f"  {name:<10} {self.read_counts[i]:>10} {self.write_counts[i]:>10}")
+        return "\n".join(lines)
+
+def _resolve_operand(mode, pc, operand):
+    """Return an addressing-mode callable with the operand bytes already decoded.
+    
+    `pc` is the address of the first operand byte. The returned callable has the
+    same contract as the CPU6502.addr_* helpers, minus the instruction fetches.
+    """
+    cpu_class = CPU6502
+    if mode is None:
+        return None
+    if mode is cpu_class.addr_immediate:
+        return lambda cpu, addr=pc: addr
+    if mode is cpu_class.addr_zero_page or mode is cpu_class.addr_absolute:
+        return lambda cpu, addr=operand: addr
+    if mode is cpu_class.addr_zero_page_x:
+        return lambda cpu, zp=operand: (zp + cpu.X) & 0xFF
+    if mode is cpu_class.addr_zero_page_y:
+        return lambda cpu, zp=operand: (zp + cpu.Y) & 0xFF
+    if mode is cpu_class.addr_absolute_x:
+        return lambda cpu, base=operand: (base + cpu.X) & 0xFFFF
+    if mode is cpu_class.addr_absolute_y:
+        return lambda cpu, base=operand: (base + cpu.Y) & 0xFFFF
+    if mode is cpu_class.addr_absolute_x_pc or mode is cpu_class.addr_absolute_y_pc:
+        use_x = mode is cpu_class.addr_absolute_x_pc
+        def indexed(cpu, base=operand):
+            addr = (base + (cpu.X if use_x else cpu.Y)) & 0xFFFF
+            if (addr & 0xFF00) != (base & 0xFF00):
+                cpu.bus.cycles += 1  # extra cycle for page boundary crossing
+            return addr
+        return indexed
+    if mode is cpu_class.addr_indirect_x:
+        def indexed_indirect(cpu, zp=operand):
+            zp_addr = (zp + cpu.X) & 0xFF
+            return cpu.bus.read(zp_addr) | (cpu.bus.read((zp_addr + 1) & 0xFF) << 8)
+        return indexed_indirect
+    if mode is cpu_class.addr_indirect_y or mode is cpu_class.addr_indirect_y_pc:
+        check_page_cross = mode is cpu_class.addr_indirect_y_pc
+        def indirect_indexed(cpu, zp=operand):
+            base = cpu.bus.read(zp) | (cpu.bus.read((zp + 1) & 0xFF) << 8)
+            addr = (base + cpu.Y) & 0xFFFF
+            if check_page_cross and (addr & 0xFF00) != (base & 0xFF00):
+                cpu.bus.cycles += 1
+            return addr
+        return indirect_indexed
+    raise ValueError(f"no block form for addressing mode {mode.__name__}")
+
+class BlockCache:
+    """Basic-block caching front end for CPU6502.
+    
+    Straight-line code is decoded once into a block: a list of (handler, mode,
+    cycles so far, next PC) entries whose addressing modes already carry their
+    operand bytes, plus the summed base cycles. The control-flow instruction
+    that ends a block (branch, jump, call, return, BRK) runs through the normal
+    interpreter. Blocks are keyed by start PC. Blocks decoded from writable
+    memory (RAM, PRG RAM) trap writes to their pages through the bus page
+    table, and any write there drops the page's blocks; a block that rewrites
+    code stops right after the store so the new bytes are decoded afresh.
+    """
+    MAX_BLOCK_INSTRUCTIONS = 32
+    # Operand bytes following each opcode, by addressing mode
+    OPERAND_SIZES = {
+        None: 0,
+        CPU6502.addr_immediate: 1, CPU6502.addr_zero_page: 1,
+        CPU6502.addr_zero_page_x: 1, CPU6502.addr_zero_page_y: 1,
+        CPU6502.addr_indirect_x: 1, CPU6502.addr_indirect_y: 1, CPU6502.addr_indirect_y_pc: 1,
+        CPU6502.addr_absolute: 2, CPU6502.addr_absolute_x: 2, CPU6502.addr_absolute_y: 2,
+        CPU6502.addr_absolute_x_pc: 2, CPU6502.addr_absolute_y_pc: 2, CPU6502.addr_indirect: 2,
+    }
+    # Handlers that change control flow and therefore end a block
+    TERMINATORS = {
+        CPU6502.op_brk, CPU6502.op_jmp, CPU6502.op_jsr, CPU6502.op_rts, CPU6502.op_rti,
+        CPU6502.op_bpl, CPU6502.op_bmi, CPU6502.op_bvc, CPU6502.op_bvs,
+        CPU6502.op_bcc, CPU6502.op_bcs, CPU6502.op_bne, CPU6502.op_beq,
+    }
+    
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.blocks = {}
+        self.code_pages = {}   # physical page -> start PCs of blocks decoded from it
+        self.trapped = {}      # CPU page -> memoryview whose fast write path was removed
+        self.invalidated = False  # set when a write drops blocks, so the running block can stop
+    
+    def clear(self):
+        """Drop every cached block (e.g. after the bus page tables were rebuilt)."""
+        self.blocks.clear()
+        self.code_pages.clear()
+        self.trapped.clear()
+    
+    def compile_block(self, start):
+        """Decode the straight-line run starting at `start`, or None if it can't be cached."""
+        read_pages = self.cpu.bus.read_pages
+        dispatch = self.cpu.DISPATCH
+        
+        def peek(addr):
+            # Only decode from memory-backed pages; MMIO reads have side effects
+            page = read_pages[addr >> 8]
+            return None if page is None else page[addr & 0xFF]
+        
+        if peek(start) is None:
+            return None
+        ops = []
+        cycles = 0
+        pc = start
+        ends_with_jump = False
+        while len(ops) < self.MAX_BLOCK_INSTRUCTIONS:
+            opcode = peek(pc)
+            if opcode is None:
+                break
+            handler, mode, base_cycles = dispatch[opcode]
+            if handler in self.TERMINATORS:
+                ends_with_jump = True
+                break
+            operand_bytes = [peek((pc + 1 + i) & 0xFFFF) for i in range(self.OPERAND_SIZES[mode])]
+            if None in operand_bytes:
+                break
+            operand = sum(byte << (8 * i) for i, byte in enumerate(operand_bytes))
+            cycles += base_cycles
+            next_pc = (pc + 1 + len(operand_bytes)) & 0xFFFF
+            ops.append((handler, _resolve_operand(mode, (pc + 1) & 0xFFFF, operand), cycles, next_pc))
+            pc = next_pc
+        block = (ops, cycles, pc, ends_with_jump)
+        self.blocks[start] = block
+        if start < 0x8000 and ops:
+            # Decoded from writable memory (RAM or PRG RAM): watch every page the block covers
+            last = (pc - 1) & 0xFFFF
+            for page in range(start >> 8, (last >> 8) + 1):
+                self._watch_page(page, start)
+        return block
+    
+    def _mirror_pages(self, page):
+        """CPU pages sharing storage with `page` (internal RAM is mirrored 4 times)."""
+        if page < 0x20:
+            return [(page & 0x07) + mirror for mirror in range(0, 0x20, 0x08)]
+        return [page]
+    
+    def _watch_page(self, page, start):
+        bus = self.cpu.bus
+        mirrors = self._mirror_pages(page)
+        self.code_pages.setdefault(mirrors[0], set()).add(start)
+        for mirror in mirrors:
+            if mirror not in self.trapped and bus.write_pages[mirror] is not None:
+                self.trapped[mirror] = bus.write_pages[mirror]
+                bus.write_pages[mirror] = None
+                bus.write_handlers[mirror] = self._write_code_page
+    
+    def _write_code_page(self, addr, data):
+        """Write handler for pages holding cached code: store, then invalidate."""
+        page = addr >> 8
+        self.trapped[page][addr & 0xFF] = data
+        self.invalidate_page(page)
+    
+    def invalidate_page(self, page):
+        """Drop the blocks decoded from `page` and restore its fast write path."""
+        bus = self.cpu.bus
+        mirrors = self._mirror_pages(page)
+        for start in self.code_pages.pop(mirrors[0], ()):
+            self.blocks.pop(start, None)
+        self.invalidated = True
+        for mirror in mirrors:
+            memory = self.trapped.pop(mirror, None)
+            if memory is not None:
+                bus.write_pages[mirror] = memory
+                bus.write_handlers[mirror] = bus.write_ignored
+    
+    def execute_block(self):
+        """Run one block; return (cycles, instructions executed)."""
+        cpu = self.cpu
+        block = self.blocks.get(cpu.PC)
+        if block is None:
+            block = self.compile_block(cpu.PC)
+            if block is None:
+                return cpu.execute_instruction(), 1
+        ops, cycles, end_pc, ends_with_jump = block
+        self.invalidated = False
+        for count, (handler, mode, cycles_done, next_pc) in enumerate(ops, 1):
+            handler(cpu, mode)
+            if self.invalidated:
+                # The store may have rewritten instructions still ahead in this block
+                cpu.PC = next_pc
+                return cycles_done, count
+        cpu.PC = end_pc
+        count = len(ops)
+        if ends_with_jump:
+            cycles += cpu.execute_instruction()
+            count += 1
+        return cycles, count
 
 class Bus:
     """Memory bus connecting CPU, PPU, and Cartridge."""
     def __init__(self):
         # 2KB internal RAM
-        self.ram = [0x00] * RAM_SIZE
+        self.ram = bytearray(RAM_SIZE)
         # PPU memory: 2KB nametable VRAM and 32-byte palette
-        self.vram = [0x00] * 0x800  # will mirror based on cart mirroring type
-        self.palette = [0x00] * 0x20
+        self.vram = bytearray(0x800)  # will mirror based on cart mirroring type
+        self.palette = bytearray(0x20)
         # OAM (sprite memory)
-        self.oam = [0x00] * 256
+        self.oam = bytearray(256)
         # Cartridge ROM/RAM
-        self.prg_rom = []   # PRG ROM bytes
-        self.prg_ram = [0x00] * 0x2000  # 8KB PRG RAM (if used by cart)
-        self.chr_rom = []   # CHR ROM bytes (pattern tables)
-        self.chr_ram = []   # if CHR RAM is needed (for carts with 0 CHR ROM)
+        self.prg_rom = bytes()   # PRG ROM bytes
+        self.prg_ram = bytearray(0x2000)  # 8KB PRG RAM (if used by cart)
+        self.chr_rom = bytes()   # CHR ROM bytes (pattern tables)
+        self.chr_ram = bytearray()   # if CHR RAM is needed (for carts with 0 CHR ROM)
+        self.chr_tiles = None  # pre-decoded pattern tables (NumPy renderer only)
+        self.chr_dirty = set()  # CHR RAM tiles written since they were last decoded
         # Mirroring type from cartridge ('H' or 'V')
         self.mirroring = 'H'
         # Controller state and shift registers
@@ -995,6 +1000,8 @@ class Bus:
         self.cpu = CPU6502(self)
         # Cycle counter (not real time, just for managing frames)
         self.cycles = 0
+        # CPU address space page tables (see map_memory)
+        self.map_memory()
     
     def load_cartridge(self, filepath):
         """Load an iNES format ROM file into memory."""
@@ -1018,24 +1025,29 @@ class Bus:
             offset += 512
         # Load PRG ROM
         prg_size = prg_banks * 16384
-        self.prg_rom = list(data[offset: offset + prg_size])
+        self.prg_rom = bytes(data[offset: offset + prg_size])
         offset += prg_size
         # Load CHR ROM (if size is 0, that means the cart uses CHR RAM instead)
         chr_size = chr_banks * 8192
         if chr_size == 0:
             # allocate 8KB CHR RAM
-            self.chr_ram = [0x00] * 8192
-            self.chr_rom = []
+            self.chr_ram = bytearray(8192)
+            self.chr_rom = bytes()
         else:
-            self.chr_rom = list(data[offset: offset + chr_size])
+            self.chr_rom = bytes(data[offset: offset + chr_size])
         # If only one PRG bank (16KB), mirror it into 0xC000-0xFFFF
         if prg_banks == 1:
             self.prg_rom = self.prg_rom * 2
+        # Pre-decode the pattern tables once for the vectorized renderer
+        if np is not None:
+            self.chr_tiles = decode_chr_tiles(self.chr_rom or self.chr_ram)
+        self.chr_dirty.clear()
         # Reset CPU and clear memory
-        self.ram = [0x00] * RAM_SIZE
-        self.vram = [0x00] * 0x800
-        self.palette = [0x00] * 0x20
-        self.oam = [0x00] * 256
+        self.ram = bytearray(RAM_SIZE)
+        self.vram = bytearray(0x800)
+        self.palette = bytearray(0x20)
+        self.oam = bytearray(256)
+        self.map_memory()
         self.cpu.reset()
         # Clear PPU scroll/addr toggles
         self.ppu_addr_latch = False
@@ -1045,214 +1057,311 @@ class Bus:
         self.controller_strobe = False
         self.controller_index = 0
     
+    def refresh_chr_tiles(self):
+        """Re-decode the CHR RAM tiles written since the last refresh."""
+        for tile in self.chr_dirty:
+            start = tile * 16
+            self.chr_tiles[tile] = decode_chr_tiles(self.chr_ram[start:start + 16])[0]
+        self.chr_dirty.clear()
+    
+    def nametable_offset(self, index):
+        """Offset into the 2KB VRAM of logical nametable 0-3 after mirroring."""
+        addr = 0x2000 + index * 0x400
+        if self.mirroring == 'H':
+            if addr & 0x0800:
+                addr = addr - 0x0800
+        elif self.mirroring == 'V':
+            if addr & 0x0400:
+                addr = addr - 0x0400
+        return addr & 0x07FF
+    
     # Memory read/write methods
-    def read(self, addr):
-        addr &= 0xFFFF
-        if addr < 0x2000:
+    def map_memory(self):
+        """Build the 256-entry CPU page tables.
+        
+        Pages backed by plain memory (RAM and its mirrors, PRG RAM, PRG ROM)
+        map to a 256-byte memoryview, so reads and writes are a single index.
+        All other pages dispatch to the MMIO handlers below.
+        """
+        ram = memoryview(self.ram)
+        prg_ram = memoryview(self.prg_ram)
+        prg_rom = memoryview(self.prg_rom)
+        self.read_pages = [None] * 256
+        self.write_pages = [None] * 256
+        self.read_handlers = [self.read_open_bus] * 256
+        self.write_handlers = [self.write_ignored] * 256
+        for page in range(0x00, 0x20):
             # Internal RAM (2KB mirrored each 0x800 bytes)
-            return self.ram[addr % RAM_SIZE]
-        elif addr < 0x4000:
+            start = (page & 0x07) << 8
+            self.read_pages[page] = self.write_pages[page] = ram[start:start + 0x100]
+        for page in range(0x20, 0x40):
             # PPU registers (mirrored every 8 bytes)
-            reg = addr & 0x2007
-            if reg == 0x2002:  # PPUSTATUS
-                # Reading PPUSTATUS: return status register, then clear vblank flag and address latch
-                value = self.ppu_status
-                # Clear VBlank flag (bit 7) after read
-                self.ppu_status &= 0x7F
-                # Reset latch for $2005/2006 writes
-                self.ppu_addr_latch = False
-                return value
-            elif reg == 0x2004:  # OAMDATA
-                # Read OAM at OAMADDR (OAMADDR is in bits 0-7 of ppu_ctrl? Actually in $2003 write-only)
-                # For simplicity, we'll not simulate OAMADDR and just assume sequential reads are from start
-                return self.oam[0]  # (not fully implemented)
-            elif reg == 0x2007:  # PPUDATA
-                # Reading from PPU memory
-                # PPU address is held in ppu_addr_temp or internal latch? 
-                # For simplicity, assume ppu_addr_temp holds the current VRAM address.
-                addr = self.ppu_addr_temp & 0x3FFF
-                # Palette reads:
-                if addr >= 0x3F00:
-                    # Read from palette memory (with mirroring of universal background)
-                    index = addr & 0x1F
-                    # Handle palette mirror: palette indices where index%4==0 all mirror the universal background at $3F00
-                    if (index & 0x03) == 0:
-                        index = 0
-                    data = self.palette[index]
-                else:
-                    # Nametable or CHR memory:
-                    if addr < 0x2000:
-                        # Pattern table (CHR ROM/RAM)
-                        if self.chr_rom:
-                            data = self.chr_rom[addr]
-                        else:
-                            data = self.chr_ram[addr]
+            self.read_handlers[page] = self.read_ppu_register
+            self.write_handlers[page] = self.write_ppu_register
+        # APU and I/O registers ($4000-$401F); the rest of the page is unused expansion space
+        self.read_handlers[0x40] = self.read_io_register
+        self.write_handlers[0x40] = self.write_io_register
+        for page in range(0x60, 0x80):
+            # Cartridge PRG RAM
+            start = (page - 0x60) << 8
+            self.read_pages[page] = self.write_pages[page] = prg_ram[start:start + 0x100]
+        if len(self.prg_rom):
+            for page in range(0x80, 0x100):
+                # Cartridge PRG ROM (read-only; writes fall through to write_ignored)
+                start = ((page - 0x80) << 8) % len(self.prg_rom)
+                self.read_pages[page] = prg_rom[start:start + 0x100]
+    
+    def read(self, addr):
+        addr &= 0xFFFF
+        page = self.read_pages[addr >> 8]
+        if page is not None:
+            return page[addr & 0xFF]
+        return self.read_handlers[addr >> 8](addr)
+    
+    def write(self, addr, data):
+        addr &= 0xFFFF
+        page = self.write_pages[addr >> 8]
+        if page is not None:
+            page[addr & 0xFF] = data & 0xFF
+        else:
+            self.write_handlers[addr >> 8](addr, data & 0xFF)
+    
+    def read_open_bus(self, addr):
+        # Cartridge expansion area and unmapped space (uncommon) read as 0
+        return 0
+    
+    def write_ignored(self, addr, data):
+        # Expansion space, and PRG ROM (read-only; writes might go to battery RAM on some carts, not in mapper0)
+        pass
+    
+    def read_ppu_register(self, addr):
+        reg = addr & 0x2007
+        if reg == 0x2002:  # PPUSTATUS
+            # Reading PPUSTATUS: return status register, then clear vblank flag and address latch
+            value = self.ppu_status
+            # Clear VBlank flag (bit 7) after read
+            self.ppu_status &= 0x7F
+            # Reset latch for $2005/2006 writes
+            self.ppu_addr_latch = False
+            return value
+        elif reg == 0x2004:  # OAMDATA
+            # Read OAM at OAMADDR (OAMADDR is in bits 0-7 of ppu_ctrl? Actually in $2003 write-only)
+            # For simplicity, we'll not simulate OAMADDR and just assume sequential reads are from start
+            return self.oam[0]  # (not fully implemented)
+        elif reg == 0x2007:  # PPUDATA
+            # Reading from PPU memory
+            # PPU address is held in ppu_addr_temp or internal latch? 
+            # For simplicity, assume ppu_addr_temp holds the current VRAM address.
+            addr = self.ppu_addr_temp & 0x3FFF
+            # Palette reads:
+            if addr >= 0x3F00:
+                # Read from palette memory (with mirroring of universal background)
+                index = addr & 0x1F
+                # Handle palette mirror: palette indices where index%4==0 all mirror the universal background at $3F00
+                if (index & 0x03) == 0:
+                    index = 0
+                data = self.palette[index]
+            else:
+                # Nametable or CHR memory:
+                if addr < 0x2000:
+                    # Pattern table (CHR ROM/RAM)
+                    if self.chr_rom:
+                        data = self.chr_rom[addr]
                     else:
-                        # Nametable VRAM (2KB mirrored)
-                        # Apply mirroring:
-                        if self.mirroring == 'H':
-                            # horizontal mirroring: mirror vertical, i.e., if addr >= 0x2800 subtract 0x0800
-                            if addr & 0x0800:
-                                addr = addr - 0x0800
-                        elif self.mirroring == 'V':
-                            # vertical mirroring: mirror horizontal, if addr in right half subtract 0x0400
-                            if addr & 0x0400:
-                                addr = addr - 0x0400
-                        # else if '4' (four-screen), we would not mirror (but we didn't implement separate 4-screen memory)
-                        addr_index = addr & 0x07FF
-                        data = self.vram[addr_index]
-                    # (For true accuracy, PPU reads have a buffered behavior, but we skip that.)
-                # Increment VRAM address after read by 1 or 32 depending on $2000 setting
-                if self.ppu_ctrl & 0x04:
-                    self.ppu_addr_temp = (self.ppu_addr_temp + 32) & 0xFFFF
+                        data = self.chr_ram[addr]
                 else:
-                    self.ppu_addr_temp = (self.ppu_addr_temp + 1) & 0xFFFF
-                return data & 0xFF
+                    # Nametable VRAM (2KB mirrored)
+                    # Apply mirroring:
+                    if self.mirroring == 'H':
+                        # horizontal mirroring: mirror vertical, i.e., if addr >= 0x2800 subtract 0x0800
+                        if addr & 0x0800:
+                            addr = addr - 0x0800
+                    elif self.mirroring == 'V':
+                        # vertical mirroring: mirror horizontal, if addr in right half subtract 0x0400
+                        if addr & 0x0400:
+                            addr = addr - 0x0400
+                    # else if '4' (four-screen), we would not mirror (but we didn't implement separate 4-screen memory)
+                    addr_index = addr & 0x07FF
+                    data = self.vram[addr_index]
+                # (For true accuracy, PPU reads have a buffered behavior, but we skip that.)
+            # Increment VRAM address after read by 1 or 32 depending on $2000 setting
+            if self.ppu_ctrl & 0x04:
+                self.ppu_addr_temp = (self.ppu_addr_temp + 32) & 0xFFFF
             else:
-                # Other PPU registers ($2000, $2001, $2003, $2005, $2006) are write-only or not readable
-                return 0
-        elif addr < 0x4020:
-            # APU and I/O registers
-            if addr == 0x4016:
-                # Controller 1 polling
-                if self.controller_strobe:
-                    # If strobe is high, return A bit (bit0 of controller) constantly
-                    bit = 1 if (self.controller_state & 0x01) else 0
-                else:
-                    # Return current shift register bit
-                    bit = 1 if (self.controller_shift & 0x01) else 0
-                    # Shift or keep index
-                    if self.controller_index < 8:
-                        self.controller_shift >>= 1
-                        self.controller_index += 1
-                    else:
-                        bit = 1  # after 8 reads, NES returns 1 on subsequent reads
-                return bit
-            # Unused or unimplemented registers (sound, expansion) return 0
-            return 0
-        elif addr < 0x6000:
-            # Normally cartridge expansion ROM or other hardware (uncommon)
-            return 0
-        elif addr < 0x8000:
-            # Cartridge PRG RAM (if present)
-            return self.prg_ram[addr - 0x6000]
+                self.ppu_addr_temp = (self.ppu_addr_temp + 1) & 0xFFFF
+            return data & 0xFF
         else:
-            # Cartridge PRG ROM
-            return self.prg_rom[addr - 0x8000]
+            # Other PPU registers ($2000, $2001, $2003, $2005, $2006) are write-only or not readable
+            return 0
     
-    def write(self, addr, data):
-        addr &= 0xFFFF
-        data &= 0xFF
-        if addr < 0x2000:
-            # Internal RAM
-            self.ram[addr % RAM_SIZE] = data
-        elif addr < 0x4000:
-            reg = addr & 0x2007
-            if reg == 0x2000:  # PPUCTRL
-                self.ppu_ctrl = data
-                # Nametable selection bits (0-1) might affect scroll base
-                # We'll incorporate this into scroll offsets when rendering.
-            elif reg == 0x2001:  # PPUMASK
-                self.ppu_mask = data
-            elif reg == 0x2003:  # OAMADDR
-                # Set OAM address (for writes via 0x2004). Not fully emulated.
-                pass
-            elif reg == 0x2004:  # OAMDATA
-                # Write to OAM (sprite memory) at OAMADDR
-                # We will simply write to first OAM entry for demo
-                self.oam[0] = data
-            elif reg == 0x2005:  # PPUSCROLL
-                # First write sets scroll X, second sets scroll Y
-                if not self.ppu_addr_latch:
-                    # First write
-                    # Horizontal scroll (3 lower bits fine X, 5 bits coarse X)
-                    self.ppu_scroll_x = data
-                    self.ppu_addr_latch = True
-                else:
-                    # Second write
-                    self.ppu_scroll_y = data
-                    self.ppu_addr_latch = False
-            elif reg == 0x2006:  # PPUADDR
-                # First write sets high byte, second sets low byte of VRAM address
-                if not self.ppu_addr_latch:
-                    # High 6 bits (only 14-bit address allowed)
-                    self.ppu_addr_temp = ((data & 0x3F) << 8) | (self.ppu_addr_temp & 0x00FF)
-                    self.ppu_addr_latch = True
+    def read_io_register(self, addr):
+        # APU and I/O registers
+        if addr == 0x4016:
+            # Controller 1 polling
+            if self.controller_strobe:
+                # If strobe is high, return A bit (bit0 of controller) constantly
+                bit = 1 if (self.controller_state & 0x01) else 0
+            else:
+                # Return current shift register bit
+                bit = 1 if (self.controller_shift & 0x01) else 0
+                # Shift or keep index
+                if self.controller_index < 8:
+                    self.controller_shift >>= 1
+                    self.controller_index += 1
                 else:
-                    self.ppu_addr_temp = (self.ppu_addr_temp & 0xFF00) | data
-                    # After full address is set, we might use it for subsequent PPUDATA access
-                    self.ppu_addr_latch = False
-                # Note: We do not directly use ppu_addr_temp for rendering until needed.
-            elif reg == 0x2007:  # PPUDATA (write)
-                addr = self.ppu_addr_temp & 0x3FFF
-                if addr >= 0x3F00:
-                    # Palette write
-                    index = addr & 0x1F
-                    if (index & 0x03) == 0:
-                        # Mirror universal background across all 0x??00,0x??04,0x??08,0x??0C, etc.
-                        self.palette[0x00] = data
-                        self.palette[0x04] = data
-                        self.palette[0x08] = data
-                        self.palette[0x0C] = data
-                        self.palette[0x10] = data
-                        self.palette[0x14] = data
-                        self.palette[0x18] = data
-                        self.palette[0x1C] = data
-                    else:
-                        self.palette[index] = data
+                    bit = 1  # after 8 reads, NES returns 1 on subsequent reads
+            return bit
+        # Unused or unimplemented registers (sound, expansion) return 0
+        return 0
+    
+    def write_ppu_register(self, addr, data):
+        reg = addr & 0x2007
+        if reg == 0x2000:  # PPUCTRL
+            self.ppu_ctrl = data
+            # Nametable selection bits (0-1) might affect scroll base
+            # We'll incorporate this into scroll offsets when rendering.
+        elif reg == 0x2001:  # PPUMASK
+            self.ppu_mask = data
+        elif reg == 0x2003:  # OAMADDR
+            # Set OAM address (for writes via 0x2004). Not fully emulated.
+            pass
+        elif reg == 0x2004:  # OAMDATA
+            # Write to OAM (sprite memory) at OAMADDR
+            # We will simply write to first OAM entry for demo
+            self.oam[0] = data
+        elif reg == 0x2005:  # PPUSCROLL
+            # First write sets scroll X, second sets scroll Y
+            if not self.ppu_addr_latch:
+                # First write
+                # Horizontal scroll (3 lower bits fine X, 5 bits coarse X)
+                self.ppu_scroll_x = data
+                self.ppu_addr_latch = True
+            else:
+                # Second write
+                self.ppu_scroll_y = data
+                self.ppu_addr_latch = False
+        elif reg == 0x2006:  # PPUADDR
+            # First write sets high byte, second sets low byte of VRAM address
+            if not self.ppu_addr_latch:
+                # High 6 bits (only 14-bit address allowed)
+                self.ppu_addr_temp = ((data & 0x3F) << 8) | (self.ppu_addr_temp & 0x00FF)
+                self.ppu_addr_latch = True
+            else:
+                self.ppu_addr_temp = (self.ppu_addr_temp & 0xFF00) | data
+                # After full address is set, we might use it for subsequent PPUDATA access
+                self.ppu_addr_latch = False
+            # Note: We do not directly use ppu_addr_temp for rendering until needed.
+        elif reg == 0x2007:  # PPUDATA (write)
+            addr = self.ppu_addr_temp & 0x3FFF
+            if addr >= 0x3F00:
+                # Palette write
+                index = addr & 0x1F
+                if (index & 0x03) == 0:
+                    # Mirror universal background across all 0x??00,0x??04,0x??08,0x??0C, etc.
+                    self.palette[0x00] = data
+                    self.palette[0x04] = data
+                    self.palette[0x08] = data
+                    self.palette[0x0C] = data
+                    self.palette[0x10] = data
+                    self.palette[0x14] = data
+                    self.palette[0x18] = data
+                    self.palette[0x1C] = data
                 else:
-                    if addr < 0x2000:
-                        # CHR ROM/RAM write (usually CHR ROM is read-only; CHR RAM can be written)
-                        if self.chr_rom:
-                            # Typically CHR ROM is not writable; ignoring or could write to CHR RAM if used
-                            pass
-                        else:
-                            self.chr_ram[addr] = data
+                    self.palette[index] = data
+            else:
+                if addr < 0x2000:
+                    # CHR ROM/RAM write (usually CHR ROM is read-only; CHR RAM can be written)
+                    if self.chr_rom:
+                        # Typically CHR ROM is not writable; ignoring or could write to CHR RAM if used
+                        pass
                     else:
-                        # Nametable VRAM write (with mirroring)
-                        if self.mirroring == 'H':
-                            if addr & 0x0800:
-                                addr = addr - 0x0800
-                        elif self.mirroring == 'V':
-                            if addr & 0x0400:
-                                addr = addr - 0x0400
-                        index = addr & 0x07FF
-                        self.vram[index] = data
-                # Auto-increment VRAM address after write
-                if self.ppu_ctrl & 0x04:
-                    self.ppu_addr_temp = (self.ppu_addr_temp + 32) & 0xFFFF
+                        self.chr_ram[addr] = data
+                        self.chr_dirty.add(addr >> 4)  # invalidate the decoded tile
                 else:
-                    self.ppu_addr_temp = (self.ppu_addr_temp + 1) & 0xFFFF
-        elif addr < 0x4020:
-            if addr == 0x4014:
-                # OAMDMA: DMA transfer of 256 bytes from CPU memory page (data * 0x100) to OAM
-                page = data
-                start_addr = page * 0x100
-                # Read 256 bytes from start_addr and write to OAM (starting at index 0)
+                    # Nametable VRAM write (with mirroring)
+                    if self.mirroring == 'H':
+                        if addr & 0x0800:
+                            addr = addr - 0x0800
+                    elif self.mirroring == 'V':
+                        if addr & 0x0400:
+                            addr = addr - 0x0400
+                    index = addr & 0x07FF
+                    self.vram[index] = data
+            # Auto-increment VRAM address after write
+            if self.ppu_ctrl & 0x04:
+                self.ppu_addr_temp = (self.ppu_addr_temp + 32) & 0xFFFF
+            else:
+                self.ppu_addr_temp = (self.ppu_addr_temp + 1) & 0xFFFF
+    
+    def write_io_register(self, addr, data):
+        if addr == 0x4014:
+            # OAMDMA: DMA transfer of 256 bytes from CPU memory page (data * 0x100) to OAM
+            page = data
+            start_addr = page * 0x100
+            # Read 256 bytes from start_addr and write to OAM (starting at index 0)
+            source = self.read_pages[page]
+            if source is not None:
+                self.oam[:] = source
+            else:
                 for i in range(256):
                     self.oam[i] = self.read((start_addr + i) & 0xFFFF)
-                # During DMA, 513 or 514 CPU cycles occur (depending on alignment). For simplicity, ignore timing.
-            elif addr == 0x4016:
-                # Controller strobe
-                self.controller_strobe = (data & 1) != 0
-                if self.controller_strobe:
-                    # When strobe is high, latch controller state and reset index
-                    self.controller_shift = self.controller_state
-                    self.controller_index = 0
-                else:
-                    # When strobe goes low, prepare to shift out bits (already latched above)
-                    self.controller_shift = self.controller_state
-                    self.controller_index = 0
-            # Note: Sound registers ($4000-$4013, $4015, $4017) are not implemented.
-        elif addr < 0x6000:
-            # Expansion or other I/O, not used
-            pass
-        elif addr < 0x8000:
-            # PRG RAM
-            self.prg_ram[addr - 0x6000] = data
-        else:
-            # PRG ROM is typically read-only; writes might go to battery RAM on some carts (not in mapper0)
-            pass
+            # During DMA, 513 or 514 CPU cycles occur (depending on alignment). For simplicity, ignore timing.
+        elif addr == 0x4016:
+            # Controller strobe
+            self.controller_strobe = (data & 1) != 0
+            if self.controller_strobe:
+                # When strobe is high, latch controller state and reset index
+                self.controller_shift = self.controller_state
+                self.controller_index = 0
+            else:
+                # When strobe goes low, prepare to shift out bits (already latched above)
+                self.controller_shift = self.controller_state
+                self.controller_index = 0
+        # Note: Sound registers ($4000-$4013, $4015, $4017) are not implemented.
+
+# Save-state blob: a fixed header of CPU registers and PPU/controller latches,
+# followed by raw copies of every writable memory region (see STATE_MEMORY).
+STATE_MAGIC = b"NESS"
+STATE_HEADER = struct.Struct("<4s4BHB5BHBBBB")
+STATE_MEMORY = ("ram", "vram", "palette", "oam", "prg_ram", "chr_ram")
+
+class RewindBuffer:
+    """Fixed-size ring of save states stored as compressed XOR deltas.
+
+    Only the newest state is kept whole; each older state is the zlib-packed XOR
+    of itself and its successor, which is mostly zero bytes between adjacent
+    frames. The deque drops the oldest delta once capacity is reached.
+    """
+    def __init__(self, capacity=600):
+        self.deltas = collections.deque(maxlen=capacity)
+        self.latest = None
+
+    def clear(self):
+        self.deltas.clear()
+        self.latest = None
+
+    def __len__(self):
+        return len(self.deltas)
+
+    @staticmethod
+    def _xor(a, b):
+        size = len(a)
+        return (int.from_bytes(a, "little") ^ int.from_bytes(b, "little")).to_bytes(size, "little")
+
+    def push(self, state):
+        if self.latest is not None:
+            if len(state) != len(self.latest):
+                self.deltas.clear()  # different cartridge layout; old deltas no longer apply
+            else:
+                self.deltas.append(zlib.compress(self._xor(self.latest, state), 1))
+        self.latest = state
+
+    def pop(self):
+        """Step back one state and return it, or None when the buffer is exhausted."""
+        if not self.deltas:
+            return None
+        self.latest = self._xor(self.latest, zlib.decompress(self.deltas.pop()))
+        return self.latest
 
 # NES Emulator main class tying it all together
 class NESEmulator:
@@ -1260,12 +1369,63 @@ class NESEmulator:
         self.bus = Bus()
         self.cpu = self.bus.cpu
         # Initialize variables for rendering and vibe mode
-        self.framebuffer = [0] * (SCREEN_WIDTH * SCREEN_HEIGHT)  # will hold pixel colors (RGB or palette index)
+        # Packed 24-bit RGB pixels, row-major; the NumPy renderer writes through an (H, W, 3) view
+        self.framebuffer = bytearray(SCREEN_WIDTH * SCREEN_HEIGHT * 3)
+        if np is not None:
+            self._frame_view = np.frombuffer(self.framebuffer, dtype=np.uint8).reshape(SCREEN_HEIGHT, SCREEN_WIDTH, 3)
         self.vibe_mode = False
         self.vibe_offset = 0
+        # Opt-in instruction profiler (see CPUProfiler)
+        self.profiler = CPUProfiler(self.cpu)
+        # Optional basic-block execution mode (see BlockCache)
+        self.block_cache = BlockCache(self.cpu)
+        self.use_blocks = False
+        # Last ~10 seconds of frames for rewinding
+        self.rewind = RewindBuffer(capacity=600)
     
     def load_rom(self, filepath):
         self.bus.load_cartridge(filepath)
+        self.block_cache.clear()  # the bus page tables were rebuilt
+        self.rewind.clear()
+    
+    def save_state(self):
+        """Return the machine state as a compact binary blob."""
+        bus, cpu = self.bus, self.cpu
+        header = STATE_HEADER.pack(STATE_MAGIC, cpu.A, cpu.X, cpu.Y, cpu.SP, cpu.PC, cpu.STATUS,
+                                   bus.ppu_ctrl, bus.ppu_mask, bus.ppu_status, bus.ppu_scroll_x, bus.ppu_scroll_y,
+                                   bus.ppu_addr_temp, bus.ppu_addr_latch, bus.controller_shift,
+                                   bus.controller_strobe, bus.controller_index)
+        return header + b"".join([getattr(bus, name) for name in STATE_MEMORY])
+    
+    def load_state(self, blob):
+        """Restore a blob produced by save_state() for the same cartridge."""
+        bus, cpu = self.bus, self.cpu
+        size = STATE_HEADER.size + sum(len(getattr(bus, name)) for name in STATE_MEMORY)
+        if len(blob) != size or blob[:4] != STATE_MAGIC:
+            raise ValueError("Save state does not match the loaded cartridge")
+        (_, cpu.A, cpu.X, cpu.Y, cpu.SP, cpu.PC, cpu.STATUS,
+         bus.ppu_ctrl, bus.ppu_mask, bus.ppu_status, bus.ppu_scroll_x, bus.ppu_scroll_y,
+         bus.ppu_addr_temp, latch, bus.controller_shift, strobe, bus.controller_index) = STATE_HEADER.unpack_from(blob)
+        bus.ppu_addr_latch = bool(latch)
+        bus.controller_strobe = bool(strobe)
+        offset = STATE_HEADER.size
+        for name in STATE_MEMORY:
+            region = getattr(bus, name)
+            region[:] = blob[offset:offset + len(region)]
+            offset += len(region)
+        if bus.chr_ram:
+            bus.chr_dirty.update(range(len(bus.chr_ram) // 16))
+        # RAM was replaced behind the write traps: drop the blocks decoded from it
+        for page in list(self.block_cache.code_pages):
+            self.block_cache.invalidate_page(page)
+    
+    def step_back(self):
+        """Restore the previous frame from the rewind buffer; return False when it is empty."""
+        state = self.rewind.pop()
+        if state is None:
+            return False
+        self.load_state(state)
+        return True
     
     def reset(self):
         self.cpu.reset()
@@ -1274,146 +1434,291 @@ class NESEmulator:
     
     def step_frame(self):
         """Run the CPU until one frame's worth of CPU cycles have been executed, then render the frame."""
+        self.run_cpu_frame()
+        # At this point, we've simulated one frame of CPU time. Now produce the video output.
+        self.render_frame()
+        self.end_frame()
+    
+    def run_cpu_frame(self):
+        """Run one frame's worth of CPU cycles; return the number of instructions executed."""
         cycles_per_frame = 29780  # ~29780 CPU cycles per frame for NTSC (approximation)
-        self.bus.cycles = 0
+        bus = self.bus
+        bus.cycles = 0
+        instructions = 0
+        if self.use_blocks and not self.profiler.active:
+            # Block-at-a-time: the frame may overrun by up to one block's cycles
+            execute_block = self.block_cache.execute_block
+            while bus.cycles < cycles_per_frame:
+                cycles, count = execute_block()
+                bus.cycles += cycles
+                instructions += count
+            return instructions
         # Run CPU until we've simulated enough cycles for one frame
-        while self.bus.cycles < cycles_per_frame:
-            # Execute one CPU instruction
-            cycles = self.cpu.execute_instruction()
-            self.bus.cycles += cycles
+        execute = self.cpu.execute_instruction
+        while bus.cycles < cycles_per_frame:
+            # Execute one CPU instruction (page-cross penalties are added to bus.cycles during the call)
+            cycles = execute()
+            bus.cycles += cycles
+            instructions += 1
             # PPU would normally run ~3 cycles per CPU, updating vblank, sprite hit, etc.
             # We simplify and handle vblank flag when frame completes.
-        # At this point, we've simulated one frame of CPU time. Now produce the video output.
-        self.render_frame()
+        return instructions
+    
+    def end_frame(self):
+        """Frame-end bookkeeping once the CPU frame (and optional render) is done."""
         # Set the VBlank flag (PPUSTATUS bit 7) to indicate the frame has been drawn
         self.bus.ppu_status |= 0x80
         # In vibe mode, advance the color cycling
         if self.vibe_mode:
             self.vibe_offset = (self.vibe_offset + 1) % 64
     
-    def render_frame(self):
-        """Render the background and sprites into the framebuffer for the current PPU memory state."""
-        # Determine base pattern table for background from PPUCTRL bit 4
-        base_table = 0x1000 if (self.bus.ppu_ctrl & 0x10) else 0x0000
-        # Extract scroll values (we combine fine and coarse scroll from registers)
+    def scroll_origin(self):
+        """Return the (x, y) scroll origin in the 512x480 nametable plane."""
         # In our implementation, scroll_x and scroll_y registers hold the values written via $2005
-        coarse_scroll_x = (self.bus.ppu_scroll_x >> 3) & 0x1F  # 5-bit coarse scroll X (tile units)
-        fine_scroll_x = self.bus.ppu_scroll_x & 0x07           # 3-bit fine scroll X (pixel offset within tile)
-        coarse_scroll_y = (self.bus.ppu_scroll_y >> 3) & 0x1F
-        fine_scroll_y = self.bus.ppu_scroll_y & 0x07
-        # Nametable bits from $2000 (bits 0-1) might act as high bits of coarse X/Y for starting nametable
-        nt_select = self.bus.ppu_ctrl & 0x03  # 0-3
-        # Incorporate nametable selection into scroll origin
+        # Nametable bits from $2000 (bits 0-1) act as high bits of coarse X/Y for the starting nametable:
         # bit0 -> add 256 to scrollX if 1, bit1 -> add 240 to scrollY if 1
-        scroll_x = coarse_scroll_x * 8 + fine_scroll_x + ((nt_select & 0x01) * 256)
-        scroll_y = coarse_scroll_y * 8 + fine_scroll_y + ((nt_select & 0x02) * 240)
-        # Iterate over each pixel of the 256x240 frame
+        nt_select = self.bus.ppu_ctrl & 0x03
+        scroll_x = self.bus.ppu_scroll_x + (nt_select & 0x01) * 256
+        scroll_y = self.bus.ppu_scroll_y + ((nt_select >> 1) & 0x01) * 240
+        return scroll_x, scroll_y
+    
+    def render_frame(self):
+        """Render the background into the framebuffer for the current PPU memory state."""
+        if np is not None:
+            self._render_frame_numpy()
+        else:
+            self._render_frame_python()
+    
+    def _palette_lut(self):
+        """Return the 16 background palette entries as NES color indices."""
+        palette = self.bus.palette
+        lut = [palette[i] for i in range(16)]
+        # Color 0 of every background palette shows the universal background color at $3F00
+        lut[0x04] = lut[0x08] = lut[0x0C] = palette[0x00]
+        if self.vibe_mode:
+            lut = [(c + self.vibe_offset) & 0x3F for c in lut]
+        return lut
+    
+    def _render_frame_numpy(self):
+        """Vectorized renderer: tile gathers over the nametable plane, then a palette LUT."""
+        bus = self.bus
+        if bus.chr_dirty:
+            # CHR RAM tiles were written since the last frame
+            bus.refresh_chr_tiles()
+        # Pattern table for background from PPUCTRL bit 4 (256 tiles per table)
+        bank = 256 if (bus.ppu_ctrl & 0x10) else 0
+        tiles = bus.chr_tiles[bank:bank + 256]
+        vram = np.frombuffer(bus.vram, dtype=np.uint8)
+        # Gather the four logical nametables (after mirroring) as rows of 1KB
+        offsets = np.array([bus.nametable_offset(i) for i in range(4)])
+        tables = vram[offsets[:, None] + np.arange(0x400)]
+        palettes = (tables[:, NT_ATTR_INDEX] >> NT_ATTR_SHIFT) & 0x03
+        # Each pixel becomes a 4-bit background palette address: (attribute palette << 2) | color index
+        blocks = tiles[tables[:, :960].reshape(4, 30, 32)] | (palettes << 2)[..., None, None]
+        # (nt_y, nt_x, tile_row, tile_col, fine_y, fine_x) -> 480x512 plane
+        plane = blocks.reshape(2, 2, 30, 32, 8, 8).transpose(0, 2, 4, 1, 3, 5).reshape(480, 512)
+        # Apply scroll with wrap-around over the 512x480 plane
+        scroll_x, scroll_y = self.scroll_origin()
+        rows = (np.arange(SCREEN_HEIGHT) + scroll_y) % 480
+        cols = (np.arange(SCREEN_WIDTH) + scroll_x) % 512
+        pixels = plane.take(rows, axis=0).take(cols, axis=1)
+        lut = NES_PALETTE_RGB[self._palette_lut()]
+        np.take(lut, pixels, axis=0, out=self._frame_view)
+    
+    def _render_frame_python(self):
+        """Per-pixel fallback renderer used when NumPy is not installed."""
+        bus = self.bus
+        chr_data = bus.chr_rom or bus.chr_ram
+        base_table = 0x1000 if (bus.ppu_ctrl & 0x10) else 0x0000
+        scroll_x, scroll_y = self.scroll_origin()
+        offsets = [bus.nametable_offset(i) for i in range(4)]
+        lut = [NES_PALETTE[c] for c in self._palette_lut()]
+        framebuffer = self.framebuffer
+        pos = 0
         for py in range(SCREEN_HEIGHT):
+            eff_y = (scroll_y + py) % 480
+            ny = eff_y % 240
+            tile_row = ny // 8
+            fine_y = ny % 8
             for px in range(SCREEN_WIDTH):
-                # Calculate the corresponding nametable address and tile
-                # Effective coordinates in the 512x480 nametable space (with wrap-around via mirroring)
                 eff_x = (scroll_x + px) % 512
-                eff_y = (scroll_y + py) % 480
-                # Determine which nametable (0-3) these coords fall in (each nametable is 256x240)
-                nt_index = (0 if eff_x < 256 else 1) + (0 if eff_y < 240 else 2)
-                # Apply mirroring to map to physical nametable memory
-                if self.bus.mirroring == 'H':
-                    # Horizontal: nametables 0 and 1 are on top, 2 mirrors 0, 3 mirrors 1
-                    if nt_index == 2: nt_index = 0
-                    if nt_index == 3: nt_index = 1
-                elif self.bus.mirroring == 'V':
-                    # Vertical: nametables 0 and 2 are left, 1 mirrors 0, 3 mirrors 2
-                    if nt_index == 1: nt_index = 0
-                    if nt_index == 3: nt_index = 2
-                elif self.bus.mirroring == '4':
-                    # Four-screen (not fully implemented, treat as no mirroring)
-                    pass
-                # Compute indices within the nametable
                 nx = eff_x % 256
-                ny = eff_y % 240
                 tile_col = nx // 8
-                tile_row = ny // 8
-                fine_x = nx % 8
-                fine_y = ny % 8
-                # Nametable base address for chosen nametable (0->0x2000,1->0x2400,2->0x2800,3->0x2C00)
-                nt_base = 0x2000
-                if nt_index == 1:
-                    nt_base = 0x2400
-                elif nt_index == 2:
-                    nt_base = 0x2800
-                elif nt_index == 3:
-                    nt_base = 0x2C00
-                # Nametable memory index of the tile number
-                nametable_addr = nt_base + (tile_row * 32) + tile_col
-                # Apply mirroring logic to fetch the correct nametable data from VRAM
-                addr = nametable_addr
-                if self.bus.mirroring == 'H':
-                    if addr & 0x0800: addr -= 0x0800
-                elif self.bus.mirroring == 'V':
-                    if addr & 0x0400: addr -= 0x0400
-                tile_index = self.bus.vram[addr & 0x07FF]
-                # Pattern table address for this tile's graphics
-                pattern_addr = base_table + tile_index * 16
-                # Fetch the pattern table bytes for this tile row
-                if pattern_addr < len(self.bus.chr_rom):
-                    byte1 = self.bus.chr_rom[pattern_addr + fine_y]
-                    byte2 = self.bus.chr_rom[pattern_addr + fine_y + 8]
-                else:
-                    # If CHR RAM or out-of-range, handle accordingly
-                    if self.bus.chr_rom:
-                        # If out-of-range CHR ROM address (shouldn't happen with correct tile_index)
-                        byte1 = byte2 = 0
-                    else:
-                        # CHR RAM case
-                        byte1 = self.bus.chr_ram[pattern_addr + fine_y]
-                        byte2 = self.bus.chr_ram[pattern_addr + fine_y + 8]
+                # Determine which nametable (0-3) these coords fall in (each nametable is 256x240)
+                offset = offsets[(0 if eff_x < 256 else 1) + (0 if eff_y < 240 else 2)]
+                tile_index = bus.vram[offset + tile_row * 32 + tile_col]
+                pattern_addr = base_table + tile_index * 16 + fine_y
+                byte1 = chr_data[pattern_addr]
+                byte2 = chr_data[pattern_addr + 8]
                 # Extract the bit corresponding to fine_x (bit7 = x=0)
-                bit0 = (byte1 >> (7 - fine_x)) & 1
-                bit1 = (byte2 >> (7 - fine_x)) & 1
-                color_index = (bit1 << 1) | bit0
-                # Determine palette index:
-                if color_index == 0:
-                    # Index 0 = background transparent pixel. Use universal background color from palette $3F00.
-                    pal_index = self.bus.palette[0x00]
-                else:
-                    # Each background palette is 4 bytes: choose which palette based on attribute table.
-                    # The attribute table is at $23C0 for nametable 0, etc. Each byte covers a 32x32 pixel area (4x4 tiles).
-                    # We will simplify by using palette 0 for all for now.
-                    pal_base = 0x01  # start at $3F01 (first background palette's first entry)
-                    # In a full implementation, we'd fetch attribute bytes to choose palette 0-3.
-                    pal_index = self.bus.palette[pal_base + ((color_index - 1) % 3)]
-                # Apply vibe mode color cycling if enabled
-                if self.vibe_mode:
-                    pal_index = (pal_index + self.vibe_offset) & 0x3F
-                # Convert palette index to actual RGB color
-                rgb = NES_PALETTE[pal_index]
-                # Store in framebuffer
-                pos = py * SCREEN_WIDTH + px
-                self.framebuffer[pos] = rgb
+                bit = 7 - (nx % 8)
+                color_index = (((byte2 >> bit) & 1) << 1) | ((byte1 >> bit) & 1)
+                # Attribute byte covers 4x4 tiles; each 2x2 quadrant has its own palette
+                attr = bus.vram[offset + 0x3C0 + (tile_row // 4) * 8 + (tile_col // 4)]
+                palette = (attr >> (((tile_row & 0x02) << 1) | (tile_col & 0x02))) & 0x03
+                framebuffer[pos:pos + 3] = bytes(lut[(palette << 2) | color_index])
+                pos += 3
     
     def get_frame_image(self):
-        """Return a Pillow Image for the current framebuffer."""
-        # Create an RGB image from the framebuffer pixel data
+        """Return a Tk-compatible image for the current framebuffer."""
         if Image is None:
             # If Pillow is not available, create a Tk PhotoImage with a color string (less efficient)
-            # We'll build a color string per line for demonstration if needed.
             photo = tk.PhotoImage(width=SCREEN_WIDTH, height=SCREEN_HEIGHT)
+            fb = self.framebuffer
             for y in range(SCREEN_HEIGHT):
-                line = ""
-                for x in range(SCREEN_WIDTH):
-                    r, g, b = self.framebuffer[y*SCREEN_WIDTH + x]
-                    line += "#%02x%02x%02x " % (r, g, b)
-                photo.put(line, to=(0, y))
+                row = y * SCREEN_WIDTH * 3
+                line = " ".join("#%02x%02x%02x" % (fb[i], fb[i + 1], fb[i + 2])
+                                for i in range(row, row + SCREEN_WIDTH * 3, 3))
+                photo.put("{" + line + "}", to=(0, y))
             return photo
         else:
-            # Use Pillow to create image from data
-            img = Image.new("RGB", (SCREEN_WIDTH, SCREEN_HEIGHT))
-            img.putdata(self.framebuffer)
+            # Hand the raw RGB buffer straight to Pillow (no per-pixel conversion)
+            img = Image.frombuffer("RGB", (SCREEN_WIDTH, SCREEN_HEIGHT), self.framebuffer, "raw", "RGB", 0, 1)
             return ImageTk.PhotoImage(img)
 
 
+# --- Headless batch runner / benchmark ---
+
+BUTTON_NAMES = {
+    "A": BUTTON_A, "B": BUTTON_B, "SELECT": BUTTON_SELECT, "START": BUTTON_START,
+    "UP": BUTTON_UP, "DOWN": BUTTON_DOWN, "LEFT": BUTTON_LEFT, "RIGHT": BUTTON_RIGHT,
+}
+
+def parse_input_script(script):
+    """Parse "frame:BUTTON+BUTTON ..." into {frame: controller state}.
+
+    Each entry sets the controller state from that frame on; an empty button
+    list ("120:") releases everything. Example: "60:START 70: 120:RIGHT+A".
+    """
+    changes = {}
+    for entry in script.split():
+        frame, _, buttons = entry.partition(":")
+        state = 0
+        for name in filter(None, buttons.upper().split("+")):
+            if name not in BUTTON_NAMES:
+                raise ValueError(f"Unknown button {name!r} in input script")
+            state |= BUTTON_NAMES[name]
+        changes[int(frame)] = state
+    return changes
+
+def frame_hash(framebuffer):
+    """Short, stable hash of the framebuffer contents for regression checkpoints."""
+    return hashlib.sha1(framebuffer).hexdigest()[:16]
+
+def run_headless(rom_path, frames, input_script="", hash_every=0, profile=False, use_blocks=False):
+    """Run `frames` frames without a GUI and return timing stats and frame hashes."""
+    emulator = NESEmulator()
+    emulator.load_rom(rom_path)
+    emulator.use_blocks = use_blocks
+    if profile:
+        emulator.profiler.start()
+    inputs = parse_input_script(input_script)
+    hashes = {}
+    instructions = 0
+    cpu_time = render_time = 0.0
+    start = time.perf_counter()
+    for frame in range(frames):
+        if frame in inputs:
+            emulator.bus.controller_state = inputs[frame]
+        t0 = time.perf_counter()
+        instructions += emulator.run_cpu_frame()
+        t1 = time.perf_counter()
+        emulator.render_frame()
+        t2 = time.perf_counter()
+        emulator.end_frame()
+        cpu_time += t1 - t0
+        render_time += t2 - t1
+        if hash_every and (frame + 1) % hash_every == 0:
+            hashes[frame + 1] = frame_hash(emulator.framebuffer)
+    elapsed = time.perf_counter() - start
+    return {
+        "frames": frames,
+        "instructions": instructions,
+        "elapsed": elapsed,
+        "cpu_time": cpu_time,
+        "render_time": render_time,
+        "hashes": hashes,
+        "profile": emulator.profiler.report() if profile else None,
+    }
+
+def print_headless_report(stats):
+    elapsed = stats["elapsed"] or 1e-9
+    frames = stats["frames"] or 1
+    print(f"Frames:           {stats['frames']}")
+    print(f"Instructions:     {stats['instructions']}")
+    print(f"Elapsed:          {stats['elapsed']:.3f} s")
+    print(f"Frames/sec:       {stats['frames'] / elapsed:.2f}")
+    print(f"Instructions/sec: {stats['instructions'] / (stats['cpu_time'] or 1e-9):.0f}")
+    print(f"CPU:              {stats['cpu_time'] * 1000 / frames:.3f} ms/frame ({100 * stats['cpu_time'] / elapsed:.1f}%)")
+    print(f"Render:           {stats['render_time'] * 1000 / frames:.3f} ms/frame ({100 * stats['render_time'] / elapsed:.1f}%)")
+    for frame, digest in stats["hashes"].items():
+        print(f"Frame {frame}: {digest}")
+    if stats["profile"]:
+        print()
+        print(stats["profile"])
+
+def check_hashes(hashes, expected_path):
+    """Compare recorded hashes against a file of "frame hash" lines; return mismatch count."""
+    mismatches = 0
+    with open(expected_path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            frame, digest = line.split()
+            actual = hashes.get(int(frame))
+            if actual != digest:
+                print(f"Hash mismatch at frame {frame}: expected {digest}, got {actual}")
+                mismatches += 1
+    return mismatches
+
+# Self-modifying loop run from RAM at $0300 by check_block_cache(). Each pass
+# patches the address of a store a few bytes ahead in the same block (directly,
+# then through the $0B00 mirror), so 4 * X lands at $0400,X and $0500,X only
+# if the patched bytes are the ones executed.
+SMC_CHECK_ORIGIN = 0x0300
+SMC_CHECK_PROGRAM = bytes([
+    0xA2, 0x00,        # LDX #$00
+    0x8A,              # loop: TXA
+    0x0A,              # ASL
+    0x0A,              # ASL
+    0x8E, 0x09, 0x03,  # STX $0309   ; low byte of the next store's address
+    0x8D, 0x00, 0x04,  # STA $0400
+    0x8E, 0x10, 0x0B,  # STX $0B10   ; the same for the second store, via the mirror
+    0xEA,              # NOP
+    0x8D, 0x00, 0x05,  # STA $0500
+    0xE8,              # INX
+    0xE0, 0x10,        # CPX #$10
+    0xD0, 0xEB,        # BNE loop
+    0x4C, 0x17, 0x03,  # JMP *      ; park here
+])
+
+def check_block_cache(cycles=20000):
+    """Run the self-modifying check program per instruction and per block; return True if they agree."""
+    results = []
+    for use_blocks in (False, True):
+        emulator = NESEmulator()
+        emulator.use_blocks = use_blocks
+        bus, cpu = emulator.bus, emulator.cpu
+        bus.ram[SMC_CHECK_ORIGIN:SMC_CHECK_ORIGIN + len(SMC_CHECK_PROGRAM)] = SMC_CHECK_PROGRAM
+        cpu.PC = SMC_CHECK_ORIGIN
+        elapsed = 0
+        while elapsed < cycles:
+            elapsed += emulator.block_cache.execute_block()[0] if use_blocks else cpu.execute_instruction()
+        results.append((cpu.A, cpu.X, cpu.Y, cpu.PC, cpu.STATUS, bytes(bus.ram)))
+    expected = bytes(4 * x for x in range(16))
+    ram = results[0][5]
+    if results[0] != results[1] or ram[0x400:0x410] != expected or ram[0x500:0x510] != expected:
+        print("Block cache check FAILED: per-block execution diverged on self-modifying code")
+        return False
+    print("Block cache check passed")
+    return True
+
+
 # --- Tkinter GUI Setup ---
 
+NTSC_FRAME_RATE = 60.0988  # frames per second the game logic expects
+MAX_FRAME_SKIP = 4         # frames emulated without display before the scheduler gives up catching up
+
 class NESGUI:
     def __init__(self, root):
         self.root = root
@@ -1424,6 +1729,20 @@ class NESGUI:
         self.emulator = NESEmulator()
         # Flag to indicate if a ROM is loaded
         self.rom_loaded = False
+        self.rom_path = None
+        # Held down (Backspace) to play the rewind buffer backwards
+        self.rewinding = False
+        # Frame scheduler: emulation is paced to target_fps by wall clock; when
+        # behind, frames are emulated without being displayed
+        self.target_fps = NTSC_FRAME_RATE
+        self.turbo = False
+        self.next_frame_time = 0.0
+        self.last_display_time = 0.0
+        self.after_id = None
+        # FPS overlay counters, refreshed once a second
+        self.stats_start = 0.0
+        self.emulated_frames = 0
+        self.displayed_frames = 0
         
         # Set up menu
         menubar = tk.Menu(root)
@@ -1436,8 +1755,16 @@ class NESGUI:
         # Emulation menu
         emu_menu = tk.Menu(menubar, tearoff=0)
         emu_menu.add_command(label="Reset", command=self.reset_emulator)
+        emu_menu.add_command(label="Save State (F5)", command=self.save_state)
+        emu_menu.add_command(label="Load State (F9)", command=self.load_state)
         self.vibe_var = tk.BooleanVar(value=False)
         emu_menu.add_checkbutton(label="Vibe Mode", variable=self.vibe_var, command=self.toggle_vibe)
+        self.blocks_var = tk.BooleanVar(value=False)
+        emu_menu.add_checkbutton(label="Block Cache", variable=self.blocks_var, command=self.toggle_blocks)
+        self.turbo_var = tk.BooleanVar(value=False)
+        emu_menu.add_checkbutton(label="Turbo (Tab)", variable=self.turbo_var, command=self.toggle_turbo)
+        self.fps_var = tk.BooleanVar(value=True)
+        emu_menu.add_checkbutton(label="Show FPS", variable=self.fps_var, command=self.toggle_fps)
         menubar.add_cascade(label="Emulation", menu=emu_menu)
         # Debug menu
         debug_menu = tk.Menu(menubar, tearoff=0)
@@ -1453,6 +1780,9 @@ class NESGUI:
         self.canvas = tk.Canvas(root, width=SCREEN_WIDTH, height=SCREEN_HEIGHT, bg="black")
         # We'll place the canvas at the center of window 600x400
         self.canvas.place(x= (600-SCREEN_WIDTH)//2, y=(400-SCREEN_HEIGHT)//2)
+        # Reused canvas items for the frame and the FPS/speed overlay
+        self.canvas_image = self.canvas.create_image(0, 0, anchor=tk.NW)
+        self.fps_text = self.canvas.create_text(4, 4, anchor=tk.NW, fill="yellow", font=("Courier", 9))
         
         # Bind keyboard events for controller input
         root.bind("<KeyPress>", self.on_key_press)
@@ -1476,12 +1806,24 @@ class NESGUI:
             messagebox.showerror("Error", f"Failed to load ROM:\n{e}")
             return
         self.rom_loaded = True
+        self.rom_path = filepath
         self.status_label.config(text=f"Loaded ROM: {filepath.split('/')[-1]}")
         # Reset any debug windows
         if self.cpu_window:
             self.cpu_window.destroy()
             self.cpu_window = None
         # Start the emulation loop
+        self.start_loop()
+    
+    def start_loop(self):
+        # (Re)start the frame scheduler, cancelling any pending frame
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        now = time.perf_counter()
+        self.next_frame_time = now
+        self.stats_start = now
+        self.emulated_frames = self.displayed_frames = 0
         self.run_frame()
     
     def reset_emulator(self):
@@ -1494,12 +1836,47 @@ class NESGUI:
         if self.cpu_window:
             self.update_cpu_window()
         # Continue running frames
-        self.run_frame()
+        self.start_loop()
+    
+    def state_path(self):
+        return self.rom_path + ".state"
+    
+    def save_state(self):
+        if not self.rom_loaded:
+            return
+        with open(self.state_path(), "wb") as f:
+            f.write(self.emulator.save_state())
+        self.status_label.config(text="State saved")
+    
+    def load_state(self):
+        if not self.rom_loaded:
+            return
+        try:
+            with open(self.state_path(), "rb") as f:
+                self.emulator.load_state(f.read())
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to load state:\n{e}")
+            return
+        self.emulator.rewind.clear()
+        self.status_label.config(text="State loaded")
     
     def toggle_vibe(self):
         # Toggle vibe mode on/off
         self.emulator.vibe_mode = self.vibe_var.get()
     
+    def toggle_blocks(self):
+        # Switch between per-instruction and cached basic-block execution
+        self.emulator.use_blocks = self.blocks_var.get()
+    
+    def toggle_turbo(self):
+        self.turbo = self.turbo_var.get()
+        # Resume normal pacing from now rather than racing to catch up
+        self.next_frame_time = time.perf_counter()
+    
+    def toggle_fps(self):
+        if not self.fps_var.get():
+            self.canvas.itemconfig(self.fps_text, text="")
+    
     def show_cpu_state(self):
         # Create or focus a window showing CPU registers
         if self.cpu_window and tk.Toplevel.winfo_exists(self.cpu_window):
@@ -1509,10 +1886,15 @@ class NESGUI:
             return
         self.cpu_window = tk.Toplevel(self.root)
         self.cpu_window.title("CPU State")
-        self.cpu_window.geometry("200x150")
+        self.cpu_window.geometry("220x210")
         # Labels to display registers
         self.cpu_state_label = tk.Label(self.cpu_window, justify="left", font=("Courier", 10))
         self.cpu_state_label.pack(padx=10, pady=10)
+        # Profiler controls
+        self.profile_var = tk.BooleanVar(value=self.emulator.profiler.active)
+        tk.Checkbutton(self.cpu_window, text="Profile instructions", variable=self.profile_var,
+                       command=self.toggle_profiler).pack()
+        tk.Button(self.cpu_window, text="Profile Report", command=self.show_profile_report).pack(pady=5)
         # Update once to show initial state
         self.update_cpu_window()
     
@@ -1536,8 +1918,25 @@ class NESGUI:
                 f"STATUS: {c.STATUS:02X} ({status_flags})")
         self.cpu_state_label.config(text=text)
     
+    def toggle_profiler(self):
+        if self.profile_var.get():
+            self.emulator.profiler.start()
+        else:
+            self.emulator.profiler.stop()
+    
+    def show_profile_report(self):
+        # Show the sorted profiler report in its own window
+        report = self.emulator.profiler.report()
+        window = tk.Toplevel(self.root)
+        window.title("CPU Profile")
+        text = tk.Text(window, width=60, height=40, font=("Courier", 9))
+        text.insert("1.0", report)
+        text.config(state="disabled")
+        text.pack(fill="both", expand=True)
+        tk.Button(window, text="Clear", command=lambda: (self.emulator.profiler.clear(), window.destroy())).pack()
+    
     def show_about(self):
-        messagebox.showinfo("About", "NES Emulator in Python\nInspired by NESticle\n\nKeys: Arrows = D-Pad, Z = A, X = B, Enter = Start, Shift = Select")
+        messagebox.showinfo("About", "NES Emulator in Python\nInspired by NESticle\n\nKeys: Arrows = D-Pad, Z = A, X = B, Enter = Start, Shift = Select\nF5 = Save State, F9 = Load State, Backspace (hold) = Rewind")
     
     def on_key_press(self, event):
         # Set controller bits on key press
@@ -1561,6 +1960,15 @@ class NESGUI:
             self.emulator.bus.controller_state |= BUTTON_LEFT
         elif event.keysym == 'Right':
             self.emulator.bus.controller_state |= BUTTON_RIGHT
+        elif event.keysym == 'F5':
+            self.save_state()
+        elif event.keysym == 'F9':
+            self.load_state()
+        elif event.keysym == 'BackSpace':
+            self.rewinding = True
+        elif event.keysym == 'Tab':
+            self.turbo_var.set(not self.turbo_var.get())
+            self.toggle_turbo()
     
     def on_key_release(self, event):
         # Clear controller bits on key release
@@ -1582,25 +1990,111 @@ class NESGUI:
             self.emulator.bus.controller_state &= ~BUTTON_LEFT
         elif event.keysym == 'Right':
             self.emulator.bus.controller_state &= ~BUTTON_RIGHT
+        elif event.keysym == 'BackSpace':
+            self.rewinding = False
     
-    def run_frame(self):
-        # Run one frame of emulation and schedule the next
-        if not self.rom_loaded:
-            return
-        self.emulator.step_frame()
-        # Update canvas with new frame
+    def emulate_frame(self, display):
+        # Advance one frame (or step back while rewinding); skip the render when not displayed
+        emulator = self.emulator
+        if self.rewinding:
+            # Play back the rewind buffer instead of emulating forward
+            emulator.step_back()
+            if display:
+                emulator.render_frame()
+        else:
+            emulator.run_cpu_frame()
+            if display:
+                emulator.render_frame()
+            emulator.end_frame()
+            emulator.rewind.push(emulator.save_state())
+        self.emulated_frames += 1
+    
+    def display_frame(self):
         frame_image = self.emulator.get_frame_image()
         # Keep a reference to avoid garbage collection of image
         self.canvas.image = frame_image
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=frame_image)
+        self.canvas.itemconfig(self.canvas_image, image=frame_image)
+        self.displayed_frames += 1
+        self.last_display_time = time.perf_counter()
         # Update debug window if open
         if self.cpu_window:
             self.update_cpu_window()
-        # Schedule next frame (we'll use a small delay to allow UI events)
-        self.root.after(1, self.run_frame)
+    
+    def update_fps_overlay(self, now):
+        elapsed = now - self.stats_start
+        if elapsed < 1.0:
+            return
+        if self.fps_var.get():
+            fps = self.displayed_frames / elapsed
+            speed = 100 * self.emulated_frames / (elapsed * self.target_fps)
+            self.canvas.itemconfig(self.fps_text, text=f"{fps:4.1f} FPS  {speed:3.0f}%" + ("  TURBO" if self.turbo else ""))
+            self.canvas.tag_raise(self.fps_text)
+        self.stats_start = now
+        self.emulated_frames = self.displayed_frames = 0
+    
+    def run_frame(self):
+        # Emulate every frame that is due, display only the last, and schedule the next
+        self.after_id = None
+        if not self.rom_loaded:
+            return
+        frame_time = 1.0 / self.target_fps
+        now = time.perf_counter()
+        if self.turbo:
+            # Uncapped: emulate back to back, displaying at most at the target rate
+            display = now - self.last_display_time >= frame_time
+            self.emulate_frame(display)
+            if display:
+                self.display_frame()
+            self.next_frame_time = now
+            delay = 0
+        elif now < self.next_frame_time:
+            # Woke up early; wait for the frame to come due
+            delay = max(1, int((self.next_frame_time - now) * 1000))
+        else:
+            due = int((now - self.next_frame_time) / frame_time) + 1
+            if due > MAX_FRAME_SKIP + 1:
+                # Too far behind to catch up: drop the backlog (the game slows down)
+                due = MAX_FRAME_SKIP + 1
+                self.next_frame_time = now - (due - 1) * frame_time
+            for i in range(due):
+                self.emulate_frame(display=(i == due - 1))
+            self.display_frame()
+            self.next_frame_time += due * frame_time
+            delay = max(1, int((self.next_frame_time - time.perf_counter()) * 1000))
+        self.update_fps_overlay(now)
+        self.after_id = self.root.after(delay, self.run_frame)
 
-# Run the GUI
-if __name__ == "__main__":
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NES Emulator in Python")
+    parser.add_argument("rom", nargs="?", default="test.nes", help="iNES ROM for headless runs (default: test.nes, which only spins in a BRK loop: "
+                             "a smoke test, not a representative benchmark)")
+    parser.add_argument("--headless", action="store_true", help="run without the GUI and print a benchmark report; pass a real game ROM for meaningful numbers")
+    parser.add_argument("--frames", type=int, default=600, help="number of frames to run headless")
+    parser.add_argument("--input", default="", help='scripted controller input, e.g. "60:START 70: 120:RIGHT+A"')
+    parser.add_argument("--hash-every", type=int, default=0, help="record a framebuffer hash every N frames")
+    parser.add_argument("--save-hashes", help="write the recorded frame hashes to this file")
+    parser.add_argument("--expect-hashes", help="fail if recorded hashes differ from this file")
+    parser.add_argument("--profile", action="store_true", help="print the instruction profiler report")
+    parser.add_argument("--blocks", action="store_true", help="use the basic-block cache instead of per-instruction dispatch")
+    parser.add_argument("--check-blocks", action="store_true", help="check the block cache against the interpreter on self-modifying code")
+    args = parser.parse_args(argv)
+    if args.check_blocks:
+        return 0 if check_block_cache() else 1
+    if args.headless:
+        stats = run_headless(args.rom, args.frames, args.input, args.hash_every, args.profile, args.blocks)
+        print_headless_report(stats)
+        if args.save_hashes:
+            with open(args.save_hashes, "w") as f:
+                for frame, digest in stats["hashes"].items():
+                    f.write(f"{frame} {digest}\n")
+        if args.expect_hashes and check_hashes(stats["hashes"], args.expect_hashes):
+            return 1
+        return 0
+    # Run the GUI
     root = tk.Tk()
     gui = NESGUI(root)
     root.mainloop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Fixed-timestep simulation clock for the Mario engines (4KSMB3.py and
+EZSMB1-1.py).
+
+Rendering runs at whatever rate the machine manages; game logic always
+advances in equal steps of ``1 / rate`` seconds, so physics (and anything
+replayed from recorded input) comes out the same at 20 or 200 frames per
+second. The leftover fraction of a step is exposed as ``alpha`` for drawing
+sprites between their last two simulated positions.
+
+    clock = FixedStep(120)
+    for dt in clock.advance(frame_seconds):
+        game.step(dt)
+    game.draw(clock.alpha)
+"""
+
+SIM_RATE = 120          # Simulation steps per second
+MAX_FRAME_TIME = 0.25   # Longest frame caught up on; slower frames run the game in slow motion
+
+
+class FixedStep:
+    def __init__(self, rate=SIM_RATE, max_frame_time=MAX_FRAME_TIME):
+        self.rate = rate
+        self.dt = 1.0 / rate
+        self.max_frame_time = max_frame_time
+        self.accumulator = 0.0
+        self.steps = 0  # Total steps taken; multiply by dt for simulated time
+
+    def advance(self, frame_time):
+        """Add a frame's wall-clock seconds and yield dt once per step to simulate now."""
+        self.accumulator += min(frame_time, self.max_frame_time)
+        while self.accumulator >= self.dt:
+            self.accumulator -= self.dt
+            self.steps += 1
+            yield self.dt
+
+    @property
+    def alpha(self):
+        """How far (0..1) the frame being drawn sits between the previous step and the latest."""
+        return self.accumulator / self.dt
+
+    @property
+    def ticks(self):
+        """Simulated milliseconds so far, a deterministic stand-in for pygame.time.get_ticks()."""
+        return self.steps * 1000 // self.rate
+
+
+def lerp(a, b, t):
+    return a + (b - a) * t
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Input recording and headless replay for the fixed-step Mario engines
+(4KSMB3.py and EZSMB1-1.py).
+
+A recording is the RNG seed plus one button bitmask per simulation step
+(see fixedstep.py). Game logic reads only those bits, so replaying the file
+reproduces the run exactly, as fast as the machine allows, which makes it a
+repeatable workload for profiling and a check that an optimization didn't
+change behaviour:
+
+    python 4KSMB3.py --record run.rpl          # play, then quit
+    python 4KSMB3.py --replay run.rpl          # timings and final state hash
+
+File layout (little-endian): b"RPLY", version byte, uint64 seed, uint16
+metadata length, UTF-8 metadata (e.g. the level played), uint32 step count,
+then the masks as one byte per step, zlib-compressed.
+"""
+
+import hashlib
+import struct
+import time
+import zlib
+from contextlib import nullcontext
+
+MAGIC = b"RPLY"
+VERSION = 1
+_HEADER = struct.Struct("<4sBQH")
+_NO_PHASE = nullcontext()
+
+
+class Recording:
+    def __init__(self, seed, meta=""):
+        self.seed = seed
+        self.meta = meta
+        self.masks = bytearray()
+
+    def append(self, mask):
+        self.masks.append(mask)
+
+    def save(self, path):
+        meta = self.meta.encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, self.seed, len(meta)))
+            f.write(meta)
+            f.write(struct.pack("<I", len(self.masks)))
+            f.write(zlib.compress(bytes(self.masks), 9))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, seed, meta_length = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} input recording")
+        offset = _HEADER.size
+        recording = cls(seed, data[offset:offset + meta_length].decode("utf-8"))
+        offset += meta_length
+        (steps,) = struct.unpack_from("<I", data, offset)
+        recording.masks = bytearray(zlib.decompress(data[offset + 4:]))
+        if len(recording.masks) != steps:
+            raise ValueError(f"{path} is truncated: {len(recording.masks)} of {steps} steps")
+        return recording
+
+
+class _Phase:
+    __slots__ = ("timer", "name")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.timer._enter(self.name)
+
+    def __exit__(self, *exc_info):
+        self.timer._exit()
+
+
+class PhaseTimer:
+    """
+    Wall-clock time spent in each named phase of the game loop. Phases nest:
+    while an inner phase runs (collision inside an update, say) the outer one
+    is paused, so every moment is counted once, under the innermost phase.
+
+    A disabled timer (the default outside replays) hands out one shared no-op
+    context, so leaving the phase markers in the game loop costs next to nothing.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.totals = {}
+        self.open = []  # [name, resumed_at] of the phases entered, innermost last
+        self._phases = {}
+
+    def phase(self, name):
+        if not self.enabled:
+            return _NO_PHASE
+        phase = self._phases.get(name)
+        if phase is None:
+            phase = self._phases[name] = _Phase(self, name)
+        return phase
+
+    def _enter(self, name):
+        now = time.perf_counter()
+        if self.open:
+            outer = self.open[-1]
+            self.totals[outer[0]] = self.totals.get(outer[0], 0.0) + now - outer[1]
+        self.open.append([name, now])
+
+    def _exit(self):
+        now = time.perf_counter()
+        name, resumed_at = self.open.pop()
+        self.totals[name] = self.totals.get(name, 0.0) + now - resumed_at
+        if self.open:
+            self.open[-1][1] = now
+
+    def report(self, steps):
+        lines = [f"{steps} steps"]
+        for name, total in self.totals.items():
+            lines.append(f"  {name:<10} {total * 1000:9.1f} ms  {total * 1e6 / max(steps, 1):8.1f} us/step")
+        return "\n".join(lines)
+
+
+def state_hash(*values):
+    """Short, stable hash of game state values (numbers, strings and tuples of them)."""
+    return hashlib.sha1(repr(values).encode("utf-8")).hexdigest()[:16]
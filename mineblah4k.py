@@ -1,5 +1,6 @@
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
+from voxelray import voxel_raycast
 
 # Initialize App
 app = Ursina(development_mode=False)
@@ -18,6 +19,8 @@ sky_texture = load_texture('skybox.png')
 punch_sound = Audio('punch_sound', loop=False, autoplay=False)
 
 block_pick = 1
+PICK_DISTANCE = 8
+voxels = {}  # (x, y, z) -> Voxel, for the pick ray
 
 # Sky
 Sky(texture=sky_texture)
@@ -35,17 +38,27 @@ class Voxel(Button):
             scale=0.5
         )
 
-    def input(self, key):
-        if self.hovered:
-            if key == 'left mouse down':
-                punch_sound.play()
-                if block_pick == 1:
-                    Voxel(position=self.position + mouse.normal, texture=stone_texture)
-                elif block_pick == 2:
-                    Voxel(position=self.position + mouse.normal, texture=dirt_texture)
-            elif key == 'right mouse down':
-                punch_sound.play()
-                destroy(self)
+        voxels[tuple(round(c) for c in self.position)] = self
+
+# Block picking: walk the block grid from the eye instead of asking every block
+# whether it is hovered. Each half-size block sits in the unit cell spanning
+# [-0.5, 0.5] around x/z and [-0.75, 0.25] around y, hence the shift.
+def input(key):
+    if key not in ('left mouse down', 'right mouse down'):
+        return
+    hit = voxel_raycast(camera.world_position + Vec3(0.5, 0.75, 0.5), camera.forward, PICK_DISTANCE, voxels.__contains__)
+    if not hit:
+        return
+    cell, normal = hit
+    if key == 'left mouse down' and any(normal):
+        punch_sound.play()
+        if block_pick == 1:
+            Voxel(position=Vec3(*cell) + Vec3(*normal), texture=stone_texture)
+        elif block_pick == 2:
+            Voxel(position=Vec3(*cell) + Vec3(*normal), texture=dirt_texture)
+    elif key == 'right mouse down':
+        punch_sound.play()
+        destroy(voxels.pop(cell))
 
 # Generate Terrain
 for z in range(20):
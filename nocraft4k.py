@@ -1,7 +1,8 @@
-import perlin_noise
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
-from perlin_noise import PerlinNoise
+import numpy as np
+from voxelnoise import fractal_noise2
+from voxelbody import VoxelBody
 import random
 from math import sqrt
 
@@ -43,12 +44,14 @@ def distance_2d(pos1, pos2):
 
 # --- Map Generation ---
 def generate_map():
-    noise = PerlinNoise(octaves=3)
+    # The whole map's noise in one call, indexed [z][x]
+    coords = np.arange(MAP_SIZE) * 0.3
+    noise_vals = (fractal_noise2(coords[None, :], coords[:, None], random.randint(0, 1000), octaves=3) + 1) / 2
     map_tiles = []
     for z in range(MAP_SIZE):
         row = []
         for x in range(MAP_SIZE):
-            noise_val = (noise([x / 10, z / 10]) + 1) / 2
+            noise_val = noise_vals[z, x]
             if noise_val < 0.3:
                 tile_type = 'water'
             elif noise_val < 0.6:
@@ -67,8 +70,7 @@ class GameTile(Entity):
             model='quad',
             color=TILE_COLORS[tile_type],
             position=position,
-            scale=(GRID_SIZE, 1, GRID_SIZE),
-            collider='box' if tile_type == 'mountain' else None
+            scale=(GRID_SIZE, 1, GRID_SIZE)
         )
         self.tile_type = tile_type
         self.is_tile = True
@@ -80,6 +82,38 @@ def create_tile_entities(map_tiles):
         tile_type=map_tiles[z][x]
     ) for x in range(MAP_SIZE)] for z in range(MAP_SIZE)]
 
+# --- Player Movement ---
+def blocks_movement(cell):
+    # Solid ground below y = 0, and each mountain tile is a wall at every height
+    x, y, z = cell
+    if y < 0:
+        return True
+    tile_x = (x + GRID_SIZE // 2) // GRID_SIZE
+    tile_z = (z + GRID_SIZE // 2) // GRID_SIZE
+    if 0 <= tile_x < MAP_SIZE and 0 <= tile_z < MAP_SIZE:
+        return map_tiles[tile_z][tile_x] == 'mountain'
+    return False
+
+class TilePlayer(FirstPersonController):
+    # Mouse look from FirstPersonController; walking, gravity and jumping collide
+    # with the tile map through a VoxelBody, so tiles need no colliders
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.body = VoxelBody(blocks_movement, size=(0.6, self.height, 0.6))
+
+    def update(self):
+        self.rotation_y += mouse.velocity[0] * self.mouse_sensitivity[1]
+        self.camera_pivot.rotation_x -= mouse.velocity[1] * self.mouse_sensitivity[0]
+        self.camera_pivot.rotation_x = clamp(self.camera_pivot.rotation_x, -90, 90)
+        direction = Vec3(self.forward * (held_keys['w'] - held_keys['s'])
+                         + self.right * (held_keys['d'] - held_keys['a'])).normalized()
+        motion = direction * self.speed * time.dt
+        self.position = Vec3(*self.body.move(self.position, motion.x, motion.z, time.dt))
+
+    def input(self, key):
+        if key == 'space':
+            self.body.jump()
+
 # --- Game Control Functions ---
 def spawn_enemies():
     # Placeholder function to spawn enemies
@@ -94,6 +128,7 @@ def restart_game():
     
     player.position = (MAP_SIZE * GRID_SIZE // 2, 1, MAP_SIZE * GRID_SIZE // 2)
     player.rotation = (0, 0, 0)
+    player.body.velocity_y = 0
     
     global map_tiles
     map_tiles = generate_map()
@@ -109,7 +144,7 @@ window.borderless = False
 map_tiles = generate_map()
 tile_entities = create_tile_entities(map_tiles)
 
-player = FirstPersonController(
+player = TilePlayer(
     position=(MAP_SIZE * GRID_SIZE // 2, 1, MAP_SIZE * GRID_SIZE // 2),
     speed=PLAYER_SPEED
 )
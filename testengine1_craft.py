@@ -1,5 +1,6 @@
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
+from voxelray import voxel_raycast
 
 app = Ursina(development_mode=True)
 
@@ -20,6 +21,8 @@ sky_texture = load_texture('skybox.png')
 arm_texture = load_texture('arm_texture.png')
 punch_sound = Audio('punch_sound', loop=False, autoplay=False)
 block_pick = 1
+PICK_DISTANCE = 8
+voxels = {}  # (x, y, z) -> Voxel, for the pick ray
 
 # Sky
 Sky(texture=sky_texture)
@@ -47,21 +50,31 @@ class Voxel(Button):
             scale=0.5
         )
 
-    def input(self, key):
-        if self.hovered:
-            if key == 'left mouse down':
-                punch_sound.play()
-                if block_pick == 1:
-                    voxel = Voxel(position=self.position + mouse.normal, texture=grass_texture)
-                elif block_pick == 2:
-                    voxel = Voxel(position=self.position + mouse.normal, texture=stone_texture)
-                elif block_pick == 3:
-                    voxel = Voxel(position=self.position + mouse.normal, texture=brick_texture)
-                elif block_pick == 4:
-                    voxel = Voxel(position=self.position + mouse.normal, texture=dirt_texture)
-            elif key == 'right mouse down':
-                punch_sound.play()
-                destroy(self)
+        voxels[tuple(round(c) for c in self.position)] = self
+
+# Clicks pick a block by stepping the view ray through the voxels grid.
+# Half-size blocks hang 0.5 below their position, so each is treated as
+# filling the unit cell centred 0.25 below it.
+def input(key):
+    if key not in ('left mouse down', 'right mouse down'):
+        return
+    hit = voxel_raycast(camera.world_position + Vec3(0.5, 0.75, 0.5), camera.forward, PICK_DISTANCE, voxels.__contains__)
+    if not hit:
+        return
+    cell, normal = hit
+    if key == 'left mouse down' and any(normal):
+        punch_sound.play()
+        if block_pick == 1:
+            voxel = Voxel(position=Vec3(*cell) + Vec3(*normal), texture=grass_texture)
+        elif block_pick == 2:
+            voxel = Voxel(position=Vec3(*cell) + Vec3(*normal), texture=stone_texture)
+        elif block_pick == 3:
+            voxel = Voxel(position=Vec3(*cell) + Vec3(*normal), texture=brick_texture)
+        elif block_pick == 4:
+            voxel = Voxel(position=Vec3(*cell) + Vec3(*normal), texture=dirt_texture)
+    elif key == 'right mouse down':
+        punch_sound.play()
+        destroy(voxels.pop(cell))
 
 # World Generation (Basic)
 for z in range(20):
@@ -2,7 +2,17 @@ from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
 import random
 import numpy as np
-from perlin_noise import PerlinNoise
+from voxelnoise import ChunkCache, chunk_axes, fractal_noise2, fractal_noise3
+from voxelray import voxel_raycast
+from voxelbody import VoxelBody
+from PIL import Image as PILImage
+from concurrent.futures import ThreadPoolExecutor
+import atexit
+import mmap
+import os
+import struct
+import threading
+import zlib
 
 # Initialize the application and set frame rate to 60 FPS
 app = Ursina()
@@ -11,29 +21,111 @@ window.fps_counter.enabled = True
 window.vsync = False
 application.target_frame_rate = 60
 
-# Perlin Noise Setup
-terrain_noise = PerlinNoise(octaves=3, seed=random.randint(0, 1000))  # 2D Noise for terrain height
-cave_noise = PerlinNoise(octaves=2, seed=random.randint(0, 1000))     # 3D Noise for cave generation
+# Saved world: the seed plus region files holding every chunk the player has edited
+WORLD_DIR = 'world'
+os.makedirs(WORLD_DIR, exist_ok=True)
+seed_path = os.path.join(WORLD_DIR, 'seed.txt')
+if os.path.exists(seed_path):
+    with open(seed_path) as seed_file:
+        WORLD_SEED = int(seed_file.read())
+else:
+    WORLD_SEED = random.randint(0, 1000)  # Terrain height uses this seed, caves the next 1000 up
+    with open(seed_path, 'w') as seed_file:
+        seed_file.write(str(WORLD_SEED))
 
 # Constants
 CHUNK_SIZE = 16
+WORLD_HEIGHT = 32  # Chunk arrays hold y = 0 .. WORLD_HEIGHT - 1
 RENDER_DISTANCE = 4
+GENERATION_WORKERS = 2  # Background threads generating and meshing chunks
+MAX_PENDING_CHUNKS = 8  # Chunks queued at once; the rest wait so new priorities take effect
+UPLOAD_BUDGET = 0.004   # Seconds per frame spent turning finished chunks into entities
+REGION_SIZE = 8  # Region files hold REGION_SIZE x REGION_SIZE chunks
 BLOCK_SIZE = 1
+REACH = 5  # How far away blocks can be broken or placed
 CAVE_THRESHOLD = 0.3  # Threshold for cave generation, below which space is considered air
 
-# Block types and textures
+# Block types: the id stored in the chunk arrays (0 is air) is also the tile's
+# slot in the texture atlas, counted from 1
+AIR = 0
 block_types = {
-    'grass': load_texture('assets/grass_block.png'),  # Ensure these textures exist
-    'stone': load_texture('assets/stone_block.png'),
-    'dirt': load_texture('assets/dirt_block.png'),
+    'grass': 1,
+    'stone': 2,
+    'dirt': 3,
 }
+ATLAS_TILE_SIZE = 16
+FALLBACK_COLORS = {'grass': (96, 160, 64, 255), 'stone': (128, 128, 128, 255), 'dirt': (120, 85, 58, 255)}
+
+def build_texture_atlas():
+    # One row of tiles, ordered by block id; missing textures become flat colors
+    atlas = PILImage.new('RGBA', (ATLAS_TILE_SIZE * len(block_types), ATLAS_TILE_SIZE))
+    for name, block_id in block_types.items():
+        path = f'assets/{name}_block.png'  # Ensure these textures exist
+        if os.path.exists(path):
+            tile = PILImage.open(path).convert('RGBA').resize((ATLAS_TILE_SIZE, ATLAS_TILE_SIZE), PILImage.NEAREST)
+        else:
+            tile = PILImage.new('RGBA', (ATLAS_TILE_SIZE, ATLAS_TILE_SIZE), FALLBACK_COLORS[name])
+        atlas.paste(tile, ((block_id - 1) * ATLAS_TILE_SIZE, 0))
+    texture = Texture(atlas)
+    texture.filtering = None
+    return texture
+
+atlas_texture = build_texture_atlas()
+
+# Greedy-merged quads span several blocks, so their UVs count blocks and the
+# shader wraps them into the quad's atlas tile. The vertex color carries the
+# tile id (red) and a per-face brightness (green).
+chunk_shader = Shader(language=Shader.GLSL, vertex='''
+#version 140
+uniform mat4 p3d_ModelViewProjectionMatrix;
+in vec4 p3d_Vertex;
+in vec2 p3d_MultiTexCoord0;
+in vec4 p3d_Color;
+out vec2 block_uv;
+out float tile;
+out float shade;
+void main() {
+    gl_Position = p3d_ModelViewProjectionMatrix * p3d_Vertex;
+    block_uv = p3d_MultiTexCoord0;
+    tile = floor(p3d_Color.r * 255.0 + 0.5) - 1.0;
+    shade = p3d_Color.g;
+}
+''', fragment='''
+#version 140
+uniform sampler2D p3d_Texture0;
+uniform float atlas_tiles;
+in vec2 block_uv;
+in float tile;
+in float shade;
+out vec4 fragColor;
+void main() {
+    vec2 uv = vec2((tile + fract(block_uv.x)) / atlas_tiles, fract(block_uv.y));
+    vec4 texel = texture(p3d_Texture0, uv);
+    fragColor = vec4(texel.rgb * shade, texel.a);
+}
+''', default_input={'atlas_tiles': float(len(block_types))})
 
 # Current selected block for placing
 current_block_type = 'grass'
 
-# Player setup
-player = FirstPersonController()
-player.gravity = 0.3
+# Player setup: FirstPersonController's mouse look, with movement resolved against the
+# chunk voxel arrays by a VoxelBody (attached once the chunks exist) instead of
+# raycasts against colliders
+class VoxelPlayer(FirstPersonController):
+    def update(self):
+        self.rotation_y += mouse.velocity[0] * self.mouse_sensitivity[1]
+        self.camera_pivot.rotation_x -= mouse.velocity[1] * self.mouse_sensitivity[0]
+        self.camera_pivot.rotation_x = clamp(self.camera_pivot.rotation_x, -90, 90)
+        direction = Vec3(self.forward * (held_keys['w'] - held_keys['s'])
+                         + self.right * (held_keys['d'] - held_keys['a'])).normalized()
+        motion = direction * self.speed * time.dt
+        self.position = Vec3(*self.body.move(self.position, motion.x, motion.z, time.dt))
+
+    def input(self, key):
+        if key == 'space':
+            self.body.jump()
+
+player = VoxelPlayer()
 player.speed = 5
 
 # Steve AI setup (initialize direction attribute)
@@ -48,82 +140,336 @@ steve.direction = Vec3(0, 0, 0)
 # Light setup
 light = PointLight(parent=player, position=(0, 10, 0), color=color.white, shadows=True)
 
-# Dictionary for chunks
-chunks = {}
-
-# Function to generate terrain and caves using Perlin noise
-def generate_chunk(chunk_x, chunk_z):
-    if (chunk_x, chunk_z) in chunks:
-        return
-
-    for x in range(CHUNK_SIZE):
-        for z in range(CHUNK_SIZE):
-            # Generate the terrain height using 2D Perlin noise
-            world_x = chunk_x * CHUNK_SIZE + x
-            world_z = chunk_z * CHUNK_SIZE + z
-            height = int(terrain_noise([world_x * 0.1, world_z * 0.1]) * 10 + 10)  # Terrain height
-
-            # Generate blocks for terrain and caves
-            for y in range(height + 5):  # Add extra layers below the surface for caves
-                world_y = y
-
-                # Generate cave structure using 3D Perlin noise
-                cave_value = cave_noise([world_x * 0.1, world_y * 0.1, world_z * 0.1])
-
-                if cave_value > CAVE_THRESHOLD:  # If above threshold, consider it solid ground
-                    if y == height:
-                        block_texture = block_types['grass']
-                    elif y > height - 3:
-                        block_texture = block_types['dirt']
-                    else:
-                        block_texture = block_types['stone']
-
-                    block = Entity(
-                        model='cube',
-                        texture=block_texture,
-                        position=(world_x, y, world_z),
-                        scale=BLOCK_SIZE,
-                        collider='box'
-                    )
-
-    chunks[(chunk_x, chunk_z)] = True
+# Faces of a block: (axis, direction, first tangent axis, second tangent axis, brightness).
+# The tangents are ordered so the quad's corners wind counter-clockwise seen from outside.
+FACES = (
+    (0, 1, 2, 1, 0.8), (0, -1, 1, 2, 0.8),
+    (1, 1, 0, 2, 1.0), (1, -1, 2, 0, 0.5),
+    (2, 1, 1, 0, 0.65), (2, -1, 0, 1, 0.65),
+)
+
+# Corners of a quad in (first tangent, second tangent) units of its height and width
+QUAD_CORNERS = np.array(((0, 0), (1, 0), (1, 1), (0, 1)))
+QUAD_TRIANGLES = np.array((0, 1, 2, 0, 2, 3))
+
+def merged_quads(exposed):
+    # Merge equal, non-zero cells of a (layer, row, column) stack of face masks into
+    # rectangles, as arrays (layer, i, j, height, width, block id): runs along each row
+    # first, then identical runs in consecutive rows stack into one quad. All NumPy, so
+    # worker threads spend little time holding the GIL.
+    layers, rows, cols = exposed.shape
+    cells = exposed.reshape(-1, cols)
+    boundary = np.ones((cells.shape[0], cols + 1), dtype=bool)
+    boundary[:, 1:cols] = cells[:, 1:] != cells[:, :-1]
+    row, col = np.nonzero(boundary)  # Row-major, so each run's end is the next boundary
+    is_start = col < cols
+    run_row, run_start = row[is_start], col[is_start]
+    run_width = col[1:][is_start[:-1]] - run_start
+    block = cells[run_row, run_start]
+    solid = block != AIR
+    run_row, run_start, run_width, block = run_row[solid], run_start[solid], run_width[solid], block[solid]
+    layer, i = np.divmod(run_row, rows)
+
+    # Stack runs with the same layer, columns and block that sit in consecutive rows
+    order = np.lexsort((i, block, run_width, run_start, layer))
+    layer, i, run_start, run_width, block = layer[order], i[order], run_start[order], run_width[order], block[order]
+    continues = np.zeros(len(i), dtype=bool)
+    continues[1:] = ((layer[1:] == layer[:-1]) & (run_start[1:] == run_start[:-1]) & (run_width[1:] == run_width[:-1])
+                     & (block[1:] == block[:-1]) & (i[1:] == i[:-1] + 1))
+    first = np.flatnonzero(~continues)
+    height = np.diff(np.append(first, len(i)))
+    return layer[first], i[first], run_start[first], height, run_width[first], block[first]
+
+def build_chunk_mesh(voxels):
+    # Flat float32/uint32 vertex buffers (Mesh copies them straight into the GPU
+    # arrays) for one mesh holding the chunk's exposed faces, greedily merged;
+    # anything outside the chunk counts as air. Safe to call off the main thread.
+    padded = np.pad(voxels != AIR, 1)
+    vertices, triangles, uvs, colors = [], [], [], []
+    vertex_count = 0
+    for axis, direction, t1, t2, shade in FACES:
+        # Solid blocks whose neighbour in this direction is air
+        neighbour = [slice(1, -1)] * 3
+        neighbour[axis] = slice(1 + direction, padded.shape[axis] - 1 + direction)
+        exposed = np.where(padded[tuple(neighbour)], AIR, voxels).transpose(axis, t1, t2)
+        layer, i, j, height, width, block = merged_quads(exposed)
+        if not len(block):
+            continue
+        # Four corners per quad: offsets along the tangents scaled by the quad's size
+        du = QUAD_CORNERS[:, 0] * height[:, None]
+        dv = QUAD_CORNERS[:, 1] * width[:, None]
+        corners = np.empty((len(block), 4, 3), dtype=np.float32)
+        corners[:, :, axis] = (layer + (1 if direction > 0 else 0) - 0.5)[:, None]
+        corners[:, :, t1] = i[:, None] + du - 0.5
+        corners[:, :, t2] = j[:, None] + dv - 0.5
+        vertices.append(corners.ravel())
+        # Keep texture "up" along y on the side faces
+        uvs.append(np.stack((dv, du) if t1 == 1 else (du, dv), axis=-1).astype(np.float32).ravel())
+        color = np.empty((len(block), 4, 4), dtype=np.float32)
+        color[:] = (0, shade, 0, 1)
+        color[:, :, 0] = (block / 255)[:, None]
+        colors.append(color.ravel())
+        bases = vertex_count + 4 * np.arange(len(block), dtype=np.uint32)
+        triangles.append((bases[:, None] + QUAD_TRIANGLES.astype(np.uint32)).ravel())
+        vertex_count += 4 * len(block)
+    if not vertices:
+        return None
+    return tuple(np.concatenate(parts) for parts in (vertices, triangles, uvs, colors))
+
+class Chunk:
+    def __init__(self, chunk_x, chunk_z, voxels):
+        self.chunk_x = chunk_x
+        self.chunk_z = chunk_z
+        self.voxels = voxels  # uint8 block ids indexed [x, y, z]
+        self.entity = None
+        self.modified = False  # Edited since it was generated or last saved
+
+    def rebuild(self):
+        self.upload(build_chunk_mesh(self.voxels))
+
+    def release(self):
+        # Free the entity and its mesh; main thread only
+        if self.entity:
+            destroy(self.entity)
+            self.entity = None
+
+    def upload(self, mesh_data):
+        # Replace the chunk's single mesh entity; main thread only. No collider: the
+        # player collides with the voxel arrays and picking walks them too
+        self.release()
+        if mesh_data is None:
+            return
+        vertices, triangles, uvs, colors = mesh_data
+        mesh = Mesh(vertices=vertices, triangles=triangles, uvs=uvs, colors=colors, static=True)
+        self.entity = Entity(model=mesh, texture=atlas_texture, shader=chunk_shader,
+                             position=(self.chunk_x * CHUNK_SIZE, 0, self.chunk_z * CHUNK_SIZE))
+        self.entity.chunk = self
+
+# Function to generate terrain and caves using Perlin noise, a whole chunk per call
+def generate_voxels(seed, chunk_x, chunk_z):
+    world_x, world_z = chunk_axes(chunk_x, chunk_z, CHUNK_SIZE)
+    # Terrain height from 2D fractal noise, one value per column
+    height = (fractal_noise2(world_x * 0.1, world_z * 0.1, seed, octaves=3) * 10 + 10).astype(int)[:, None, :]
+    # Cave structure from 3D fractal noise; above the threshold is solid ground.
+    # Only the layers up to the highest column can hold blocks.
+    top = int(np.clip(height.max() + 5, 0, WORLD_HEIGHT))
+    world_y = np.arange(top)[None, :, None]
+    cave_value = fractal_noise3(world_x[:, :, None] * 0.1, world_y * 0.1, world_z[:, None, :] * 0.1,
+                                seed + 1000, octaves=2)
+    solid = (cave_value > CAVE_THRESHOLD) & (world_y < height + 5)  # Extra layers below the surface for caves
+    blocks = np.where(world_y == height, block_types['grass'],
+                      np.where(world_y > height - 3, block_types['dirt'], block_types['stone']))
+    voxels = np.zeros((CHUNK_SIZE, WORLD_HEIGHT, CHUNK_SIZE), dtype=np.uint8)
+    voxels[:, :top, :] = np.where(solid, blocks, AIR)
+    return voxels
+
+chunk_cache = ChunkCache(generate_voxels)
+
+class RegionStore:
+    # Edited chunks, zlib-compressed into one file per REGION_SIZE x REGION_SIZE chunks.
+    # A file starts with an (offset, length) table, one entry per chunk (0, 0 if
+    # absent), followed by the compressed voxel arrays; reads go through mmap.
+    TABLE = struct.Struct(f'<{REGION_SIZE * REGION_SIZE * 2}I')
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()  # Workers load while the main thread saves
+
+    def path(self, chunk_x, chunk_z):
+        return os.path.join(self.directory, f'r.{chunk_x // REGION_SIZE}.{chunk_z // REGION_SIZE}.bin')
+
+    def slot(self, chunk_x, chunk_z):
+        return ((chunk_z % REGION_SIZE) * REGION_SIZE + chunk_x % REGION_SIZE) * 2
+
+    def load(self, chunk_x, chunk_z):
+        # Stored voxels for a chunk, or None if it was never saved
+        path = self.path(chunk_x, chunk_z)
+        with self.lock:
+            if not os.path.exists(path):
+                return None
+            with open(path, 'rb') as region, mmap.mmap(region.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                slot = self.slot(chunk_x, chunk_z)
+                offset, length = struct.unpack_from('<2I', data, slot * 4)
+                if not length:
+                    return None
+                raw = zlib.decompress(data[offset:offset + length])
+        return np.frombuffer(raw, dtype=np.uint8).reshape(CHUNK_SIZE, WORLD_HEIGHT, CHUNK_SIZE).copy()
+
+    def save(self, chunk_x, chunk_z, voxels):
+        blob = zlib.compress(voxels.tobytes())
+        path = self.path(chunk_x, chunk_z)
+        slot = self.slot(chunk_x, chunk_z)
+        with self.lock:
+            if os.path.exists(path):
+                with open(path, 'rb') as region:
+                    data = region.read()
+                table = list(self.TABLE.unpack_from(data))
+            else:
+                data = bytes(self.TABLE.size)
+                table = [0] * (REGION_SIZE * REGION_SIZE * 2)
+            live = sum(table[1::2]) - table[slot + 1] + len(blob)
+            if len(data) - self.TABLE.size > 2 * live:
+                # Mostly superseded copies: rewrite the file with only the live chunks
+                blobs = [data[table[i]:table[i] + table[i + 1]] for i in range(0, len(table), 2)]
+                blobs[slot // 2] = blob
+                table, body, offset = [], bytearray(), self.TABLE.size
+                for chunk_blob in blobs:
+                    table += [offset if chunk_blob else 0, len(chunk_blob)]
+                    body += chunk_blob
+                    offset += len(chunk_blob)
+                with open(path, 'wb') as region:
+                    region.write(self.TABLE.pack(*table) + body)
+                return
+            # Append the new copy and point the table at it
+            table[slot], table[slot + 1] = len(data), len(blob)
+            with open(path, 'r+b' if os.path.exists(path) else 'wb') as region:
+                region.write(self.TABLE.pack(*table))
+                region.seek(len(data))
+                region.write(blob)
+
+region_store = RegionStore(WORLD_DIR)
+
+class ChunkRegistry:
+    # Owns every loaded chunk and its entity; edited chunks are written to the
+    # region store when they unload
+    def __init__(self, store):
+        self.store = store
+        self.chunks = {}  # (chunk_x, chunk_z) -> Chunk
+
+    def __contains__(self, key):
+        return key in self.chunks
+
+    def get(self, key):
+        return self.chunks.get(key)
+
+    def add(self, chunk, mesh_data):
+        chunk.upload(mesh_data)
+        self.chunks[(chunk.chunk_x, chunk.chunk_z)] = chunk
+
+    def save(self, chunk):
+        if chunk.modified:
+            self.store.save(chunk.chunk_x, chunk.chunk_z, chunk.voxels)
+            chunk.modified = False
+
+    def unload(self, key):
+        chunk = self.chunks.pop(key)
+        self.save(chunk)
+        chunk.release()
+
+    def unload_outside(self, center_x, center_z, distance):
+        for chunk_x, chunk_z in list(self.chunks):
+            if abs(chunk_x - center_x) > distance or abs(chunk_z - center_z) > distance:
+                self.unload((chunk_x, chunk_z))
+
+    def save_all(self):
+        for chunk in self.chunks.values():
+            self.save(chunk)
+
+chunk_registry = ChunkRegistry(region_store)
+atexit.register(chunk_registry.save_all)
+
+# Chunks are generated and meshed on worker threads; the main thread only uploads
+# finished meshes. Both steps are NumPy array work, which mostly runs without the GIL.
+chunk_executor = ThreadPoolExecutor(max_workers=GENERATION_WORKERS)
+pending_chunks = {}  # (chunk_x, chunk_z) -> Future of (voxels, mesh data)
+
+def build_chunk(seed, chunk_x, chunk_z):
+    # Worker side: plain arrays only, no Ursina calls. Saved edits win over the noise;
+    # the cache hands out read-only arrays, so the chunk gets its own editable copy
+    voxels = region_store.load(chunk_x, chunk_z)
+    if voxels is None:
+        voxels = chunk_cache.get(seed, chunk_x, chunk_z).copy()
+    return voxels, build_chunk_mesh(voxels)
+
+def chunk_priority(chunk_x, chunk_z):
+    # Distance from the player in chunks, halved for chunks straight ahead of the camera
+    to_chunk = Vec3((chunk_x + 0.5) * CHUNK_SIZE - player.x, 0, (chunk_z + 0.5) * CHUNK_SIZE - player.z)
+    distance_in_chunks = to_chunk.length() / CHUNK_SIZE
+    if distance_in_chunks < 1:
+        return distance_in_chunks
+    facing = Vec3(camera.forward.x, 0, camera.forward.z).normalized()
+    alignment = to_chunk.normalized().dot(facing)  # 1 ahead, -1 behind
+    return distance_in_chunks * (1.5 - alignment * 0.5)
+
+def set_block(world_x, world_y, world_z, block_id):
+    # Change one voxel and re-mesh its chunk; returns False outside the loaded world
+    chunk = chunk_registry.get((world_x // CHUNK_SIZE, world_z // CHUNK_SIZE))
+    if chunk is None or not 0 <= world_y < WORLD_HEIGHT:
+        return False
+    chunk.voxels[world_x % CHUNK_SIZE, world_y, world_z % CHUNK_SIZE] = block_id
+    chunk.modified = True
+    chunk.rebuild()
+    return True
 
 # Function to update chunks around the player
 def update_chunks():
     player_chunk_x = int(player.x // CHUNK_SIZE)
     player_chunk_z = int(player.z // CHUNK_SIZE)
 
-    for x in range(player_chunk_x - RENDER_DISTANCE, player_chunk_x + RENDER_DISTANCE):
-        for z in range(player_chunk_z - RENDER_DISTANCE, player_chunk_z + RENDER_DISTANCE):
-            generate_chunk(x, z)
+    # Queue the most urgent missing chunks
+    if len(pending_chunks) < MAX_PENDING_CHUNKS:
+        missing = [(x, z)
+                   for x in range(player_chunk_x - RENDER_DISTANCE, player_chunk_x + RENDER_DISTANCE)
+                   for z in range(player_chunk_z - RENDER_DISTANCE, player_chunk_z + RENDER_DISTANCE)
+                   if (x, z) not in chunk_registry and (x, z) not in pending_chunks]
+        missing.sort(key=lambda key: chunk_priority(*key))
+        for key in missing[:MAX_PENDING_CHUNKS - len(pending_chunks)]:
+            pending_chunks[key] = chunk_executor.submit(build_chunk, WORLD_SEED, *key)
+
+    # Upload finished chunks, most urgent first, until the frame's budget is spent
+    deadline = time.perf_counter() + UPLOAD_BUDGET
+    finished = sorted((key for key, future in pending_chunks.items() if future.done()),
+                      key=lambda key: chunk_priority(*key))
+    for key in finished:
+        if time.perf_counter() > deadline:
+            break
+        voxels, mesh_data = pending_chunks.pop(key).result()
+        chunk_registry.add(Chunk(key[0], key[1], voxels), mesh_data)
 
 # Function to unload chunks outside render distance
 def unload_chunks():
     player_chunk_x = int(player.x // CHUNK_SIZE)
     player_chunk_z = int(player.z // CHUNK_SIZE)
-    keys_to_remove = []
-    for chunk_key in chunks.keys():
+    chunk_registry.unload_outside(player_chunk_x, player_chunk_z, RENDER_DISTANCE)
+
+    # Drop queued chunks the player has moved away from
+    for chunk_key in list(pending_chunks):
         chunk_x, chunk_z = chunk_key
         if abs(chunk_x - player_chunk_x) > RENDER_DISTANCE or abs(chunk_z - player_chunk_z) > RENDER_DISTANCE:
-            keys_to_remove.append(chunk_key)
+            pending_chunks.pop(chunk_key).cancel()
+
+def is_solid(cell):
+    world_x, world_y, world_z = cell
+    chunk = chunk_registry.get((world_x // CHUNK_SIZE, world_z // CHUNK_SIZE))
+    return (chunk is not None and 0 <= world_y < WORLD_HEIGHT
+            and chunk.voxels[world_x % CHUNK_SIZE, world_y, world_z % CHUNK_SIZE] != AIR)
+
+def blocks_movement(cell):
+    # Like is_solid, but chunks that haven't loaded yet are walls, so the player
+    # waits in place rather than falling through the unbuilt world
+    world_x, world_y, world_z = cell
+    if not 0 <= world_y < WORLD_HEIGHT:
+        return False
+    chunk = chunk_registry.get((world_x // CHUNK_SIZE, world_z // CHUNK_SIZE))
+    return chunk is None or chunk.voxels[world_x % CHUNK_SIZE, world_y, world_z % CHUNK_SIZE] != AIR
 
-    for key in keys_to_remove:
-        chunk = chunks.pop(key)
-        destroy(chunk)
+def pick_block():
+    # Walk the voxel arrays from the eye; blocks are centred on whole coordinates,
+    # so shift by half a block to line them up with the traversal's grid cells
+    return voxel_raycast(camera.world_position + Vec3(0.5, 0.5, 0.5), camera.forward, REACH, is_solid)
 
 # Block breaking function
 def break_block():
-    hit_info = raycast(player.position, camera.forward, distance=5)
-    if hit_info.hit and hit_info.entity:
-        destroy(hit_info.entity)
+    hit = pick_block()
+    if hit:
+        set_block(*hit[0], AIR)
 
 # Block placing function
 def place_block():
-    hit_info = raycast(player.position, camera.forward, distance=5)
-    if hit_info.hit:
-        block_position = hit_info.entity.position + hit_info.normal
-        block_position = block_position // BLOCK_SIZE * BLOCK_SIZE
-        Entity(model='cube', texture=block_types[current_block_type], position=block_position, collider='box')
+    hit = pick_block()
+    if hit:
+        (x, y, z), (normal_x, normal_y, normal_z) = hit
+        set_block(x + normal_x, y + normal_y, z + normal_z, block_types[current_block_type])
 
 # Input handling for block placement, breaking, and inventory opening
 def input(key):
@@ -162,6 +508,9 @@ def update():
 # Set the player's initial spawn position on top of the terrain
 spawn_position = Vec3(0, 10, 0)
 player.position = spawn_position
+# Blocks are centred on whole coordinates, half a block off the body's grid cells;
+# step-up climbs single-block ledges
+player.body = VoxelBody(blocks_movement, size=(0.6, player.height, 0.6), offset=(0.5, 0.5, 0.5), step_height=1.0)
 
 # Start the game
 app.run()
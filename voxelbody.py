@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Swept axis-aligned box collision against a voxel grid, for the first-person
+players in ultracraft4k.py and nocraft4k.py.
+
+Instead of raycasting against a collider on every block, the player's box is
+moved one axis at a time and stopped at the first solid grid cell in its path,
+asking the caller's ``is_solid(cell)`` only about the handful of cells the box
+sweeps through. Cell (i, j, k) spans [i, i+1) on each axis, as in voxelray.py.
+
+    body = VoxelBody(lambda cell: cell in blocks, offset=(0.5, 0.5, 0.5))
+    player.position = body.move(player.position, dx, dz, time.dt)
+"""
+
+import math
+
+EPSILON = 1e-4  # Faces exactly touching a cell boundary don't count as overlapping it
+
+
+def _cells(low, high):
+    """Grid cells overlapped by the open interval (low, high)."""
+    return range(math.floor(low + EPSILON), math.ceil(high - EPSILON))
+
+
+def sweep_axis(box_min, box_max, axis, amount, is_solid):
+    """
+    How far the box can move along `axis` (0, 1 or 2) towards `amount`
+    before touching a solid cell: `amount` itself if the way is clear.
+    """
+    if not amount:
+        return 0.0
+    a, b = [other for other in range(3) if other != axis]
+    cross = [(i, j) for i in _cells(box_min[a], box_max[a]) for j in _cells(box_min[b], box_max[b])]
+
+    def blocked(layer):
+        for i, j in cross:
+            cell = [0, 0, 0]
+            cell[axis], cell[a], cell[b] = layer, i, j
+            if is_solid(tuple(cell)):
+                return True
+        return False
+
+    if amount > 0:
+        face = box_max[axis]
+        for layer in range(math.ceil(face - EPSILON), math.floor(face + amount) + 1):
+            if layer >= face + amount:
+                break
+            if blocked(layer):
+                return max(0.0, layer - face)
+    else:
+        face = box_min[axis]
+        for layer in range(math.floor(face + EPSILON) - 1, math.floor(face + amount) - 1, -1):
+            if layer + 1 <= face + amount:
+                break
+            if blocked(layer):
+                return min(0.0, layer + 1 - face)
+    return amount
+
+
+class VoxelBody:
+    """
+    Gravity, jumping, ground detection and step-up for a box standing on a
+    voxel grid. Positions are the centre of the box's feet in world space;
+    `offset` is added to get grid space.
+    """
+
+    def __init__(self, is_solid, size=(0.6, 1.8, 0.6), offset=(0.0, 0.0, 0.0),
+                 gravity=25.0, jump_speed=8.0, step_height=0.55, max_fall_speed=50.0):
+        self.is_solid = is_solid
+        self.size = size
+        self.offset = offset
+        self.gravity = gravity
+        self.jump_speed = jump_speed
+        self.step_height = step_height
+        self.max_fall_speed = max_fall_speed
+        self.velocity_y = 0.0
+        self.grounded = False
+
+    def jump(self):
+        if self.grounded:
+            self.velocity_y = self.jump_speed
+            self.grounded = False
+
+    def box(self, position):
+        x, y, z = (position[axis] + self.offset[axis] for axis in range(3))
+        width, height, depth = self.size
+        return [x - width / 2, y, z - depth / 2], [x + width / 2, y + height, z + depth / 2]
+
+    def move(self, position, motion_x, motion_z, dt):
+        """Apply gravity and a horizontal move; returns the new (x, y, z) position."""
+        self.velocity_y = max(self.velocity_y - self.gravity * dt, -self.max_fall_speed)
+        box_min, box_max = self.box(position)
+
+        def shift(axis, amount):
+            box_min[axis] += amount
+            box_max[axis] += amount
+
+        # Vertical first, so ground contact is known before stepping up
+        motion_y = self.velocity_y * dt
+        allowed = sweep_axis(box_min, box_max, 1, motion_y, self.is_solid)
+        shift(1, allowed)
+        if allowed != motion_y:
+            self.grounded = motion_y < 0
+            self.velocity_y = 0.0
+        else:
+            self.grounded = False
+
+        for axis, amount in ((0, motion_x), (2, motion_z)):
+            allowed = sweep_axis(box_min, box_max, axis, amount, self.is_solid)
+            if abs(allowed) < abs(amount) and self.grounded and self.step_height:
+                # Blocked on the ground: see whether the move clears the obstacle from higher up
+                rise = sweep_axis(box_min, box_max, 1, self.step_height, self.is_solid)
+                raised_min = [box_min[0], box_min[1] + rise, box_min[2]]
+                raised_max = [box_max[0], box_max[1] + rise, box_max[2]]
+                stepped = sweep_axis(raised_min, raised_max, axis, amount, self.is_solid)
+                if abs(stepped) > abs(allowed):
+                    shift(1, rise)
+                    shift(axis, stepped)
+                    shift(1, sweep_axis(box_min, box_max, 1, -rise, self.is_solid))
+                    continue
+            shift(axis, allowed)
+
+        return (box_min[0] + self.size[0] / 2 - self.offset[0],
+                box_min[1] - self.offset[1],
+                box_min[2] + self.size[2] / 2 - self.offset[2])
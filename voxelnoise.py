@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Vectorized fractal Perlin noise shared by the voxel games (ultracraft4k.py,
+nocraft4k.py, CAVEULTRA64DD.py and CatCraft4k.py).
+
+Every function takes NumPy arrays (or scalars) of coordinates and evaluates the
+whole grid in one call, so a chunk's heightmap or cave volume is a handful of
+array operations instead of one pure-Python noise call per block. The same
+seed always gives the same world.
+
+    heights = fractal_noise2(xs * 0.1, zs[:, None] * 0.1, seed=42, octaves=3)
+
+Run directly it times chunk generation:
+
+    python voxelnoise.py
+"""
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Gradient directions: 8 around the circle for 2D, the 12 cube edges (4 repeated) for 3D
+GRADIENTS_2D = np.array([(1, 1), (-1, 1), (1, -1), (-1, -1),
+                         (1, 0), (-1, 0), (0, 1), (0, -1)], dtype=np.float64)
+GRADIENTS_3D = np.array([(1, 1, 0), (-1, 1, 0), (1, -1, 0), (-1, -1, 0),
+                         (1, 0, 1), (-1, 0, 1), (1, 0, -1), (-1, 0, -1),
+                         (0, 1, 1), (0, -1, 1), (0, 1, -1), (0, -1, -1),
+                         (1, 1, 0), (0, -1, 1), (-1, 1, 0), (0, -1, -1)], dtype=np.float64)
+
+
+@functools.lru_cache(maxsize=64)
+def permutation(seed):
+    """Seeded 0..255 shuffle, doubled so corner hashes never need wrapping."""
+    perm = np.random.default_rng(seed).permutation(256)
+    return np.concatenate((perm, perm))
+
+
+def _fade(t):
+    return t * t * t * (t * (t * 6 - 15) + 10)
+
+
+def _lerp(a, b, t):
+    return a + t * (b - a)
+
+
+def perlin2(x, z, seed=0):
+    """Single-octave 2D Perlin noise in roughly [-1, 1]; arrays broadcast together."""
+    perm = permutation(seed)
+    x = np.asarray(x, dtype=np.float64)
+    z = np.asarray(z, dtype=np.float64)
+    x0 = np.floor(x)
+    z0 = np.floor(z)
+    fx, fz = x - x0, z - z0
+    xi = x0.astype(np.int64) & 255
+    zi = z0.astype(np.int64) & 255
+    a = perm[xi] + zi
+    b = perm[xi + 1] + zi
+
+    def corner(h, dx, dz):
+        g = GRADIENTS_2D[perm[h] & 7]
+        return g[..., 0] * dx + g[..., 1] * dz
+
+    u, v = _fade(fx), _fade(fz)
+    top = _lerp(corner(a, fx, fz), corner(b, fx - 1, fz), u)
+    bottom = _lerp(corner(a + 1, fx, fz - 1), corner(b + 1, fx - 1, fz - 1), u)
+    return _lerp(top, bottom, v)
+
+
+def perlin3(x, y, z, seed=0):
+    """Single-octave 3D Perlin noise in roughly [-1, 1]; arrays broadcast together."""
+    perm = permutation(seed)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    z = np.asarray(z, dtype=np.float64)
+    x0, y0, z0 = np.floor(x), np.floor(y), np.floor(z)
+    fx, fy, fz = x - x0, y - y0, z - z0
+    xi = x0.astype(np.int64) & 255
+    yi = y0.astype(np.int64) & 255
+    zi = z0.astype(np.int64) & 255
+    a = perm[xi] + yi
+    b = perm[xi + 1] + yi
+    aa, ab = perm[a] + zi, perm[a + 1] + zi
+    ba, bb = perm[b] + zi, perm[b + 1] + zi
+
+    def corner(h, dx, dy, dz):
+        g = GRADIENTS_3D[perm[h] & 15]
+        return g[..., 0] * dx + g[..., 1] * dy + g[..., 2] * dz
+
+    u, v, w = _fade(fx), _fade(fy), _fade(fz)
+    near = _lerp(_lerp(corner(aa, fx, fy, fz), corner(ba, fx - 1, fy, fz), u),
+                 _lerp(corner(ab, fx, fy - 1, fz), corner(bb, fx - 1, fy - 1, fz), u), v)
+    far = _lerp(_lerp(corner(aa + 1, fx, fy, fz - 1), corner(ba + 1, fx - 1, fy, fz - 1), u),
+                _lerp(corner(ab + 1, fx, fy - 1, fz - 1), corner(bb + 1, fx - 1, fy - 1, fz - 1), u), v)
+    return _lerp(near, far, w)
+
+
+def fractal_noise2(x, z, seed=0, octaves=4, persistence=0.5, lacunarity=2.0):
+    """Sum of `octaves` perlin2 layers, each finer and fainter, normalized to roughly [-1, 1]."""
+    total, amplitude, frequency, norm = 0.0, 1.0, 1.0, 0.0
+    for octave in range(octaves):
+        total = total + perlin2(np.multiply(x, frequency), np.multiply(z, frequency), seed + octave) * amplitude
+        norm += amplitude
+        amplitude *= persistence
+        frequency *= lacunarity
+    return total / norm
+
+
+def fractal_noise3(x, y, z, seed=0, octaves=4, persistence=0.5, lacunarity=2.0):
+    """Sum of `octaves` perlin3 layers, each finer and fainter, normalized to roughly [-1, 1]."""
+    total, amplitude, frequency, norm = 0.0, 1.0, 1.0, 0.0
+    for octave in range(octaves):
+        total = total + perlin3(np.multiply(x, frequency), np.multiply(y, frequency),
+                                np.multiply(z, frequency), seed + octave) * amplitude
+        norm += amplitude
+        amplitude *= persistence
+        frequency *= lacunarity
+    return total / norm
+
+
+def chunk_axes(chunk_x, chunk_z, size):
+    """World x and z coordinates of a chunk's columns, shaped (size, 1) and (1, size)."""
+    xs = np.arange(chunk_x * size, (chunk_x + 1) * size, dtype=np.float64)
+    zs = np.arange(chunk_z * size, (chunk_z + 1) * size, dtype=np.float64)
+    return xs[:, None], zs[None, :]
+
+
+class ChunkCache:
+    """
+    LRU cache of generated chunk arrays keyed by (seed, chunk_x, chunk_z).
+
+    `generate(seed, chunk_x, chunk_z)` builds a chunk on a miss. Cached arrays
+    are made read-only; copy one before editing it. Safe to share between
+    worker threads; generation itself runs outside the lock.
+    """
+
+    def __init__(self, generate, capacity=256):
+        self.generate = generate
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, seed, chunk_x, chunk_z):
+        key = (seed, chunk_x, chunk_z)
+        with self.lock:
+            array = self.entries.get(key)
+            if array is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return array
+            self.misses += 1
+        array = self.generate(seed, chunk_x, chunk_z)
+        array.flags.writeable = False
+        with self.lock:
+            self.entries[key] = array
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+        return array
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def main():
+    size, height = 16, 32
+    ys = np.arange(height, dtype=np.float64)[None, :, None]
+
+    def generate(seed, chunk_x, chunk_z):
+        xs, zs = chunk_axes(chunk_x, chunk_z, size)
+        heights = fractal_noise2(xs * 0.1, zs * 0.1, seed, octaves=3) * 10 + 10
+        caves = fractal_noise3(xs[:, :, None] * 0.1, ys * 0.1, zs[:, None, :] * 0.1, seed + 1, octaves=2)
+        return ((ys < heights[:, None, :]) & (caves > -0.3)).astype(np.uint8)
+
+    cache = ChunkCache(generate)
+    start = time.perf_counter()
+    for chunk_x in range(-4, 4):
+        for chunk_z in range(-4, 4):
+            cache.get(1234, chunk_x, chunk_z)
+    elapsed = time.perf_counter() - start
+    print(f"{cache.misses} chunks of {size}x{height}x{size}: {elapsed * 1000 / cache.misses:.2f} ms per chunk")
+
+
+if __name__ == "__main__":
+    main()